@@ -3,9 +3,8 @@ import asyncio
 import logging
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from io import BytesIO
+from functools import partial
 
-import pandas as pd
 from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy import func, select
@@ -27,6 +26,7 @@ from app.schemas.entrenamiento import (
     ModeloActualResponse,
 )
 from app.services import entrenamiento_service
+from app.services.ingesta_archivos import ArchivoInvalido, archivo_temporal, leer_dataframe
 
 logger = logging.getLogger(__name__)
 
@@ -46,18 +46,14 @@ REQUIRED_COLUMNS = entrenamiento_service.REQUIRED_COLUMNS
     response_model=EntrenamientoIniciarResponse,
     status_code=status.HTTP_202_ACCEPTED,
     summary="Iniciar entrenamiento del modelo",
-    description="Sube un Excel (.xlsx) con datos de entrenamiento y lanza el proceso en background.",
+    description="Sube un archivo (.xlsx, .csv o .parquet) con datos de entrenamiento y lanza el proceso en background.",
 )
 async def iniciar_entrenamiento(
     request: Request,
-    archivo: UploadFile = File(..., description="Archivo Excel (.xlsx) con datos de entrenamiento"),
+    archivo: UploadFile = File(..., description="Archivo .xlsx, .csv o .parquet con datos de entrenamiento"),
     db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(get_current_user),
 ):
-    # Validar extensión
-    if not archivo.filename or not archivo.filename.endswith(".xlsx"):
-        raise HTTPException(status_code=400, detail="El archivo debe ser .xlsx")
-
     # Verificar que no haya otro entrenamiento en curso
     en_curso = await db.execute(
         select(func.count()).select_from(EntrenamientoModelo).where(
@@ -70,12 +66,15 @@ async def iniciar_entrenamiento(
             detail="Ya existe un entrenamiento en curso. Espere a que termine antes de iniciar otro.",
         )
 
-    # Leer Excel
-    try:
-        contents = await archivo.read()
-        df = pd.read_excel(BytesIO(contents), engine="openpyxl")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error al leer el archivo: {e}")
+    # Leer archivo: el upload se copia a disco y se parsea fuera del event loop.
+    # El entrenamiento necesita todas las filas, así que aquí sí se arma el DataFrame completo.
+    async with archivo_temporal(archivo) as ruta:
+        try:
+            df = await asyncio.get_running_loop().run_in_executor(
+                None, partial(leer_dataframe, ruta, nombre=archivo.filename)
+            )
+        except ArchivoInvalido as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
     # Validar columnas requeridas
     columnas_faltantes = [c for c in REQUIRED_COLUMNS if c not in df.columns]
@@ -189,9 +188,14 @@ async def aceptar(
     if ent.estado != "completado":
         raise HTTPException(status_code=400, detail=f"Solo se pueden aceptar entrenamientos completados (estado actual: {ent.estado})")
 
+    # Copia de archivos y carga del modelo nuevo fuera del event loop; mientras tanto
+    # las predicciones siguen usando el modelo anterior hasta el cambio de referencia
+    loop = asyncio.get_running_loop()
     try:
-        version = entrenamiento_service.aceptar_modelo(entrenamiento_id, settings.ml_model_dir)
-        entrenamiento_service.recargar_servicio(request.app.state, settings.ml_model_dir)
+        version = await loop.run_in_executor(
+            None, entrenamiento_service.aceptar_modelo, entrenamiento_id, settings.ml_model_dir
+        )
+        await request.app.state.slot_modelo.recargar(settings.ml_model_dir)
     except Exception as e:
         logger.exception("Error al aceptar modelo %d", entrenamiento_id)
         raise HTTPException(status_code=500, detail=f"Error al reemplazar el modelo: {e}")
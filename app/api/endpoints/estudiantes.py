@@ -1,34 +1,33 @@
 """Endpoints de estudiantes (tabla de sección con asistencia y riesgo)."""
+import csv
+import hashlib
+import json
 from datetime import date
-from io import BytesIO
-from typing import Annotated
+from io import BytesIO, StringIO
+from typing import Annotated, AsyncIterator, Literal
 
-import pandas as pd
-from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile, status
 from sqlalchemy import case, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.api.endpoints.auth import get_current_user
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_db
 from app.models import (
     Accion,
     Alerta,
-    Area,
     Asistencia,
     Estudiante,
-    GestionAcademica,
     Inscripcion,
-    MallaCurricular,
     Materia,
     Prediccion,
-    Semestre,
     Usuario,
 )
 from app.models.paralelo import Paralelo
 from app.models.asistencia import EstadoAsistencia
 from app.models.alerta import EstadoAlerta
-from app.models.lote_importacion_estudiante import LoteImportacionEstudiante
+from app.models.lote_importacion_estudiante import ErrorImportacionEstudiante, LoteImportacionEstudiante
+from app.models.lote_prediccion import EstadoLote
 from app.schemas.estudiante import (
     EstudianteSociodemograficoUpdate,
     EstudiantePerfilResponse,
@@ -36,6 +35,7 @@ from app.schemas.estudiante import (
     EstudianteTablaResponse,
     ImportacionErrorItem,
     ImportacionEstudiantesResponse,
+    ImportacionProgresoResponse,
     ImportacionResumen,
     PerfilAccion,
     PerfilAlerta,
@@ -54,10 +54,30 @@ from app.schemas.estudiante import (
     UltimaImportacionEstudiante,
 )
 from app.services.alerta_service import verificar_inasistencias_consecutivas
+from app.services.importacion_estudiantes_service import (
+    ImportacionInvalida,
+    ProcesadorImportacionesEstudiantes,
+    ReporteErroresImportacion,
+    importar_archivo_estudiantes,
+    validar_encabezado,
+)
+from app.services.ingesta_archivos import (
+    ArchivoInvalido,
+    LectorTabular,
+    abrir_lector_async,
+    buscar_carga_previa,
+    guardar_en_temporal,
+    huella_carga,
+)
 
 router = APIRouter(prefix="/estudiantes", tags=["estudiantes"])
 
 
+def get_procesador_importaciones(request: Request) -> ProcesadorImportacionesEstudiantes:
+    """Dependency: obtiene el procesador de importaciones de estudiantes desde app.state."""
+    return request.app.state.procesador_importaciones
+
+
 @router.get(
     "/tabla",
     response_model=EstudianteTablaResponse,
@@ -444,33 +464,6 @@ async def get_estudiante_perfil(
     )
 
 
-# ── Campos sociodemográficos válidos para importación ────────────────
-
-_CAMPOS_SOCIODEMOGRAFICOS = [
-    "fecha_nacimiento", "genero", "grado", "estrato_socioeconomico",
-    "ocupacion_laboral", "con_quien_vive", "apoyo_economico",
-    "modalidad_ingreso", "tipo_colegio",
-]
-
-_COLUMNAS_OBLIGATORIAS = {"Codigo", "Nombre", "Apellido", "Area", "Paralelo"}
-
-
-def _parse_materias(celda: str) -> list[str]:
-    """Extrae nombres de materias de una celda separada por comas."""
-    if not celda or not isinstance(celda, str) or pd.isna(celda):
-        return []
-    return [m.strip() for m in celda.split(",") if m.strip()]
-
-
-def _val(row, col):
-    """Devuelve el valor de la celda como string limpio, o None si está vacío/NaN."""
-    v = row.get(col)
-    if v is None or (isinstance(v, float) and pd.isna(v)):
-        return None
-    s = str(v).strip()
-    return s if s else None
-
-
 # ------------------------------------------------------------------
 # GET /estudiantes/plantilla
 # ------------------------------------------------------------------
@@ -568,353 +561,251 @@ async def descargar_plantilla(
 @router.post(
     "/importar",
     response_model=ImportacionEstudiantesResponse,
-    status_code=status.HTTP_201_CREATED,
+    status_code=status.HTTP_202_ACCEPTED,
     summary="Importar estudiantes desde Excel",
     description=(
-        "Sube un archivo .xlsx con estudiantes. Crea/actualiza estudiantes, "
+        "Sube un archivo .xlsx, .csv o .parquet con estudiantes. Crea/actualiza estudiantes, "
         "genera inscripciones y crea entidades catálogo (áreas, semestres, "
-        "paralelos, materias) si no existen."
+        "paralelos, materias) si no existen. La importación corre en segundo plano: responde de "
+        "inmediato con el lote_id; el avance se consulta en GET /estudiantes/importaciones/{id}/progreso "
+        "y los errores por fila se descargan en GET /estudiantes/importaciones/{id}/errores. "
+        "Con ?dry_run=true solo valida el archivo y devuelve (200) el reporte completo de errores y "
+        "los totales estimados, sin escribir nada."
     ),
 )
 async def importar_estudiantes(
-    archivo: UploadFile = File(..., description="Archivo Excel (.xlsx)"),
+    response: Response,
+    archivo: UploadFile = File(..., description="Archivo .xlsx, .csv o .parquet"),
     nombre_malla: str | None = Form(default=None, description="Malla curricular a asignar a todos los estudiantes del lote (opcional). Debe coincidir con un nombre_malla existente en malla_curricular."),
     db: AsyncSession = Depends(get_db),
     usuario: Usuario = Depends(get_current_user),
+    procesador: ProcesadorImportacionesEstudiantes = Depends(get_procesador_importaciones),
+    forzar: Annotated[
+        bool, Query(description="Importar de nuevo aunque el mismo archivo (con la misma malla) ya se haya importado")
+    ] = False,
+    dry_run: Annotated[
+        bool, Query(description="Solo validar: devuelve el reporte de errores y los totales estimados sin escribir nada")
+    ] = False,
 ):
     # ── Fase 0: Validación del archivo ──────────────────────────────
     nombre_archivo = archivo.filename or "sin_nombre"
-    if not nombre_archivo.lower().endswith(".xlsx"):
+    if not nombre_archivo.lower().endswith((".xlsx", ".csv", ".parquet")):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El archivo debe tener extensión .xlsx",
+            detail="El archivo debe tener extensión .xlsx, .csv o .parquet",
         )
 
-    contenido = await archivo.read()
+    # El procesador lee el temporal por bloques y lo borra al terminar
+    sha256 = hashlib.sha256()
+    ruta = await guardar_en_temporal(archivo, sha256)
     try:
-        df = pd.read_excel(BytesIO(contenido), engine="openpyxl")
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No se pudo leer el archivo. Verifique que sea un Excel válido (.xlsx).",
-        )
-
-    if df.empty:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El archivo Excel está vacío.",
-        )
+        huella = huella_carga(sha256.hexdigest(), nombre_malla)
+        if not forzar and not dry_run:
+            # Los lotes que terminaron en error no cuentan: se pueden volver a subir
+            previo = await buscar_carga_previa(
+                db, LoteImportacionEstudiante, huella, LoteImportacionEstudiante.estado != EstadoLote.ERROR
+            )
+            if previo is not None:
+                ruta.unlink(missing_ok=True)
+                response.status_code = status.HTTP_200_OK
+                return ImportacionEstudiantesResponse(
+                    **_totales_importacion(previo),
+                    nombre_archivo=previo.nombre_archivo,
+                    lote_id=previo.id,
+                    duplicado=True,
+                    estado=previo.estado,
+                    mensaje=(
+                        f"El archivo ya se importó en el lote {previo.id} "
+                        f"({previo.fecha_carga:%Y-%m-%d %H:%M}). Use ?forzar=true para importarlo de nuevo."
+                    ),
+                )
 
-    columnas_presentes = set(df.columns)
-    faltantes = _COLUMNAS_OBLIGATORIAS - columnas_presentes
-    if faltantes:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Faltan columnas obligatorias: {', '.join(sorted(faltantes))}",
+        try:
+            lector = await abrir_lector_async(ruta, nombre=nombre_archivo)
+        except ArchivoInvalido:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No se pudo leer el archivo. Verifique que sea un .xlsx, .csv o .parquet válido.",
+            )
+        with lector:
+            try:
+                validar_encabezado(lector)
+            except ImportacionInvalida as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            if dry_run:
+                try:
+                    response.status_code = status.HTTP_200_OK
+                    return await _simular_importacion(lector, nombre_archivo, nombre_malla, db, usuario)
+                finally:
+                    ruta.unlink(missing_ok=True)
+
+        # Crear el lote y confirmarlo antes de lanzar el worker, que usa sus propias sesiones
+        lote = LoteImportacionEstudiante(
+            nombre_archivo=nombre_archivo,
+            usuario_id=usuario.id,
+            total_filas=lector.filas_estimadas or 0,
+            estado=EstadoLote.PENDIENTE,
+            huella=huella,
         )
+        db.add(lote)
+        await db.commit()
+    except BaseException:
+        ruta.unlink(missing_ok=True)
+        raise
 
-    errores: list[ImportacionErrorItem] = []
-    resumen = ImportacionResumen()
-    estudiantes_creados = 0
-    estudiantes_actualizados = 0
-
-    # ── Fase 1: Pre-carga de entidades existentes ───────────────────
-
-    # Áreas
-    res = await db.execute(select(Area))
-    areas_cache: dict[str, Area] = {a.nombre: a for a in res.scalars().all()}
-
-    # Semestres
-    res = await db.execute(select(Semestre))
-    semestres_cache: dict[str, Semestre] = {s.nombre: s for s in res.scalars().all()}
+    procesador.iniciar(lote.id, ruta, lector.formato, nombre_malla, usuario.id)
 
-    # Materias
-    res = await db.execute(select(Materia))
-    materias_cache: dict[str, Materia] = {m.nombre: m for m in res.scalars().all()}
+    return ImportacionEstudiantesResponse(
+        nombre_archivo=nombre_archivo,
+        total_filas=lote.total_filas,
+        lote_id=lote.id,
+        estado=lote.estado,
+        mensaje="Importación en proceso. Use GET /estudiantes/importaciones/{id}/progreso para consultar el avance.",
+    )
 
-    # Paralelos
-    res = await db.execute(select(Paralelo))
-    paralelos_cache: dict[tuple[str, int], Paralelo] = {
-        (p.nombre, p.area_id): p for p in res.scalars().all()
-    }
 
-    # Gestiones académicas
-    res = await db.execute(select(GestionAcademica))
-    gestiones_cache: dict[str, GestionAcademica] = {
-        g.nombre: g for g in res.scalars().all()
-    }
+async def _simular_importacion(
+    lector: LectorTabular,
+    nombre_archivo: str,
+    nombre_malla: str | None,
+    db: AsyncSession,
+    usuario: Usuario,
+) -> ImportacionEstudiantesResponse:
+    """dry_run: valida el archivo completo y estima los totales sin escribir nada."""
+    reporte = ReporteErroresImportacion()
+    try:
+        totales = await importar_archivo_estudiantes(db, lector, nombre_malla, usuario.id, reporte, simular=True)
+    except (ImportacionInvalida, ArchivoInvalido) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    resumen = totales.pop("resumen")
+    materias_no_encontradas = resumen.pop("materias_no_encontradas")
+    return ImportacionEstudiantesResponse(
+        **totales,
+        nombre_archivo=nombre_archivo,
+        total_errores=reporte.total,
+        errores=[ImportacionErrorItem(**error) for error in reporte.errores],
+        resumen=ImportacionResumen(**resumen),
+        materias_no_encontradas=materias_no_encontradas,
+        dry_run=True,
+        mensaje=(
+            f"Validación sin escritura: {reporte.total} errores en {totales['total_filas']} filas. "
+            "Corrija el archivo y súbalo sin dry_run para importarlo."
+        ),
+    )
 
-    # Estudiantes
-    res = await db.execute(select(Estudiante))
-    estudiantes_cache: dict[str, Estudiante] = {
-        e.codigo_estudiante: e for e in res.scalars().all()
-    }
 
-    # Malla curricular
-    res = await db.execute(select(MallaCurricular))
-    malla_cache: dict[tuple[int | None, int | None, int | None], MallaCurricular] = {
-        (mc.materia_id, mc.area_id, mc.semestre_id): mc for mc in res.scalars().all()
+def _totales_importacion(lote: LoteImportacionEstudiante) -> dict:
+    """Totales y resumen guardados del lote (el resumen solo existe si la importación terminó)."""
+    resumen = dict(lote.resumen or {})
+    materias_no_encontradas = resumen.pop("materias_no_encontradas", [])
+    return {
+        "total_filas": lote.total_filas,
+        "estudiantes_creados": lote.estudiantes_creados,
+        "estudiantes_actualizados": lote.estudiantes_actualizados,
+        "total_errores": lote.total_errores,
+        "resumen": ImportacionResumen(**resumen),
+        "materias_no_encontradas": materias_no_encontradas,
     }
 
-    # ── Fase 2: Pre-creación de entidades catálogo ──────────────────
-
-    # 2.1 Áreas únicas
-    areas_excel = {str(v).strip() for v in df["Area"].dropna().unique() if str(v).strip()}
-    for nombre_area in areas_excel:
-        if nombre_area not in areas_cache:
-            area = Area(nombre=nombre_area)
-            db.add(area)
-            await db.flush()
-            areas_cache[nombre_area] = area
-            resumen.areas_creadas += 1
-
-    # 2.2 Semestres únicos
-    if "Semestre" in df.columns:
-        semestres_excel = {
-            str(v).strip() for v in df["Semestre"].dropna().unique() if str(v).strip()
-        }
-        for nombre_sem in semestres_excel:
-            if nombre_sem not in semestres_cache:
-                semestre = Semestre(nombre=nombre_sem)
-                db.add(semestre)
-                await db.flush()
-                semestres_cache[nombre_sem] = semestre
-                resumen.semestres_creados += 1
-
-    # 2.3 Paralelos únicos (por nombre + área)
-    paralelos_unicos: set[tuple[str, str]] = set()
-    for _, row in df.iterrows():
-        p_nombre = _val(row, "Paralelo")
-        a_nombre = _val(row, "Area")
-        if p_nombre and a_nombre:
-            paralelos_unicos.add((p_nombre, a_nombre))
-
-    for p_nombre, a_nombre in paralelos_unicos:
-        area_obj = areas_cache.get(a_nombre)
-        if not area_obj:
-            continue
-        # Resolver semestre_id si hay columna Semestre en alguna fila con este paralelo+area
-        semestre_id = None
-        if "Semestre" in df.columns:
-            filas_match = df[(df["Paralelo"].astype(str).str.strip() == p_nombre) &
-                            (df["Area"].astype(str).str.strip() == a_nombre)]
-            for _, r in filas_match.iterrows():
-                sem_nombre = _val(r, "Semestre")
-                if sem_nombre and sem_nombre in semestres_cache:
-                    semestre_id = semestres_cache[sem_nombre].id
-                    break
-
-        key = (p_nombre, area_obj.id)
-        if key not in paralelos_cache:
-            paralelo = Paralelo(
-                nombre=p_nombre,
-                area_id=area_obj.id,
-                semestre_id=semestre_id,
-                encargado_id=usuario.id,
-            )
-            db.add(paralelo)
-            await db.flush()
-            paralelos_cache[key] = paralelo
-            resumen.paralelos_creados += 1
-
-    # ── Fase 3: Procesamiento fila por fila ─────────────────────────
-
-    materias_no_encontradas: set[str] = set()
-
-    for idx, row in df.iterrows():
-        fila_num = int(idx) + 2  # +2: encabezado + 0-indexed
-
-        codigo = _val(row, "Codigo")
-        nombre = _val(row, "Nombre")
-        apellido = _val(row, "Apellido")
-        area_nombre = _val(row, "Area")
-        paralelo_nombre = _val(row, "Paralelo")
-
-        # Validar campos obligatorios
-        campos_faltantes = []
-        if not codigo:
-            campos_faltantes.append("Codigo")
-        if not nombre:
-            campos_faltantes.append("Nombre")
-        if not apellido:
-            campos_faltantes.append("Apellido")
-        if not area_nombre:
-            campos_faltantes.append("Area")
-        if not paralelo_nombre:
-            campos_faltantes.append("Paralelo")
-
-        if campos_faltantes:
-            errores.append(ImportacionErrorItem(
-                fila=fila_num,
-                codigo=codigo,
-                mensaje=f"Faltan campos obligatorios: {', '.join(campos_faltantes)}",
-            ))
-            continue
-
-        # Resolver paralelo
-        area_obj = areas_cache.get(area_nombre)
-        if not area_obj:
-            errores.append(ImportacionErrorItem(
-                fila=fila_num, codigo=codigo,
-                mensaje=f"Área '{area_nombre}' no encontrada en cache (error interno)",
-            ))
-            continue
-
-        paralelo_obj = paralelos_cache.get((paralelo_nombre, area_obj.id))
-        if not paralelo_obj:
-            errores.append(ImportacionErrorItem(
-                fila=fila_num, codigo=codigo,
-                mensaje=f"Paralelo '{paralelo_nombre}' no encontrado para área '{area_nombre}'",
-            ))
-            continue
 
-        # Crear o actualizar estudiante
-        try:
-            if codigo in estudiantes_cache:
-                # Actualizar existente
-                est = estudiantes_cache[codigo]
-                est.nombre = nombre
-                est.apellido = apellido
-                est.paralelo_id = paralelo_obj.id
-                # Actualizar campos sociodemográficos sin sobreescribir con null
-                for campo in _CAMPOS_SOCIODEMOGRAFICOS:
-                    if campo in df.columns:
-                        valor = _val(row, campo)
-                        if valor is not None:
-                            if campo == "fecha_nacimiento":
-                                try:
-                                    valor = pd.to_datetime(valor).date()
-                                except Exception:
-                                    pass  # mantener valor actual si no se puede parsear
-                                else:
-                                    setattr(est, campo, valor)
-                            else:
-                                setattr(est, campo, valor)
-                nombre_malla_fila = _val(row, "nombre_malla") if "nombre_malla" in df.columns else None
-                malla_a_asignar = nombre_malla_fila or nombre_malla
-                if malla_a_asignar:
-                    est.nombre_malla = malla_a_asignar
-                estudiantes_actualizados += 1
-            else:
-                # Crear nuevo
-                kwargs: dict = {
-                    "codigo_estudiante": codigo,
-                    "nombre": nombre,
-                    "apellido": apellido,
-                    "paralelo_id": paralelo_obj.id,
-                }
-                for campo in _CAMPOS_SOCIODEMOGRAFICOS:
-                    if campo in df.columns:
-                        valor = _val(row, campo)
-                        if valor is not None:
-                            if campo == "fecha_nacimiento":
-                                try:
-                                    valor = pd.to_datetime(valor).date()
-                                except Exception:
-                                    valor = None
-                            kwargs[campo] = valor
-                est = Estudiante(**kwargs)
-                nombre_malla_fila = _val(row, "nombre_malla") if "nombre_malla" in df.columns else None
-                malla_a_asignar = nombre_malla_fila or nombre_malla
-                if malla_a_asignar:
-                    est.nombre_malla = malla_a_asignar
-                db.add(est)
-                await db.flush()
-                estudiantes_cache[codigo] = est
-                estudiantes_creados += 1
-        except Exception as exc:
-            errores.append(ImportacionErrorItem(
-                fila=fila_num, codigo=codigo,
-                mensaje=f"Error al crear/actualizar estudiante: {exc}",
-            ))
-            continue
-
-        # Procesar materias e inscripciones
-        materias_celda = _val(row, "Materias") if "Materias" in df.columns else None
-        if not materias_celda:
-            continue
-
-        gestion_nombre = _val(row, "GestionAcademica") if "GestionAcademica" in df.columns else None
-        if not gestion_nombre:
-            errores.append(ImportacionErrorItem(
-                fila=fila_num, codigo=codigo,
-                mensaje="Tiene Materias pero falta GestionAcademica",
-            ))
-            continue
+# ------------------------------------------------------------------
+# GET /estudiantes/importaciones/{lote_id}/progreso
+# ------------------------------------------------------------------
+@router.get(
+    "/importaciones/{lote_id}/progreso",
+    response_model=ImportacionProgresoResponse,
+    summary="Progreso de una importación de estudiantes",
+    description="Polling: estado, filas revisadas y errores hasta el momento; al completarse, los totales y el resumen.",
+)
+async def progreso_importacion(
+    lote_id: int,
+    db: AsyncSession = Depends(get_db),
+    _: Usuario = Depends(get_current_user),
+    procesador: ProcesadorImportacionesEstudiantes = Depends(get_procesador_importaciones),
+):
+    lote = await db.get(LoteImportacionEstudiante, lote_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote de importación no encontrado")
+    if lote.total_filas:
+        porcentaje = round(min(100.0, 100 * lote.filas_procesadas / lote.total_filas), 1)
+    else:
+        porcentaje = 100.0 if lote.estado == EstadoLote.COMPLETADO else 0.0
+    totales = _totales_importacion(lote)
+    resumen = totales.pop("resumen")
+    return ImportacionProgresoResponse(
+        **totales,
+        resumen=resumen if lote.resumen is not None else None,
+        id=lote.id,
+        nombre_archivo=lote.nombre_archivo,
+        estado=lote.estado,
+        en_curso=procesador.en_curso(lote.id),
+        fecha_carga=lote.fecha_carga,
+        fecha_fin=lote.fecha_fin,
+        filas_procesadas=lote.filas_procesadas,
+        porcentaje=porcentaje,
+        mensaje_error=lote.mensaje_error,
+    )
 
-        gestion_obj = gestiones_cache.get(gestion_nombre)
-        if not gestion_obj:
-            errores.append(ImportacionErrorItem(
-                fila=fila_num, codigo=codigo,
-                mensaje=f"Gestión académica '{gestion_nombre}' no existe. Debe crearse previamente.",
-            ))
-            continue
 
-        semestre_nombre = _val(row, "Semestre") if "Semestre" in df.columns else None
-        semestre_obj = semestres_cache.get(semestre_nombre) if semestre_nombre else None
+# ------------------------------------------------------------------
+# GET /estudiantes/importaciones/{lote_id}/errores
+# ------------------------------------------------------------------
+@router.get(
+    "/importaciones/{lote_id}/errores",
+    summary="Descargar los errores de una importación",
+    description=(
+        "Descarga los errores por fila del lote (fila, codigo, mensaje) como CSV o NDJSON (una línea JSON "
+        "por error). Se transmite por partes, sin armar el archivo completo en memoria."
+    ),
+)
+async def descargar_errores_importacion(
+    lote_id: int,
+    db: AsyncSession = Depends(get_db),
+    _: Usuario = Depends(get_current_user),
+    formato: Annotated[Literal["csv", "ndjson"], Query(description="csv o ndjson")] = "csv",
+):
+    from fastapi.responses import StreamingResponse
 
-        nombres_materias = _parse_materias(materias_celda)
-        for nombre_mat in nombres_materias:
-            materia_obj = materias_cache.get(nombre_mat)
-            if not materia_obj:
-                materias_no_encontradas.add(nombre_mat)
-                continue
+    lote = await db.get(LoteImportacionEstudiante, lote_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote de importación no encontrado")
 
-            # Malla curricular (usar savepoint para manejar duplicados UNIQUE)
-            malla_key = (materia_obj.id, area_obj.id, semestre_obj.id if semestre_obj else None)
-            if malla_key not in malla_cache:
-                try:
-                    nested_mc = await db.begin_nested()
-                    mc = MallaCurricular(
-                        materia_id=materia_obj.id,
-                        area_id=area_obj.id,
-                        semestre_id=semestre_obj.id if semestre_obj else None,
-                    )
-                    db.add(mc)
-                    await db.flush()
-                    malla_cache[malla_key] = mc
-                    resumen.mallas_creadas += 1
-                except Exception:
-                    await nested_mc.rollback()
-
-            # Inscripción (usar savepoint para manejar duplicados UNIQUE)
-            try:
-                nested = await db.begin_nested()
-                insc = Inscripcion(
-                    estudiante_id=est.id,
-                    materia_id=materia_obj.id,
-                    gestion_academica=gestion_nombre,
-                    gestion_id=gestion_obj.id,
-                )
-                db.add(insc)
-                await db.flush()
-                resumen.inscripciones_creadas += 1
-            except Exception:
-                await nested.rollback()
-                resumen.inscripciones_existentes += 1
-
-    # Registrar el lote de importación para trazabilidad
-    lote = LoteImportacionEstudiante(
-        nombre_archivo=nombre_archivo,
-        usuario_id=usuario.id,
-        total_filas=len(df),
-        estudiantes_creados=estudiantes_creados,
-        estudiantes_actualizados=estudiantes_actualizados,
-        total_errores=len(errores),
+    if formato == "csv":
+        media_type = "text/csv; charset=utf-8"
+    else:
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        _errores_importacion(lote_id, formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=errores_importacion_{lote_id}.{formato}"},
     )
-    db.add(lote)
-    await db.commit()
 
-    return ImportacionEstudiantesResponse(
-        nombre_archivo=nombre_archivo,
-        total_filas=len(df),
-        estudiantes_creados=estudiantes_creados,
-        estudiantes_actualizados=estudiantes_actualizados,
-        total_errores=len(errores),
-        errores=errores,
-        resumen=resumen,
-        materias_no_encontradas=sorted(materias_no_encontradas),
-    )
+
+async def _errores_importacion(lote_id: int, formato: str) -> AsyncIterator[bytes]:
+    """Errores del lote por tandas; la sesión es propia porque la de la request ya se cerró al transmitir."""
+    if formato == "csv":
+        # BOM para que Excel abra el CSV como UTF-8
+        yield "\ufefffila,codigo,mensaje\r\n".encode("utf-8")
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(
+                ErrorImportacionEstudiante.fila,
+                ErrorImportacionEstudiante.codigo,
+                ErrorImportacionEstudiante.mensaje,
+            )
+            .where(ErrorImportacionEstudiante.lote_id == lote_id)
+            .order_by(ErrorImportacionEstudiante.id)
+            .execution_options(yield_per=1000)
+        )
+        async for filas in result.partitions():
+            salida = StringIO()
+            if formato == "csv":
+                csv.writer(salida).writerows(filas)
+            else:
+                for fila, codigo, mensaje in filas:
+                    salida.write(json.dumps({"fila": fila, "codigo": codigo, "mensaje": mensaje}, ensure_ascii=False))
+                    salida.write("\n")
+            yield salida.getvalue().encode("utf-8")
 
 
 @router.get(
@@ -1,5 +1,6 @@
 """Endpoint para importar malla curricular desde Excel."""
-from io import BytesIO
+import asyncio
+from functools import partial
 
 import pandas as pd
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
@@ -8,22 +9,26 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.endpoints.auth import get_current_user
 from app.core.database import get_db
-from app.models import Area, MallaCurricular, Materia, Semestre
+from app.models import Area, Semestre
 from app.models import Usuario
 from app.schemas.malla_curricular import ImportacionMallaErrorItem, ImportacionMallaResponse
+from app.services.importacion_estudiantes_service import insertar_mallas, insertar_materias
+from app.services.ingesta_archivos import (
+    ArchivoInvalido,
+    LectorExcel,
+    archivo_temporal,
+    bloques_async,
+)
 
 router = APIRouter(prefix="/malla-curricular", tags=["malla-curricular"])
 
 _COLUMNAS_REQUERIDAS = {"Nombre Materia", "Area", "Semestre"}
 
 
-def _val(row, col):
-    """Devuelve el valor de la celda como string limpio, o None si está vacío/NaN."""
-    v = row.get(col)
-    if v is None or (isinstance(v, float) and pd.isna(v)):
-        return None
-    s = str(v).strip()
-    return s if s else None
+def _texto(bloque: pd.DataFrame, columna: str) -> pd.Series:
+    """Columna como texto recortado; NaN si la celda está vacía."""
+    texto = bloque[columna].dropna().map(str).str.strip()
+    return texto[texto != ""].reindex(bloque.index).astype(object)
 
 
 @router.post(
@@ -52,127 +57,128 @@ async def importar_malla_curricular(
             detail="El archivo debe tener extensión .xlsx",
         )
 
-    contenido = await archivo.read()
-    try:
-        df = pd.read_excel(BytesIO(contenido), engine="openpyxl")
-        df.columns = df.columns.str.strip()
-    except Exception:
+    async with archivo_temporal(archivo) as ruta:
+        try:
+            lector = await asyncio.get_running_loop().run_in_executor(
+                None, partial(LectorExcel, ruta, recortar_encabezados=True)
+            )
+        except ArchivoInvalido:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No se pudo leer el archivo. Verifique que sea un Excel válido (.xlsx).",
+            )
+        with lector:
+            return await _importar_malla_excel(lector, nombre_archivo, nombre_malla, db)
+
+
+async def _importar_malla_excel(
+    lector: LectorExcel,
+    nombre_archivo: str,
+    nombre_malla: str,
+    db: AsyncSession,
+) -> ImportacionMallaResponse:
+    """Importa la malla en dos pasadas por bloques con un número fijo de sentencias SQL.
+
+    Sin importar el tamaño del archivo: un SELECT de áreas y otro de
+    semestres (solo los citados), un INSERT ... ON CONFLICT (nombre) DO
+    NOTHING de materias más un SELECT de las que ya existían, y un único
+    INSERT ... ON CONFLICT DO NOTHING de la malla contra
+    uq_malla_curricular_materia_area_semestre_nombre.
+    """
+    if not lector.columnas:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No se pudo leer el archivo. Verifique que sea un Excel válido (.xlsx).",
+            detail="El archivo Excel está vacío.",
         )
 
-    if df.empty:
+    faltantes = _COLUMNAS_REQUERIDAS - set(lector.columnas)
+    if faltantes:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El archivo Excel está vacío.",
+            detail=f"Faltan columnas requeridas: {', '.join(sorted(faltantes))}",
         )
 
-    faltantes = _COLUMNAS_REQUERIDAS - set(df.columns)
-    if faltantes:
+    # Primera pasada: nombres citados y total de filas, sin retener las filas
+    nombres_materias: set[str] = set()
+    nombres_areas: set[str] = set()
+    nombres_semestres: set[str] = set()
+    async for bloque in bloques_async(lector):
+        nombres_materias.update(_texto(bloque, "Nombre Materia").dropna())
+        nombres_areas.update(_texto(bloque, "Area").dropna())
+        nombres_semestres.update(_texto(bloque, "Semestre").dropna())
+    total_filas = lector.filas_leidas
+
+    if total_filas == 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Faltan columnas requeridas: {', '.join(sorted(faltantes))}",
+            detail="El archivo Excel está vacío.",
         )
 
-    errores: list[ImportacionMallaErrorItem] = []
-    registros_creados = 0
-    materias_creadas = 0
-    ya_existentes = 0
-
-    # ── Fase 1: Pre-carga de catálogos ──────────────────────────────
-
-    res = await db.execute(select(Area))
-    areas_cache: dict[str, Area] = {a.nombre: a for a in res.scalars().all()}
-
-    res = await db.execute(select(Semestre))
-    semestres_cache: dict[str, Semestre] = {s.nombre: s for s in res.scalars().all()}
-
-    res = await db.execute(select(Materia))
-    materias_cache: dict[str, Materia] = {m.nombre: m for m in res.scalars().all()}
-
-    res = await db.execute(select(MallaCurricular))
-    malla_cache: dict[tuple[int, int, int, str | None], MallaCurricular] = {
-        (mc.materia_id, mc.area_id, mc.semestre_id, mc.nombre_malla): mc
-        for mc in res.scalars().all()
-        if mc.materia_id is not None and mc.area_id is not None and mc.semestre_id is not None
-    }
-
-    # ── Fase 2: Pre-creación de materias nuevas ──────────────────────
-    nombres_materias = {
-        str(v).strip()
-        for v in df["Nombre Materia"].dropna().unique()
-        if str(v).strip()
-    }
-    for nombre_materia in nombres_materias:
-        if nombre_materia not in materias_cache:
-            nueva_materia = Materia(nombre=nombre_materia)
-            db.add(nueva_materia)
-            await db.flush()
-            materias_cache[nombre_materia] = nueva_materia
-            materias_creadas += 1
-
-    # ── Fase 3: Fila por fila ────────────────────────────────────────
-    for idx, row in df.iterrows():
-        fila_num = int(idx) + 2  # +2 porque idx es 0-based y la fila 1 es el encabezado
-
-        nombre_materia = _val(row, "Nombre Materia")
-        nombre_area = _val(row, "Area")
-        nombre_semestre = _val(row, "Semestre")
-
-        if not nombre_materia:
-            errores.append(ImportacionMallaErrorItem(fila=fila_num, detalle="'Nombre Materia' está vacío"))
-            continue
-        if not nombre_area:
-            errores.append(ImportacionMallaErrorItem(fila=fila_num, detalle="'Area' está vacío"))
-            continue
-        if not nombre_semestre:
-            errores.append(ImportacionMallaErrorItem(fila=fila_num, detalle="'Semestre' está vacío"))
-            continue
-
-        area = areas_cache.get(nombre_area)
-        if not area:
-            errores.append(
-                ImportacionMallaErrorItem(
-                    fila=fila_num,
-                    detalle=f"El área '{nombre_area}' no existe en el sistema. Solo se pueden usar áreas previamente registradas.",
-                )
-            )
-            continue
-
-        semestre = semestres_cache.get(nombre_semestre)
-        if not semestre:
-            errores.append(
-                ImportacionMallaErrorItem(
-                    fila=fila_num,
-                    detalle=f"El semestre '{nombre_semestre}' no existe en el sistema. Solo se pueden usar semestres previamente registrados.",
-                )
-            )
-            continue
+    # ── Fase 1: Catálogos citados ───────────────────────────────────
+    res = await db.execute(select(Area.nombre, Area.id).where(Area.nombre.in_(nombres_areas)))
+    areas: dict[str, int] = dict(res.tuples().all())
 
-        materia = materias_cache[nombre_materia]
+    res = await db.execute(select(Semestre.nombre, Semestre.id).where(Semestre.nombre.in_(nombres_semestres)))
+    semestres: dict[str, int] = dict(res.tuples().all())
 
-        clave = (materia.id, area.id, semestre.id, nombre_malla)
-        if clave in malla_cache:
-            ya_existentes += 1
-            continue
+    # ── Fase 2: Materias (las nuevas se crean en un solo INSERT) ────
+    materias, materias_creadas = await insertar_materias(db, nombres_materias)
 
-        nuevo_registro = MallaCurricular(
-            materia_id=materia.id,
-            area_id=area.id,
-            semestre_id=semestre.id,
-            nombre_malla=nombre_malla,
+    # ── Fase 3: Validación por bloques con operaciones por columna ──
+    errores: list[ImportacionMallaErrorItem] = []
+    claves: set[tuple[int, int, int]] = set()
+    filas_validas = 0
+    async for bloque in bloques_async(lector):
+        materia = _texto(bloque, "Nombre Materia")
+        area = _texto(bloque, "Area")
+        semestre = _texto(bloque, "Semestre")
+        area_id = area.map(areas)
+        semestre_id = semestre.map(semestres)
+
+        # Mismo orden de validación que antes: a lo sumo un error por fila
+        detalles = pd.Series(None, index=bloque.index, dtype=object)
+        for invalida, detalle in (
+            (materia.isna(), "'Nombre Materia' está vacío"),
+            (area.isna(), "'Area' está vacío"),
+            (semestre.isna(), "'Semestre' está vacío"),
+            (
+                area_id.isna(),
+                "El área '" + area + "' no existe en el sistema. "
+                "Solo se pueden usar áreas previamente registradas.",
+            ),
+            (
+                semestre_id.isna(),
+                "El semestre '" + semestre + "' no existe en el sistema. "
+                "Solo se pueden usar semestres previamente registrados.",
+            ),
+        ):
+            pendiente = detalles.isna() & invalida
+            detalles[pendiente] = detalle[pendiente] if isinstance(detalle, pd.Series) else detalle
+
+        rechazadas = detalles.notna()
+        errores.extend(
+            ImportacionMallaErrorItem(fila=int(idx) + 2, detalle=detalle)  # +2: encabezado y base 0
+            for idx, detalle in detalles[rechazadas].items()
         )
-        db.add(nuevo_registro)
-        await db.flush()
-        malla_cache[clave] = nuevo_registro
-        registros_creados += 1
+        validas = ~rechazadas
+        filas_validas += int(validas.sum())
+        claves.update(zip(
+            materia[validas].map(materias).astype(int).tolist(),
+            area_id[validas].astype(int).tolist(),
+            semestre_id[validas].astype(int).tolist(),
+        ))
+
+    # ── Fase 4: Malla en un solo INSERT ... ON CONFLICT DO NOTHING ──
+    # Las cuatro columnas de la clave vienen informadas, así que la
+    # constraint descarta todas las combinaciones que ya existían
+    registros_creados = await insertar_mallas(db, claves, nombre_malla)
 
     return ImportacionMallaResponse(
         nombre_archivo=nombre_archivo,
-        filas_procesadas=len(df),
+        filas_procesadas=total_filas,
         registros_creados=registros_creados,
         materias_creadas=materias_creadas,
-        ya_existentes=ya_existentes,
+        # Repetidas dentro del archivo o ya registradas en la malla
+        ya_existentes=filas_validas - registros_creados,
         errores=errores,
     )
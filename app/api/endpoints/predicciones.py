@@ -1,14 +1,13 @@
 """Endpoints de predicciones de abandono (masiva, individual, historial, lotes, dashboard)."""
+import hashlib
 import logging
 import math
 from datetime import date
-from typing import Annotated
-from io import BytesIO
+from typing import Annotated, AsyncIterator
 
 logger = logging.getLogger(__name__)
 
-import pandas as pd
-from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -20,6 +19,8 @@ from app.models import (
     Accion,
     Alerta,
     Area,
+    EjecucionRefresco,
+    EstadoLote,
     Estudiante,
     LotePrediccion,
     NivelRiesgo,
@@ -33,11 +34,14 @@ from app.schemas.prediccion import (
     DashboardResponse,
     DistribucionParaleloItem,
     DistribucionRiesgoItem,
+    EjecucionRefrescoItem,
+    EjecucionRefrescoListResponse,
     EstudianteEvolucionResponse,
     EvolucionItem,
     LoteDetalleResponse,
     LotePrediccionItem,
     LotePrediccionListResponse,
+    LoteProgresoResponse,
     PrediccionHistorialItem,
     PrediccionHistorialResponse,
     PrediccionIndividualRequest,
@@ -47,33 +51,58 @@ from app.schemas.prediccion import (
     UltimaImportacionMasiva,
 )
 from app.services import alerta_service
+from app.services.inferencia_service import AgrupadorPredicciones, EjecutorInferencia
+from app.services.ingesta_archivos import (
+    ArchivoInvalido,
+    abrir_lector_async,
+    buscar_carga_previa,
+    guardar_en_temporal,
+    huella_carga,
+)
+from app.services.prediccion_lote_service import (
+    FiltrosRescoring,
+    ProcesadorLotesPrediccion,
+    contar_rescoring,
+    guardar_archivo_lote,
+)
 from app.services.prediccion_service import PrediccionService
+from app.services.refresco_service import USUARIO_REFRESCO, RefrescoRiesgo
 
 router = APIRouter(prefix="/predicciones", tags=["predicciones"])
 
-# Normalización de valores del Excel antes de guardar en BD.
-# Los CHECK constraints de estudiantes requieren valores sin acento,
-# alineados con las clases del label_encoders.pkl del modelo ML.
-_NORMALIZAR_EXCEL: dict[str, dict[str, str]] = {
-    "tipo_colegio": {
-        "Público": "Publico",
-    },
-    "modalidad_ingreso": {
-        "Prueba de Suficiencia Académica": "Prueba de Suficiencia Academica",
-        "Admisión Especial": "Admision Especial",
-    },
-}
-
-
-def get_prediccion_service(request: Request) -> PrediccionService:
-    """Dependency: obtiene el servicio ML desde app.state."""
-    svc = request.app.state.prediccion_service
-    if svc is None:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Modelo ML no disponible. Verifique que los artefactos .pkl estén en el directorio configurado.",
-        )
-    return svc
+async def get_prediccion_service(request: Request) -> AsyncIterator[PrediccionService]:
+    """Dependency: arrienda el servicio ML activo durante toda la solicitud.
+
+    Si el modelo se recarga mientras tanto, la solicitud termina sobre el
+    servicio que tomó; ese servicio se cierra cuando lo sueltan todas.
+    """
+    with request.app.state.slot_modelo.arrendar() as svc:
+        if svc is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Modelo ML no disponible. Verifique que modelo.bundle (o los artefactos .pkl) esté en el directorio configurado.",
+            )
+        yield svc
+
+
+def get_agrupador_predicciones(request: Request) -> AgrupadorPredicciones:
+    """Dependency: obtiene el micro-batcher de predicciones individuales desde app.state."""
+    return request.app.state.agrupador_predicciones
+
+
+def get_ejecutor_inferencia(request: Request) -> EjecutorInferencia:
+    """Dependency: obtiene el pool dedicado de inferencia desde app.state."""
+    return request.app.state.ejecutor_inferencia
+
+
+def get_procesador_lotes(request: Request) -> ProcesadorLotesPrediccion:
+    """Dependency: obtiene el procesador de lotes de predicción masiva desde app.state."""
+    return request.app.state.procesador_lotes
+
+
+def get_refresco_riesgo(request: Request) -> RefrescoRiesgo:
+    """Dependency: obtiene el programador del refresco de riesgo desde app.state."""
+    return request.app.state.refresco_riesgo
 
 
 # ------------------------------------------------------------------
@@ -91,6 +120,7 @@ async def prediccion_individual(
     db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(get_current_user),
     ml: PrediccionService = Depends(get_prediccion_service),
+    agrupador: AgrupadorPredicciones = Depends(get_agrupador_predicciones),
 ):
     # Buscar estudiante con su paralelo → semestre y área
     q = (
@@ -111,8 +141,8 @@ async def prediccion_individual(
     # Armar features
     features = _armar_features(estudiante, body.datos_academicos, body.datos_sociodemograficos)
 
-    # Predecir
-    probabilidad, nivel_riesgo, clasificacion = ml.predecir(features)
+    # Predecir (agrupado con otras solicitudes concurrentes en un solo predecir_lote)
+    probabilidad, nivel_riesgo, clasificacion = await agrupador.predecir(ml, features)
 
     # Guardar predicción
     prediccion = Prediccion(
@@ -145,129 +175,235 @@ async def prediccion_individual(
     )
 
 
+# ------------------------------------------------------------------
+# GET /predicciones/metricas-inferencia
+# ------------------------------------------------------------------
+@router.get(
+    "/metricas-inferencia",
+    summary="Métricas de inferencia",
+    description="Tamaño de los micro-lotes de predicción individual, tiempo de espera en cola, ocupación del ejecutor , aciertos de la cache y estado del modelo activo (versión, arriendos, recargas).",
+)
+async def metricas_inferencia(
+    request: Request,
+    _: Usuario = Depends(get_current_user),
+    agrupador: AgrupadorPredicciones = Depends(get_agrupador_predicciones),
+    ejecutor: EjecutorInferencia = Depends(get_ejecutor_inferencia),
+):
+    slot = request.app.state.slot_modelo
+    ml = slot.activo
+    cache = ml.cache.metricas() if ml is not None and ml.cache is not None else None
+    return {
+        "microlotes": agrupador.metricas(),
+        "ejecutor": ejecutor.metricas(),
+        "cache": cache,
+        "modelo": slot.metricas(),
+    }
+
+
 # ------------------------------------------------------------------
 # POST /predicciones/masiva
 # ------------------------------------------------------------------
 @router.post(
     "/masiva",
-    status_code=status.HTTP_201_CREATED,
+    status_code=status.HTTP_202_ACCEPTED,
     summary="Predicción masiva (Excel)",
-    description="Sube un archivo Excel (.xlsx) y genera predicciones para todos los estudiantes.",
+    description=(
+        "Sube un archivo (.xlsx, .csv o .parquet) y genera predicciones para todos los estudiantes en segundo plano. "
+        "Responde de inmediato con el lote_id; el avance se consulta en GET /predicciones/lotes/{id}/progreso. "
+        "Si el mismo archivo ya se procesó con el mismo modelo y gestión, devuelve ese lote (200) "
+        "salvo que se indique ?forzar=true."
+    ),
 )
 async def prediccion_masiva(
-    archivo: UploadFile = File(..., description="Archivo Excel (.xlsx)"),
+    response: Response,
+    archivo: UploadFile = File(..., description="Archivo .xlsx, .csv o .parquet"),
     db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(get_current_user),
-    ml: PrediccionService = Depends(get_prediccion_service),
+    _ml: PrediccionService = Depends(get_prediccion_service),
+    ejecutor: EjecutorInferencia = Depends(get_ejecutor_inferencia),
+    procesador: ProcesadorLotesPrediccion = Depends(get_procesador_lotes),
     gestion_id: Annotated[int | None, Query(description="ID de la gestión académica")] = None,
+    forzar: Annotated[
+        bool, Query(description="Procesar de nuevo aunque ya exista un lote con el mismo archivo, modelo y gestión")
+    ] = False,
 ):
-    if not archivo.filename or not archivo.filename.endswith(".xlsx"):
-        raise HTTPException(status_code=400, detail="El archivo debe ser .xlsx")
-
-    # Leer Excel
+    # Rechazar de entrada (503) si el ejecutor de inferencia está saturado
+    ejecutor.verificar_capacidad()
+
+    # Copiar el upload a disco (hasheándolo en la misma pasada) y validar el
+    # encabezado sin cargar las filas; el procesador lee el archivo por
+    # bloques y lo borra al terminar.
+    sha256 = hashlib.sha256()
+    ruta = await guardar_en_temporal(archivo, sha256)
     try:
-        contents = await archivo.read()
-        df = pd.read_excel(BytesIO(contents), engine="openpyxl")
-    except Exception as e:
-        logger.exception("Error al leer el archivo Excel: %s", e)
-        raise HTTPException(status_code=400, detail=f"Error al leer el archivo: {e}")
+        huella = huella_carga(sha256.hexdigest(), _ml.version_modelo, gestion_id)
+        if not forzar:
+            # Los lotes que terminaron en error no cuentan: se pueden volver a subir
+            previo = await buscar_carga_previa(db, LotePrediccion, huella, LotePrediccion.estado != EstadoLote.ERROR)
+            if previo is not None:
+                ruta.unlink(missing_ok=True)
+                response.status_code = status.HTTP_200_OK
+                return {
+                    "lote_id": previo.id,
+                    "nombre_archivo": previo.nombre_archivo,
+                    "estado": previo.estado,
+                    "total_estudiantes": previo.total_estudiantes,
+                    "duplicado": True,
+                    "mensaje": (
+                        f"El archivo ya se procesó en el lote {previo.id} con el mismo modelo y gestión. "
+                        "Use ?forzar=true para procesarlo de nuevo."
+                    ),
+                }
 
-    if "Codigo" not in df.columns:
-        raise HTTPException(status_code=400, detail="El archivo debe tener una columna 'Codigo'")
+        try:
+            lector = await abrir_lector_async(ruta, nombre=archivo.filename)
+        except ArchivoInvalido as e:
+            logger.warning("Error al leer el archivo de predicción masiva: %s", e)
+            raise HTTPException(status_code=400, detail=str(e))
+        with lector:
+            if "Codigo" not in lector.columnas:
+                raise HTTPException(status_code=400, detail="El archivo debe tener una columna 'Codigo'")
+            total_estimado = lector.filas_estimadas or 0
+
+        # Crear lote y confirmarlo antes de lanzar el worker, que usa sus propias sesiones
+        lote = LotePrediccion(
+            nombre_archivo=archivo.filename,
+            usuario_id=current_user.id,
+            gestion_id=gestion_id,
+            estado=EstadoLote.PENDIENTE,
+            total_estudiantes=total_estimado,
+            version_modelo=PrediccionService.VERSION,
+            huella=huella,
+        )
+        db.add(lote)
+        await db.flush()
+        # Copia del archivo en la base, por partes, para reanudar el lote si el
+        # servidor se reinicia a mitad de camino; se borra cuando el lote termina
+        await guardar_archivo_lote(db, lote.id, ruta, lector.formato)
+        await db.commit()
+    except BaseException:
+        ruta.unlink(missing_ok=True)
+        raise
 
-    # Crear lote
+    procesador.iniciar(lote.id, ruta, lector.formato, gestion_id)
+
+    return {
+        "lote_id": lote.id,
+        "nombre_archivo": lote.nombre_archivo,
+        "estado": lote.estado,
+        "total_estudiantes": lote.total_estudiantes,
+        "duplicado": False,
+        "mensaje": "Lote en proceso. Use GET /predicciones/lotes/{id}/progreso para consultar el avance.",
+    }
+
+
+# ------------------------------------------------------------------
+# POST /predicciones/rescoring
+# ------------------------------------------------------------------
+@router.post(
+    "/rescoring",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Re-puntuar estudiantes con el modelo activo",
+    description=(
+        "Vuelve a predecir, en segundo plano, a todos los estudiantes o a los de un paralelo, área o gestión, "
+        "con los datos sociodemográficos de la BD y las notas de su última predicción. Las predicciones quedan "
+        "en un lote nuevo; el avance (y las filas por segundo) se consulta en GET /predicciones/lotes/{id}/progreso."
+    ),
+)
+async def rescoring(
+    db: AsyncSession = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user),
+    _ml: PrediccionService = Depends(get_prediccion_service),
+    procesador: ProcesadorLotesPrediccion = Depends(get_procesador_lotes),
+    paralelo_id: Annotated[int | None, Query(description="Solo estudiantes de este paralelo")] = None,
+    area_id: Annotated[int | None, Query(description="Solo estudiantes de paralelos de esta área")] = None,
+    gestion_id: Annotated[
+        int | None, Query(description="Solo estudiantes inscritos en esta gestión (las predicciones quedan asociadas a ella)")
+    ] = None,
+):
+    filtros = FiltrosRescoring(paralelo_id=paralelo_id, gestion_id=gestion_id, area_id=area_id)
+    total = await contar_rescoring(db, filtros)
+    if total == 0:
+        raise HTTPException(status_code=404, detail="No hay estudiantes que coincidan con los filtros")
+
+    descripcion = ", ".join(
+        f"{campo} {valor}"
+        for campo, valor in (("paralelo", paralelo_id), ("área", area_id), ("gestión", gestion_id))
+        if valor is not None
+    )
     lote = LotePrediccion(
-        nombre_archivo=archivo.filename,
+        nombre_archivo=f"Re-puntuación: {descripcion or 'todos los estudiantes'}",
         usuario_id=current_user.id,
         gestion_id=gestion_id,
-        estado="procesando",
-        total_estudiantes=len(df),
+        estado=EstadoLote.PENDIENTE,
+        total_estudiantes=total,
         version_modelo=PrediccionService.VERSION,
     )
     db.add(lote)
     await db.flush()
+    await db.commit()
 
-    # Buscar todos los estudiantes con sus paralelos
-    codigos = df["Codigo"].dropna().astype(str).tolist()
-    q = (
-        select(Estudiante)
-        .options(
-            selectinload(Estudiante.paralelo).selectinload(Paralelo.area),
-            selectinload(Estudiante.paralelo).selectinload(Paralelo.semestre),
-        )
-        .where(Estudiante.codigo_estudiante.in_(codigos))
-    )
-    result = await db.execute(q)
-    estudiantes_map = {e.codigo_estudiante: e for e in result.scalars().unique().all()}
-
-    contadores = {"Bajo": 0, "Medio": 0, "Alto": 0, "Critico": 0}
-    procesados = 0
-    errores = []
-
-    for _, row in df.iterrows():
-        codigo = str(row.get("Codigo", "")).strip()
-        estudiante = estudiantes_map.get(codigo)
-        if not estudiante:
-            errores.append(f"Estudiante no encontrado: {codigo}")
-            continue
-
-        # Actualizar datos sociodemográficos del estudiante desde el Excel
-        _actualizar_estudiante_desde_excel(estudiante, row)
-
-        # Armar features desde el Excel
-        features = _armar_features_desde_excel(estudiante, row)
-
-        try:
-            probabilidad, nivel_riesgo, clasificacion = ml.predecir(features)
-        except Exception as exc:
-            logger.exception("Fallo en predicción ML para código %s", codigo)
-            errores.append(f"Error al predecir {codigo}: {type(exc).__name__}: {exc}")
-            continue
-
-        prediccion = Prediccion(
-            probabilidad_abandono=probabilidad,
-            nivel_riesgo=nivel_riesgo,
-            fecha_prediccion=date.today(),
-            estudiante_id=estudiante.id,
-            lote_id=lote.id,
-            gestion_id=gestion_id,
-            tipo="masiva",
-            features_utilizadas=features,
-            version_modelo=PrediccionService.VERSION,
-        )
-        db.add(prediccion)
-        await db.flush()
-
-        # Generar alerta si corresponde
-        await alerta_service.generar_alertas_prediccion(
-            estudiante.id, prediccion.id, nivel_riesgo, probabilidad, db
-        )
-
-        contadores[nivel_riesgo] = contadores.get(nivel_riesgo, 0) + 1
-        procesados += 1
-
-    # Actualizar lote
-    lote.estado = "completado"
-    lote.total_procesados = procesados
-    lote.total_bajo_riesgo = contadores["Bajo"]
-    lote.total_medio_riesgo = contadores["Medio"]
-    lote.total_alto_riesgo = contadores["Alto"]
-    lote.total_critico = contadores["Critico"]
-    if errores:
-        lote.mensaje_error = "; ".join(errores[:20])
+    procesador.iniciar_rescoring(lote.id, filtros)
 
     return {
         "lote_id": lote.id,
         "nombre_archivo": lote.nombre_archivo,
         "estado": lote.estado,
         "total_estudiantes": lote.total_estudiantes,
-        "total_procesados": procesados,
-        "total_alto_riesgo": contadores["Alto"],
-        "total_critico": contadores["Critico"],
-        "errores": errores[:20] if errores else [],
+        "mensaje": "Re-puntuación en proceso. Use GET /predicciones/lotes/{id}/progreso para consultar el avance.",
     }
 
 
+# ------------------------------------------------------------------
+# POST /predicciones/refresco
+# ------------------------------------------------------------------
+@router.post(
+    "/refresco",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Lanzar el refresco de riesgo",
+    description=(
+        "Corre ahora, en segundo plano, el mismo refresco que el programado: re-puntúa a los estudiantes "
+        "con cambios desde el último refresco completado (o a todos si cambió la versión del modelo)."
+    ),
+)
+async def lanzar_refresco(
+    _: Usuario = Depends(get_current_user),
+    _ml: PrediccionService = Depends(get_prediccion_service),
+    refresco: RefrescoRiesgo = Depends(get_refresco_riesgo),
+):
+    if not refresco.lanzar():
+        raise HTTPException(status_code=409, detail="Ya hay un refresco de riesgo en curso")
+    return {"mensaje": "Refresco en proceso. Use GET /predicciones/refresco/ejecuciones para ver el resultado."}
+
+
+# ------------------------------------------------------------------
+# GET /predicciones/refresco/ejecuciones
+# ------------------------------------------------------------------
+@router.get(
+    "/refresco/ejecuciones",
+    response_model=EjecucionRefrescoListResponse,
+    summary="Historial del refresco de riesgo",
+    description="Programación vigente y últimas corridas con candidatos, re-puntuados, errores, duración y filas por segundo.",
+)
+async def listar_ejecuciones_refresco(
+    db: AsyncSession = Depends(get_db),
+    _: Usuario = Depends(get_current_user),
+    refresco: RefrescoRiesgo = Depends(get_refresco_riesgo),
+    limite: Annotated[int, Query(ge=1, le=200, description="Cantidad de corridas a devolver")] = 20,
+):
+    result = await db.execute(
+        select(EjecucionRefresco).order_by(EjecucionRefresco.fecha_inicio.desc()).limit(limite)
+    )
+    return EjecucionRefrescoListResponse(
+        programacion=refresco.cron.expresion if refresco.cron is not None else None,
+        proxima_ejecucion=refresco.proxima(),
+        en_curso=refresco.en_curso,
+        ejecuciones=[
+            EjecucionRefrescoItem.model_validate(e, from_attributes=True) for e in result.scalars().all()
+        ],
+    )
+
+
 # ------------------------------------------------------------------
 # GET /predicciones/plantilla
 # ------------------------------------------------------------------
@@ -535,7 +671,7 @@ async def listar_lotes(
             id=l.id,
             nombre_archivo=l.nombre_archivo,
             fecha_carga=l.fecha_carga,
-            usuario_nombre=l.usuario.nombre,
+            usuario_nombre=l.usuario.nombre if l.usuario else USUARIO_REFRESCO,
             estado=l.estado,
             total_estudiantes=l.total_estudiantes,
             total_procesados=l.total_procesados,
@@ -594,7 +730,7 @@ async def detalle_lote(
         id=lote.id,
         nombre_archivo=lote.nombre_archivo,
         fecha_carga=lote.fecha_carga,
-        usuario_nombre=lote.usuario.nombre,
+        usuario_nombre=lote.usuario.nombre if lote.usuario else USUARIO_REFRESCO,
         estado=lote.estado,
         total_estudiantes=lote.total_estudiantes,
         total_procesados=lote.total_procesados,
@@ -607,6 +743,53 @@ async def detalle_lote(
     )
 
 
+# ------------------------------------------------------------------
+# GET /predicciones/lotes/{lote_id}/progreso
+# ------------------------------------------------------------------
+@router.get(
+    "/lotes/{lote_id}/progreso",
+    response_model=LoteProgresoResponse,
+    summary="Progreso de un lote",
+    description="Polling: filas procesadas, errores y contadores de riesgo confirmados hasta el momento.",
+)
+async def progreso_lote(
+    lote_id: int,
+    db: AsyncSession = Depends(get_db),
+    _: Usuario = Depends(get_current_user),
+    procesador: ProcesadorLotesPrediccion = Depends(get_procesador_lotes),
+):
+    lote = await db.get(LotePrediccion, lote_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote no encontrado")
+    return _progreso_lote(lote, procesador)
+
+
+# ------------------------------------------------------------------
+# POST /predicciones/lotes/{lote_id}/cancelar
+# ------------------------------------------------------------------
+@router.post(
+    "/lotes/{lote_id}/cancelar",
+    response_model=LoteProgresoResponse,
+    summary="Cancelar un lote en proceso",
+    description="Detiene el procesamiento; los bloques ya guardados se conservan y el lote queda en estado error.",
+)
+async def cancelar_lote(
+    lote_id: int,
+    db: AsyncSession = Depends(get_db),
+    _: Usuario = Depends(get_current_user),
+    procesador: ProcesadorLotesPrediccion = Depends(get_procesador_lotes),
+):
+    lote = await db.get(LotePrediccion, lote_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote no encontrado")
+    if not procesador.cancelar(lote_id):
+        raise HTTPException(status_code=409, detail=f"El lote no está en proceso (estado actual: {lote.estado})")
+    # Esperar a que el worker registre la cancelación
+    await procesador.esperar(lote_id)
+    await db.refresh(lote)
+    return _progreso_lote(lote, procesador)
+
+
 # ------------------------------------------------------------------
 # GET /predicciones/dashboard
 # ------------------------------------------------------------------
@@ -764,6 +947,29 @@ async def resumen_importaciones_masivas(
 # ------------------------------------------------------------------
 # Utilidades privadas
 # ------------------------------------------------------------------
+def _progreso_lote(lote: LotePrediccion, procesador: ProcesadorLotesPrediccion) -> LoteProgresoResponse:
+    revisadas = lote.total_procesados + lote.total_errores
+    if lote.total_estudiantes:
+        porcentaje = round(min(100.0, 100 * revisadas / lote.total_estudiantes), 1)
+    else:
+        porcentaje = 100.0 if lote.estado == EstadoLote.COMPLETADO else 0.0
+    return LoteProgresoResponse(
+        id=lote.id,
+        estado=lote.estado,
+        en_curso=procesador.en_curso(lote.id),
+        total_estudiantes=lote.total_estudiantes,
+        total_procesados=lote.total_procesados,
+        total_errores=lote.total_errores,
+        porcentaje=porcentaje,
+        total_alto_riesgo=lote.total_alto_riesgo,
+        total_medio_riesgo=lote.total_medio_riesgo,
+        total_bajo_riesgo=lote.total_bajo_riesgo,
+        total_critico=lote.total_critico,
+        mensaje_error=lote.mensaje_error,
+        filas_por_segundo=procesador.filas_por_segundo(lote.id, revisadas),
+    )
+
+
 def _armar_features(estudiante, datos_acad, datos_socio=None) -> dict:
     """Arma el dict de features para el modelo ML."""
     # Datos académicos
@@ -808,74 +1014,3 @@ def _armar_features(estudiante, datos_acad, datos_socio=None) -> dict:
         features["tipo_colegio"] = estudiante.tipo_colegio
 
     return features
-
-
-def _actualizar_estudiante_desde_excel(estudiante, row) -> None:
-    """Actualiza los datos sociodemográficos del estudiante con los valores del Excel.
-
-    Solo sobreescribe si el valor del Excel no es nulo/vacío.
-    """
-    # Mapeo: columna Excel → atributo del modelo Estudiante
-    campos_socio = {
-        "Grado": "grado",
-        "Genero": "genero",
-        "estrato_socioeconomico": "estrato_socioeconomico",
-        "ocupacion_laboral": "ocupacion_laboral",
-        "con_quien_vive": "con_quien_vive",
-        "apoyo_economico": "apoyo_economico",
-        "modalidad_ingreso": "modalidad_ingreso",
-        "tipo_colegio": "tipo_colegio",
-    }
-    for col_excel, attr in campos_socio.items():
-        val = row.get(col_excel)
-        if val is not None and not (isinstance(val, float) and pd.isna(val)):
-            val_str = str(val).strip()
-            if val_str:
-                # Normalizar valores acentuados para cumplir CHECK constraints de BD
-                val_str = _NORMALIZAR_EXCEL.get(col_excel, {}).get(val_str, val_str)
-                setattr(estudiante, attr, val_str)
-
-    # Edad → fecha_nacimiento (si viene edad y no tiene fecha_nacimiento)
-    edad_val = row.get("edad")
-    if edad_val is not None and not (isinstance(edad_val, float) and pd.isna(edad_val)):
-        if estudiante.fecha_nacimiento is None:
-            try:
-                edad_int = int(edad_val)
-                estudiante.fecha_nacimiento = date(date.today().year - edad_int, 1, 1)
-            except (ValueError, TypeError):
-                pass
-
-
-def _armar_features_desde_excel(estudiante, row) -> dict:
-    """Arma features desde una fila del DataFrame Excel."""
-    features: dict = {}
-
-    # Numéricas del Excel
-    for col_excel, col_model in [("Mat", "Mat"), ("Rep", "Rep"), ("2T", "2T"), ("Prom", "Prom"), ("edad", "edad")]:
-        val = row.get(col_excel)
-        features[col_model] = None if pd.isna(val) else val
-
-    # Semestre y Carrera del paralelo
-    paralelo = estudiante.paralelo
-    if paralelo and paralelo.semestre:
-        features["Semestre"] = paralelo.semestre.nombre.split()[0] if paralelo.semestre.nombre else None
-    if paralelo and paralelo.area:
-        features["Carrera"] = paralelo.area.nombre
-
-    # Sociodemográficas: Excel tiene prioridad, luego BD
-    socio_cols = [
-        "Grado", "Genero", "estrato_socioeconomico", "ocupacion_laboral",
-        "con_quien_vive", "apoyo_economico", "modalidad_ingreso", "tipo_colegio",
-    ]
-    for col in socio_cols:
-        val = row.get(col)
-        if val is not None and not (isinstance(val, float) and pd.isna(val)):
-            features[col] = val
-        else:
-            features[col] = getattr(estudiante, col.lower() if col[0].isupper() else col, None)
-
-    # Edad: del Excel o de la BD
-    if features.get("edad") is None and estudiante.fecha_nacimiento:
-        features["edad"] = date.today().year - estudiante.fecha_nacimiento.year
-
-    return features
@@ -18,6 +18,27 @@ class Settings(BaseSettings):
 
     # Machine Learning
     ml_model_dir: str = "ml_models"
+    # Ejecutor de inferencia: hilos dedicados y máximo de trabajos en espera (luego 503 + Retry-After)
+    ml_inferencia_workers: int = 2
+    ml_inferencia_max_cola: int = 8
+    ml_inferencia_retry_after_s: int = 2
+    # "hilos": el clasificador corre en los hilos del ejecutor; "procesos": en un pool de procesos
+    # (escala entre núcleos; cada proceso carga el clasificador una vez)
+    ml_inferencia_modo: str = "hilos"
+    ml_inferencia_procesos: int = 2
+    # Cache LRU/TTL de resultados por huella de features + versión del modelo (0 = desactivada)
+    ml_cache_max_entradas: int = 10_000
+    ml_cache_ttl_s: int = 3600
+    # Micro-batching de /predicciones/individual: tamaño máximo del grupo y espera máxima en cola
+    ml_microlote_max_tamano: int = 32
+    ml_microlote_espera_ms: float = 5.0
+    # Predicción masiva: filas por bloque (una llamada a predecir_lote y una transacción por bloque)
+    ml_masiva_tamano_bloque: int = 2000
+    # Refresco programado del riesgo (re-puntúa solo estudiantes con cambios): expresión cron de
+    # 5 campos, p. ej. "0 3 * * *" = todos los días a las 03:00; vacío = desactivado
+    ml_refresco_cron: str = ""
+    # Zona horaria de la expresión cron como desfase respecto de UTC (Bolivia: -4)
+    ml_refresco_utc_offset_horas: int = -4
 
     # Supabase Storage (artefactos ML — requerido en producción)
     supabase_project_url: str = "https://xitzatipxgwbfxlpsllg.supabase.co"
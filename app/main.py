@@ -3,9 +3,11 @@ import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
+from datetime import timedelta, timezone
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -16,7 +18,16 @@ from app.core.security import create_access_token, verify_password
 from app.models import *  # noqa: F401, F403 - Registra modelos en Base.metadata antes de init_db
 from app.models import Usuario
 from app.schemas.auth import LoginRequest, TokenResponse
-from app.services.prediccion_service import PrediccionService
+from app.services.bundle_modelo import BundleInvalido
+from app.services.inferencia_service import (
+    AgrupadorPredicciones,
+    ColaInferenciaLlena,
+    EjecutorInferencia,
+    SlotModelo,
+)
+from app.services.importacion_estudiantes_service import ProcesadorImportacionesEstudiantes
+from app.services.prediccion_lote_service import ProcesadorLotesPrediccion
+from app.services.refresco_service import ExpresionCron, RefrescoRiesgo
 
 logger = logging.getLogger(__name__)
 
@@ -95,20 +106,37 @@ async def _cargar_modelos_en_background(app: FastAPI) -> None:
         logger.warning("No se pudieron descargar artefactos ML: %s", exc)
 
     try:
-        servicio = await loop.run_in_executor(
-            None, lambda: PrediccionService(settings.ml_model_dir)
-        )
-        app.state.prediccion_service = servicio
+        await app.state.slot_modelo.recargar(settings.ml_model_dir)
         logger.info("Modelo ML cargado desde '%s'", settings.ml_model_dir)
     except FileNotFoundError:
         logger.warning(
             "No se encontraron artefactos ML en '%s'. "
-            "El endpoint de predicciones no estará disponible hasta copiar los .pkl.",
+            "El endpoint de predicciones no estará disponible hasta copiar modelo.bundle (o los .pkl).",
             settings.ml_model_dir,
         )
-        app.state.prediccion_service = None
+    except BundleInvalido as exc:
+        logger.error("El bundle del modelo en '%s' es inválido: %s", settings.ml_model_dir, exc)
+    except ValueError as exc:
+        logger.error("El modelo en '%s' no pasó la prueba de humo: %s", settings.ml_model_dir, exc)
+    except Exception:
+        # Cualquier otro fallo (pool de procesos, memoria, pickle incompatible) no debe
+        # cortar la tarea: model_info y la reanudación de lotes se ejecutan igual
+        logger.exception("Error inesperado al cargar el modelo desde '%s'", settings.ml_model_dir)
 
-    app.state.model_info = leer_modelo_actual_info(settings.ml_model_dir)
+    try:
+        app.state.model_info = leer_modelo_actual_info(settings.ml_model_dir)
+    except (OSError, ValueError) as exc:
+        logger.error("No se pudo leer model_info.json: %s", exc)
+        app.state.model_info = None
+
+    # Lotes de predicción masiva que quedaron a medias por un reinicio: siguen
+    # desde su último bloque confirmado (requiere el modelo ya cargado)
+    try:
+        reanudados = await app.state.procesador_lotes.reanudar_interrumpidos()
+        if reanudados:
+            logger.info("%d lotes de predicción interrumpidos reanudados", reanudados)
+    except Exception as exc:
+        logger.warning("No se pudieron reanudar lotes interrumpidos: %s", exc)
 
 
 @asynccontextmanager
@@ -118,13 +146,63 @@ async def lifespan(app: FastAPI):
 
     # Inicializar estado provisional — los modelos se cargan en background
     # para que uvicorn abra el puerto inmediatamente y Render lo detecte.
-    app.state.prediccion_service = None
+    # El servicio ML vive en un slot: las recargas lo reemplazan sin cortar las solicitudes en curso
+    app.state.slot_modelo = SlotModelo()
     app.state.model_info = None
+    # La inferencia corre en un pool de hilos propio para que /health y el resto
+    # de endpoints sigan respondiendo mientras se puntúa una carga masiva.
+    app.state.ejecutor_inferencia = EjecutorInferencia(
+        workers=settings.ml_inferencia_workers,
+        max_cola=settings.ml_inferencia_max_cola,
+        reintentar_en_s=settings.ml_inferencia_retry_after_s,
+    )
+    app.state.agrupador_predicciones = AgrupadorPredicciones(
+        app.state.ejecutor_inferencia,
+        max_tamano=settings.ml_microlote_max_tamano,
+        espera_ms=settings.ml_microlote_espera_ms,
+    )
+
+    # Lotes de /predicciones/masiva: se procesan en segundo plano por bloques
+    app.state.procesador_lotes = ProcesadorLotesPrediccion(
+        app.state.slot_modelo,
+        app.state.ejecutor_inferencia,
+        tamano_bloque=settings.ml_masiva_tamano_bloque,
+    )
 
+    # Importaciones de /estudiantes/importar: también en segundo plano
+    app.state.procesador_importaciones = ProcesadorImportacionesEstudiantes()
+    try:
+        await ProcesadorImportacionesEstudiantes.recuperar_interrumpidos()
+    except Exception as exc:
+        logger.warning("No se pudieron revisar importaciones interrumpidas: %s", exc)
+
+    # Refresco programado del riesgo (solo si ml_refresco_cron está configurado)
+    cron = None
+    if settings.ml_refresco_cron.strip():
+        try:
+            cron = ExpresionCron(settings.ml_refresco_cron)
+        except ValueError as exc:
+            logger.error("ml_refresco_cron inválido, refresco programado desactivado: %s", exc)
+    app.state.refresco_riesgo = RefrescoRiesgo(
+        app.state.procesador_lotes,
+        cron,
+        zona=timezone(timedelta(hours=settings.ml_refresco_utc_offset_horas)),
+    )
+    try:
+        await RefrescoRiesgo.recuperar_interrumpidas()
+    except Exception as exc:
+        logger.warning("No se pudieron revisar refrescos interrumpidos: %s", exc)
+    app.state.refresco_riesgo.iniciar()
     asyncio.create_task(_cargar_modelos_en_background(app))
 
     yield
 
+    await app.state.refresco_riesgo.cerrar()
+    await app.state.procesador_lotes.cerrar()
+    await app.state.procesador_importaciones.cerrar()
+    app.state.ejecutor_inferencia.cerrar()
+    app.state.slot_modelo.cerrar()
+
 
 app = FastAPI(
     title="Sistema Predictivo API",
@@ -181,6 +259,16 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+
+@app.exception_handler(ColaInferenciaLlena)
+async def cola_inferencia_llena_handler(request: Request, exc: ColaInferenciaLlena):
+    """El ejecutor de inferencia está saturado: 503 con Retry-After para que el cliente reintente."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "El servicio de predicción está saturado. Intente nuevamente en unos segundos."},
+        headers={"Retry-After": str(exc.reintentar_en_s)},
+    )
+
 # CORS: permitir acceso desde cualquier origen (frontend en otro puerto/dominio)
 app.add_middleware(
     CORSMiddleware,
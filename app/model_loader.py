@@ -5,8 +5,11 @@ from pathlib import Path
 
 import requests
 
+from app.services.bundle_modelo import NOMBRE_BUNDLE, BundleInvalido, convertir_pickles, verificar_bundle
+
 logger = logging.getLogger(__name__)
 
+# Formato anterior (.pkl sueltos): se usa solo si el bundle no está en Supabase.
 # Artefactos que siempre vienen de Supabase Storage
 _ARTEFACTOS_SUPABASE = [
     "mejor_modelo.pkl",
@@ -54,12 +57,14 @@ def _descargar_desde_gdrive(file_id: str, destino: Path) -> None:
 
 
 def descargar_artefactos_ml(model_dir: str, config) -> None:
-    """Descarga los 5 artefactos .pkl y model_info.json al directorio model_dir si no existen ya.
+    """Descarga modelo.bundle y model_info.json al directorio model_dir si no existen ya.
 
-    - 4 .pkl + model_info.json se descargan desde Supabase Storage (bucket público).
-    - iter_imputer.pkl: primero intenta Supabase; si no está, usa Google Drive.
+    - modelo.bundle + model_info.json se descargan desde Supabase Storage (bucket público)
+      y se verifican los checksums del bundle antes de usarlo.
+    - Si el bundle no está en Supabase se descargan los 5 .pkl del formato anterior
+      (iter_imputer.pkl con fallback a Google Drive) y se convierten a bundle localmente.
 
-    Si supabase_project_url está vacío, se omite la descarga (entorno local con .pkl ya presentes).
+    Si supabase_project_url está vacío, se omite la descarga (entorno local con artefactos ya presentes).
     """
     if not config.supabase_project_url:
         logger.info("SUPABASE_PROJECT_URL no configurado — se omite descarga de artefactos ML.")
@@ -68,6 +73,53 @@ def descargar_artefactos_ml(model_dir: str, config) -> None:
     model_path = Path(model_dir)
     model_path.mkdir(parents=True, exist_ok=True)
 
+    # Descargar model_info.json (métricas del modelo actual — opcional, no falla si no existe)
+    info_destino = model_path / "model_info.json"
+    if not info_destino.exists():
+        _descargar_desde_supabase(
+            config.supabase_project_url,
+            config.supabase_storage_bucket,
+            "model_info.json",
+            info_destino,
+        )
+
+    bundle = model_path / NOMBRE_BUNDLE
+    if bundle.exists():
+        logger.info("Artefacto ya existe localmente: %s", NOMBRE_BUNDLE)
+        return
+    if _descargar_bundle(config, bundle):
+        return
+
+    logger.info("%s no está en Supabase — se descargan los .pkl del formato anterior.", NOMBRE_BUNDLE)
+    _descargar_pickles(model_path, config)
+    convertir_pickles(model_path)
+    for filename in _ARTEFACTOS_SUPABASE + [_ARTEFACTO_GDRIVE]:
+        (model_path / filename).unlink(missing_ok=True)
+
+
+def _descargar_bundle(config, destino: Path) -> bool:
+    """Descarga el bundle a un temporal y lo deja en `destino` solo si sus checksums son válidos."""
+    temporal = destino.with_name(f".{destino.name}.descarga")
+    ok = _descargar_desde_supabase(
+        config.supabase_project_url,
+        config.supabase_storage_bucket,
+        NOMBRE_BUNDLE,
+        temporal,
+    )
+    if not ok:
+        return False
+    try:
+        manifiesto = verificar_bundle(temporal)
+    except BundleInvalido as exc:
+        temporal.unlink(missing_ok=True)
+        raise RuntimeError(f"El {NOMBRE_BUNDLE} descargado de Supabase es inválido: {exc}") from exc
+    os.replace(temporal, destino)
+    logger.info("Bundle verificado: versión %s", manifiesto.get("version_modelo"))
+    return True
+
+
+def _descargar_pickles(model_path: Path, config) -> None:
+    """Descarga los 5 .pkl del formato anterior (4 de Supabase, iter_imputer con fallback a Google Drive)."""
     # Descargar los 4 artefactos .pkl desde Supabase
     for filename in _ARTEFACTOS_SUPABASE:
         destino = model_path / filename
@@ -83,16 +135,6 @@ def descargar_artefactos_ml(model_dir: str, config) -> None:
         if not ok:
             raise RuntimeError(f"No se pudo descargar {filename} desde Supabase Storage.")
 
-    # Descargar model_info.json (métricas del modelo actual — opcional, no falla si no existe)
-    info_destino = model_path / "model_info.json"
-    if not info_destino.exists():
-        _descargar_desde_supabase(
-            config.supabase_project_url,
-            config.supabase_storage_bucket,
-            "model_info.json",
-            info_destino,
-        )
-
     # Descargar iter_imputer.pkl: Supabase primero, Google Drive como fallback
     destino = model_path / _ARTEFACTO_GDRIVE
     if destino.exists():
@@ -114,7 +156,7 @@ def descargar_artefactos_ml(model_dir: str, config) -> None:
 
 
 def subir_artefactos_a_supabase(model_dir: str, config) -> None:
-    """Sube los 5 artefactos .pkl desde model_dir hacia Supabase Storage.
+    """Sube modelo.bundle y model_info.json desde model_dir hacia Supabase Storage.
 
     Se usa después de aceptar un modelo nuevo, para que el siguiente reinicio
     descargue el modelo actualizado (el filesystem de Render es efímero).
@@ -130,7 +172,7 @@ def subir_artefactos_a_supabase(model_dir: str, config) -> None:
         return
 
     model_path = Path(model_dir)
-    todos = _ARTEFACTOS_SUPABASE + [_ARTEFACTO_GDRIVE, "model_info.json"]
+    todos = [NOMBRE_BUNDLE, "model_info.json"]
     headers = {
         "Authorization": f"Bearer {config.supabase_service_role_key}",
         "Content-Type": "application/octet-stream",
@@ -13,11 +13,12 @@ from app.models.prediccion import Prediccion, NivelRiesgo
 from app.models.accion import Accion
 from app.models.modulo import Modulo, UsuarioModulo
 from app.models.gestion_academica import GestionAcademica
-from app.models.lote_prediccion import LotePrediccion, EstadoLote
+from app.models.lote_prediccion import ArchivoLotePrediccion, LotePrediccion, EstadoLote
 from app.models.alerta import Alerta, TipoAlerta, EstadoAlerta
 from app.models.reporte_generado import ReporteGenerado
-from app.models.lote_importacion_estudiante import LoteImportacionEstudiante
+from app.models.lote_importacion_estudiante import ErrorImportacionEstudiante, LoteImportacionEstudiante
 from app.models.entrenamiento_modelo import EntrenamientoModelo
+from app.models.ejecucion_refresco import EjecucionRefresco, EstadoEjecucion
 
 __all__ = [
     "Rol",
@@ -38,11 +39,15 @@ __all__ = [
     "UsuarioModulo",
     "GestionAcademica",
     "LotePrediccion",
+    "ArchivoLotePrediccion",
     "EstadoLote",
     "Alerta",
     "TipoAlerta",
     "EstadoAlerta",
     "ReporteGenerado",
     "LoteImportacionEstudiante",
+    "ErrorImportacionEstudiante",
     "EntrenamientoModelo",
+    "EjecucionRefresco",
+    "EstadoEjecucion",
 ]
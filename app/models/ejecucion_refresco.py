@@ -0,0 +1,50 @@
+"""Modelo EjecucionRefresco (historial del refresco programado de riesgo)."""
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from sqlalchemy import BigInteger, DateTime, Double, ForeignKey, Identity, Integer, Text, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.core.database import Base
+
+if TYPE_CHECKING:
+    from app.models.lote_prediccion import LotePrediccion
+
+
+class EstadoEjecucion:
+    """Valores permitidos para estado de la ejecución."""
+    EN_CURSO = "en_curso"
+    COMPLETADO = "completado"
+    ERROR = "error"
+
+
+class EjecucionRefresco(Base):
+    """Una corrida del refresco de riesgo (programada o manual) con sus estadísticas."""
+
+    __tablename__ = "ejecuciones_refresco"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(always=True), primary_key=True)
+    fecha_inicio: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=text("NOW()")
+    )
+    fecha_fin: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    estado: Mapped[str] = mapped_column(
+        Text, nullable=False, default="en_curso", server_default=text("'en_curso'")
+    )
+    # programado | manual
+    disparo: Mapped[str] = mapped_column(Text, nullable=False)
+    # incremental (solo estudiantes con cambios desde cambios_desde) | completo
+    modo: Mapped[str] = mapped_column(Text, nullable=False)
+    cambios_desde: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    version_modelo: Mapped[str | None] = mapped_column(Text, nullable=True)
+    lote_id: Mapped[int | None] = mapped_column(
+        BigInteger, ForeignKey("lotes_prediccion.id"), nullable=True
+    )
+    total_candidatos: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_procesados: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_errores: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    duracion_s: Mapped[float | None] = mapped_column(Double, nullable=True)
+    filas_por_segundo: Mapped[float | None] = mapped_column(Double, nullable=True)
+    mensaje_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    lote: Mapped["LotePrediccion | None"] = relationship("LotePrediccion")
@@ -1,8 +1,9 @@
-"""Modelo LoteImportacionEstudiante (registro de cada carga Excel de creación de estudiantes)."""
+"""Modelos LoteImportacionEstudiante (cada carga de creación de estudiantes) y sus errores por fila."""
 from datetime import datetime
 from typing import TYPE_CHECKING
 
 from sqlalchemy import BigInteger, DateTime, ForeignKey, Identity, Integer, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -12,7 +13,12 @@ if TYPE_CHECKING:
 
 
 class LoteImportacionEstudiante(Base):
-    """Registro de cada archivo Excel subido para la creación/actualización de estudiantes."""
+    """Registro de cada archivo Excel subido para la creación/actualización de estudiantes.
+
+    La importación corre en segundo plano: el lote nace en `pendiente` y el
+    procesador actualiza estado, filas_procesadas y los totales (valores de
+    EstadoLote, los mismos que los lotes de predicción).
+    """
 
     __tablename__ = "lotes_importacion_estudiantes"
 
@@ -28,5 +34,31 @@ class LoteImportacionEstudiante(Base):
     estudiantes_creados: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     estudiantes_actualizados: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     total_errores: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # SHA-256 del archivo + malla asignada (ver huella_carga)
+    huella: Mapped[str | None] = mapped_column(Text, nullable=True)
+    estado: Mapped[str] = mapped_column(
+        Text, nullable=False, default="pendiente", server_default=text("'pendiente'")
+    )
+    filas_procesadas: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
+    mensaje_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Contadores de ImportacionResumen + materias_no_encontradas, al terminar
+    resumen: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    fecha_fin: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     usuario: Mapped["Usuario"] = relationship("Usuario")
+
+
+class ErrorImportacionEstudiante(Base):
+    """Error de una fila del archivo de un lote de importación (se descarga como CSV/NDJSON)."""
+
+    __tablename__ = "errores_importacion_estudiantes"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(always=True), primary_key=True)
+    lote_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("lotes_importacion_estudiantes.id", ondelete="CASCADE"), nullable=False
+    )
+    fila: Mapped[int] = mapped_column(Integer, nullable=False)
+    codigo: Mapped[str | None] = mapped_column(Text, nullable=True)
+    mensaje: Mapped[str] = mapped_column(Text, nullable=False)
@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import BigInteger, DateTime, ForeignKey, Identity, Integer, Text, text
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Identity, Integer, LargeBinary, Text, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -31,8 +31,9 @@ class LotePrediccion(Base):
     fecha_carga: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), nullable=False, server_default=text("NOW()")
     )
-    usuario_id: Mapped[int] = mapped_column(
-        BigInteger, ForeignKey("usuarios.id"), nullable=False
+    # NULL en los lotes del refresco programado (no los lanza un usuario)
+    usuario_id: Mapped[int | None] = mapped_column(
+        BigInteger, ForeignKey("usuarios.id"), nullable=True
     )
     gestion_id: Mapped[int | None] = mapped_column(
         BigInteger, ForeignKey("gestiones_academicas.id"), nullable=True
@@ -46,13 +47,43 @@ class LotePrediccion(Base):
     total_medio_riesgo: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     total_bajo_riesgo: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     total_critico: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_errores: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
     mensaje_error: Mapped[str | None] = mapped_column(Text, nullable=True)
     version_modelo: Mapped[str] = mapped_column(
         Text, nullable=False, default="v2_con_imputacion_knn"
     )
+    # SHA-256 del archivo + versión de los artefactos + gestión (ver huella_carga)
+    huella: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Índice (base 0) de la siguiente fila del archivo por procesar; se confirma
+    # junto con las predicciones de cada bloque y permite reanudar el lote
+    cursor_fila: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
 
-    usuario: Mapped["Usuario"] = relationship("Usuario")
+    usuario: Mapped["Usuario | None"] = relationship("Usuario")
     gestion: Mapped["GestionAcademica | None"] = relationship("GestionAcademica")
     predicciones: Mapped[list["Prediccion"]] = relationship(
         "Prediccion", back_populates="lote"
     )
+
+
+
+class ArchivoLotePrediccion(Base):
+    """Parte del archivo subido de un lote en curso, para reanudarlo tras un reinicio.
+
+    El archivo se guarda en partes de tamaño fijo (una fila por parte, en orden
+    de `parte`) para escribirlo y leerlo sin tenerlo completo en memoria. Vive
+    en su propia tabla para que listar lotes no arrastre el contenido; las
+    filas se borran cuando el lote termina (completado o error).
+    """
+
+    __tablename__ = "lotes_prediccion_archivos"
+
+    lote_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("lotes_prediccion.id", ondelete="CASCADE"), primary_key=True
+    )
+    parte: Mapped[int] = mapped_column(Integer, primary_key=True, server_default=text("0"))
+    formato: Mapped[str] = mapped_column(Text, nullable=False)
+    contenido: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
@@ -1,8 +1,8 @@
 """Modelo Estudiante."""
-from datetime import date
+from datetime import date, datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import BigInteger, Date, ForeignKey, Identity, Text
+from sqlalchemy import BigInteger, Date, DateTime, ForeignKey, Identity, Text, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -36,6 +36,10 @@ class Estudiante(Base):
     modalidad_ingreso: Mapped[str | None] = mapped_column(Text, nullable=True)
     tipo_colegio: Mapped[str | None] = mapped_column(Text, nullable=True)
     nombre_malla: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Última modificación desde la app; el refresco programado re-puntúa a quien cambió
+    fecha_actualizacion: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=text("NOW()"), onupdate=func.now()
+    )
 
     paralelo: Mapped["Paralelo"] = relationship("Paralelo", back_populates="estudiantes")
     inscripciones: Mapped[list["Inscripcion"]] = relationship(
@@ -81,12 +81,50 @@ class ImportacionEstudiantesResponse(BaseModel):
     estudiantes_creados: int = Field(default=0)
     estudiantes_actualizados: int = Field(default=0)
     total_errores: int = Field(default=0)
-    errores: list[ImportacionErrorItem] = Field(default_factory=list)
+    errores: list[ImportacionErrorItem] = Field(
+        default_factory=list,
+        description=(
+            "Reporte completo de errores por fila solo con dry_run=true; en la importación real se "
+            "descargan en GET /estudiantes/importaciones/{lote_id}/errores"
+        ),
+    )
     resumen: ImportacionResumen = Field(default_factory=ImportacionResumen)
     materias_no_encontradas: list[str] = Field(
         default_factory=list,
         description="Materias del Excel que no existen en la base de datos y fueron ignoradas",
     )
+    lote_id: int | None = Field(default=None, description="ID del lote de importación registrado")
+    duplicado: bool = Field(
+        default=False,
+        description="True si el archivo ya se había importado: se devuelven los totales de ese lote sin reprocesar",
+    )
+    estado: str | None = Field(default=None, description="pendiente, procesando, completado o error")
+    dry_run: bool = Field(
+        default=False,
+        description="True si solo se validó el archivo: los totales son estimados y no se escribió nada",
+    )
+    mensaje: str | None = None
+
+
+class ImportacionProgresoResponse(BaseModel):
+    """Avance de una importación de estudiantes procesada en segundo plano."""
+    id: int
+    nombre_archivo: str
+    estado: str
+    en_curso: bool
+    fecha_carga: datetime
+    fecha_fin: datetime | None = None
+    # Estimado (encabezado del archivo) hasta que termina la importación
+    total_filas: int
+    filas_procesadas: int
+    porcentaje: float
+    estudiantes_creados: int
+    estudiantes_actualizados: int
+    total_errores: int
+    # Solo al completarse
+    resumen: ImportacionResumen | None = None
+    materias_no_encontradas: list[str] = Field(default_factory=list)
+    mensaje_error: str | None = None
 
 
 # ── Perfil individual del estudiante ──────────────────────────────
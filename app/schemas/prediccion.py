@@ -138,6 +138,51 @@ class LoteDetalleResponse(BaseModel):
     predicciones: list[PrediccionHistorialItem]
 
 
+class LoteProgresoResponse(BaseModel):
+    """Avance de un lote de predicción masiva procesado en segundo plano."""
+    id: int
+    estado: str
+    en_curso: bool
+    total_estudiantes: int
+    total_procesados: int
+    total_errores: int
+    porcentaje: float
+    total_alto_riesgo: int
+    total_medio_riesgo: int
+    total_bajo_riesgo: int
+    total_critico: int
+    mensaje_error: str | None = None
+    # Solo mientras el lote está en curso en esta instancia
+    filas_por_segundo: float | None = None
+
+
+class EjecucionRefrescoItem(BaseModel):
+    """Estadísticas de una corrida del refresco de riesgo."""
+    id: int
+    fecha_inicio: datetime
+    fecha_fin: datetime | None = None
+    estado: str
+    disparo: str
+    modo: str
+    cambios_desde: datetime | None = None
+    version_modelo: str | None = None
+    lote_id: int | None = None
+    total_candidatos: int
+    total_procesados: int
+    total_errores: int
+    duracion_s: float | None = None
+    filas_por_segundo: float | None = None
+    mensaje_error: str | None = None
+
+
+class EjecucionRefrescoListResponse(BaseModel):
+    """Programación y últimas corridas del refresco de riesgo."""
+    programacion: str | None = None
+    proxima_ejecucion: datetime | None = None
+    en_curso: bool
+    ejecuciones: list[EjecucionRefrescoItem]
+
+
 # --- Dashboard ---
 
 class ResumenGeneral(BaseModel):
@@ -1,13 +1,45 @@
 """Servicio de alertas para riesgo de abandono estudiantil."""
 from datetime import datetime, timezone
 
-from sqlalchemy import select, and_
+from sqlalchemy import BigInteger, Text, and_, column, insert, select, update, values
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.alerta import Alerta, TipoAlerta, EstadoAlerta
 from app.models.asistencia import Asistencia, EstadoAsistencia
 from app.models.prediccion import Prediccion, NivelRiesgo
 
+_PREFIJO_MEJORA = "Resuelta automáticamente: el riesgo pasó de "
+
+
+def _detalle_mejora(nivel_riesgo_nuevo: str, probabilidad_nueva: float, ahora: datetime) -> str:
+    """Parte de la observación de resolución que sigue al nivel anterior de la alerta."""
+    return (
+        f" a {nivel_riesgo_nuevo} ({probabilidad_nueva:.1%}) "
+        f"según predicción del {ahora.strftime('%d/%m/%Y')}."
+    )
+
+
+def _datos_alerta_temprana(
+    estudiante_id: int,
+    prediccion_id: int,
+    nivel_riesgo: str,
+    probabilidad: float,
+    gestion_id: int | None,
+) -> dict:
+    return {
+        "tipo": TipoAlerta.TEMPRANA,
+        "nivel": nivel_riesgo,
+        "estudiante_id": estudiante_id,
+        "prediccion_id": prediccion_id,
+        "titulo": f"Riesgo {nivel_riesgo} de abandono ({probabilidad:.0%})",
+        "descripcion": (
+            f"El modelo predictivo indica una probabilidad de abandono del "
+            f"{probabilidad:.1%} (nivel {nivel_riesgo})."
+        ),
+        "estado": EstadoAlerta.ACTIVA,
+        "gestion_id": gestion_id,
+    }
+
 
 async def resolver_alertas_por_mejora(
     estudiante_id: int,
@@ -32,9 +64,7 @@ async def resolver_alertas_por_mejora(
         alerta.estado = EstadoAlerta.RESUELTA
         alerta.fecha_resolucion = ahora
         alerta.observacion_resolucion = (
-            f"Resuelta automáticamente: el riesgo pasó de {alerta.nivel} "
-            f"a {nivel_riesgo_nuevo} ({probabilidad_nueva:.1%}) "
-            f"según predicción del {ahora.strftime('%d/%m/%Y')}."
+            _PREFIJO_MEJORA + alerta.nivel + _detalle_mejora(nivel_riesgo_nuevo, probabilidad_nueva, ahora)
         )
         resueltas += 1
 
@@ -56,23 +86,79 @@ async def generar_alertas_prediccion(
         )
         return None
 
-    alerta = Alerta(
-        tipo=TipoAlerta.TEMPRANA,
-        nivel=nivel_riesgo,
-        estudiante_id=estudiante_id,
-        prediccion_id=prediccion_id,
-        titulo=f"Riesgo {nivel_riesgo} de abandono ({probabilidad:.0%})",
-        descripcion=(
-            f"El modelo predictivo indica una probabilidad de abandono del "
-            f"{probabilidad:.1%} (nivel {nivel_riesgo})."
-        ),
-        estado=EstadoAlerta.ACTIVA,
-        gestion_id=gestion_id,
-    )
+    alerta = Alerta(**_datos_alerta_temprana(estudiante_id, prediccion_id, nivel_riesgo, probabilidad, gestion_id))
     db.add(alerta)
     return alerta
 
 
+async def generar_alertas_predicciones_lote(
+    resultados: list[tuple[int, int, str, float]],
+    db: AsyncSession,
+    gestion_id: int | None = None,
+) -> int:
+    """Equivalente a llamar generar_alertas_prediccion fila por fila, en dos sentencias.
+
+    `resultados` son (estudiante_id, prediccion_id, nivel_riesgo, probabilidad)
+    en el orden en que se generaron. Las alertas abiertas de los estudiantes
+    que mejoraron se resuelven con un único UPDATE y las alertas nuevas
+    (Alto/Critico) se crean con un único INSERT multi-fila. Una alerta nueva
+    seguida de una mejora del mismo estudiante dentro del lote se inserta ya
+    resuelta, como habría quedado procesando en orden. Devuelve la cantidad
+    de alertas creadas.
+    """
+    ahora = datetime.now(timezone.utc)
+    # Las alertas abiertas previas al lote quedan resueltas por la primera mejora
+    # (Bajo/Medio) de su estudiante dentro del lote
+    primera_mejora: dict[int, tuple[str, float]] = {}
+    for estudiante_id, _, nivel_riesgo, probabilidad in resultados:
+        if nivel_riesgo not in (NivelRiesgo.ALTO, NivelRiesgo.CRITICO):
+            primera_mejora.setdefault(estudiante_id, (nivel_riesgo, probabilidad))
+
+    if primera_mejora:
+        mejoras = values(
+            column("estudiante_id", BigInteger), column("detalle", Text), name="mejoras"
+        ).data([
+            (estudiante_id, _detalle_mejora(nivel_riesgo, probabilidad, ahora))
+            for estudiante_id, (nivel_riesgo, probabilidad) in primera_mejora.items()
+        ])
+        await db.execute(
+            update(Alerta)
+            .where(
+                Alerta.estudiante_id == mejoras.c.estudiante_id,
+                Alerta.estado.in_([EstadoAlerta.ACTIVA, EstadoAlerta.EN_SEGUIMIENTO]),
+            )
+            .values(
+                estado=EstadoAlerta.RESUELTA,
+                fecha_resolucion=ahora,
+                observacion_resolucion=_PREFIJO_MEJORA + Alerta.nivel + mejoras.c.detalle,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    # Recorriendo al revés se conoce, para cada alerta nueva, la primera mejora
+    # posterior del mismo estudiante (la que la habría resuelto fila por fila)
+    nuevas = []
+    siguiente_mejora: dict[int, tuple[str, float]] = {}
+    for estudiante_id, prediccion_id, nivel_riesgo, probabilidad in reversed(resultados):
+        if nivel_riesgo not in (NivelRiesgo.ALTO, NivelRiesgo.CRITICO):
+            siguiente_mejora[estudiante_id] = (nivel_riesgo, probabilidad)
+            continue
+        alerta = _datos_alerta_temprana(estudiante_id, prediccion_id, nivel_riesgo, probabilidad, gestion_id)
+        alerta["fecha_resolucion"] = None
+        alerta["observacion_resolucion"] = None
+        mejora = siguiente_mejora.get(estudiante_id)
+        if mejora is not None:
+            alerta["estado"] = EstadoAlerta.RESUELTA
+            alerta["fecha_resolucion"] = ahora
+            alerta["observacion_resolucion"] = _PREFIJO_MEJORA + nivel_riesgo + _detalle_mejora(*mejora, ahora)
+        nuevas.append(alerta)
+    nuevas.reverse()
+
+    if nuevas:
+        await db.execute(insert(Alerta), nuevas)
+    return len(nuevas)
+
+
 async def verificar_inasistencias_consecutivas(
     estudiante_id: int,
     materia_id: int,
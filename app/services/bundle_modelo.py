@@ -0,0 +1,264 @@
+"""Bundle único, versionado y verificable con los artefactos del modelo ML.
+
+Reemplaza los cinco .pkl sueltos (mejor_modelo, scaler, label_encoders,
+iter_imputer, feature_columns) por un solo archivo `modelo.bundle`:
+
+    cabecera (32 bytes) | segmentos alineados a 64 bytes | manifiesto JSON
+
+Cada componente se serializa con pickle protocolo 5 y sus arreglos NumPy se
+escriben fuera de banda como segmentos crudos; al leer, el archivo se mapea
+en memoria y los arreglos se reconstruyen como vistas de solo lectura sobre
+el mapa, sin copiarlos. El manifiesto guarda, por componente, la ubicación
+de sus segmentos y un SHA-256, además de la versión del modelo.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401 — necesario para deserializar IterativeImputer
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_BUNDLE = "modelo.bundle"
+FORMATO = 1
+
+# Componentes obligatorios, en el orden en que los usa PrediccionService
+COMPONENTES = ("mejor_modelo", "scaler", "label_encoders", "iter_imputer", "feature_columns")
+
+_MAGIA = b"SPMODEL\x00"
+# magia, formato, reservado, offset del manifiesto, longitud del manifiesto
+_CABECERA = struct.Struct("<8sIIQQ")
+_ALINEACION = 64
+
+
+class BundleInvalido(Exception):
+    """El archivo no es un bundle válido, está truncado o no coincide su checksum."""
+
+
+@dataclass
+class BundleModelo:
+    """Artefactos leídos de un bundle junto con su manifiesto."""
+
+    ruta: Path
+    manifiesto: dict
+    artefactos: dict
+
+    @property
+    def version(self) -> str:
+        return self.manifiesto.get("version_modelo", "")
+
+    @property
+    def huella(self) -> str:
+        """Huella corta del contenido (combina los SHA-256 de los componentes)."""
+        h = hashlib.sha256(self.version.encode())
+        for nombre in sorted(self.manifiesto["componentes"]):
+            h.update(self.manifiesto["componentes"][nombre]["sha256"].encode())
+        return h.hexdigest()[:16]
+
+
+def escribir_bundle(
+    ruta: str | Path,
+    artefactos: dict,
+    version_modelo: str,
+    extra: dict | None = None,
+) -> dict:
+    """Escribe los artefactos en `ruta` de forma atómica y devuelve el manifiesto.
+
+    `artefactos` debe incluir todos los COMPONENTES. Si el modelo es un
+    ensamble de árboles se agrega también su EvaluadorArboles compilado, para
+    que cargar el bundle no tenga que recompilarlo, y si el IterativeImputer
+    admite la forma cerrada se guarda destilado como ImputadorLineal (mismo
+    transform, una fracción del tamaño).
+    """
+    from app.services.evaluador_arboles import EvaluadorArboles
+    from app.services.imputador_lineal import ImputadorLineal
+
+    faltantes = [c for c in COMPONENTES if c not in artefactos]
+    if faltantes:
+        raise ValueError(f"Faltan componentes para el bundle: {faltantes}")
+    artefactos = dict(artefactos)
+    if "evaluador_arboles" not in artefactos:
+        evaluador = EvaluadorArboles.compilar(artefactos["mejor_modelo"])
+        if evaluador is not None:
+            artefactos["evaluador_arboles"] = evaluador
+    if not isinstance(artefactos["iter_imputer"], ImputadorLineal):
+        artefactos["iter_imputer"] = ImputadorLineal.destilar(artefactos["iter_imputer"]) or artefactos["iter_imputer"]
+
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    manifiesto = {
+        "formato": FORMATO,
+        "version_modelo": version_modelo,
+        "creado": datetime.now().isoformat(),
+        "componentes": {},
+        **(extra or {}),
+    }
+
+    fd, temporal = tempfile.mkstemp(dir=ruta.parent, prefix=".bundle-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\x00" * _CABECERA.size)
+            for nombre, objeto in artefactos.items():
+                buffers: list[pickle.PickleBuffer] = []
+                datos = pickle.dumps(objeto, protocol=5, buffer_callback=buffers.append)
+                h = hashlib.sha256(datos)
+                segmentos = [_escribir_segmento(f, datos)]
+                for buffer in buffers:
+                    crudo = buffer.raw()
+                    h.update(crudo)
+                    segmentos.append(_escribir_segmento(f, crudo))
+                manifiesto["componentes"][nombre] = {
+                    "tipo": f"{type(objeto).__module__}.{type(objeto).__qualname__}",
+                    "sha256": h.hexdigest(),
+                    "segmentos": segmentos,
+                }
+
+            offset_manifiesto = f.tell()
+            datos_manifiesto = json.dumps(manifiesto, ensure_ascii=False).encode("utf-8")
+            f.write(datos_manifiesto)
+            f.seek(0)
+            f.write(_CABECERA.pack(_MAGIA, FORMATO, 0, offset_manifiesto, len(datos_manifiesto)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        Path(temporal).unlink(missing_ok=True)
+        raise
+
+    logger.info(
+        "Bundle %s escrito: versión %s, %d componentes, %.1f MB",
+        ruta.name, version_modelo, len(artefactos), ruta.stat().st_size / 1024 / 1024,
+    )
+    return manifiesto
+
+
+def leer_manifiesto(ruta: str | Path) -> dict:
+    """Lee solo la cabecera y el manifiesto, sin cargar los componentes."""
+    with open(ruta, "rb") as f:
+        cabecera = f.read(_CABECERA.size)
+        offset, longitud = _validar_cabecera(cabecera, os.fstat(f.fileno()).st_size)
+        f.seek(offset)
+        return json.loads(f.read(longitud).decode("utf-8"))
+
+
+def leer_bundle(
+    ruta: str | Path,
+    componentes: tuple[str, ...] | None = None,
+    verificar: bool = True,
+) -> BundleModelo:
+    """Carga los componentes del bundle (todos por defecto) sobre un mapa de memoria.
+
+    Con verificar=True se comprueba el SHA-256 de cada componente leído antes
+    de deserializarlo.
+    """
+    ruta = Path(ruta)
+    vista, manifiesto, limite = _mapear(ruta)
+    artefactos = {}
+    for nombre in componentes or tuple(manifiesto["componentes"]):
+        segmentos = _segmentos(vista, manifiesto, limite, nombre, verificar, ruta.name)
+        artefactos[nombre] = pickle.loads(segmentos[0], buffers=segmentos[1:])
+    return BundleModelo(ruta=ruta, manifiesto=manifiesto, artefactos=artefactos)
+
+
+def verificar_bundle(ruta: str | Path) -> dict:
+    """Comprueba la estructura y los checksums de todos los componentes sin deserializarlos.
+
+    Devuelve el manifiesto; lanza BundleInvalido si algo no coincide.
+    """
+    vista, manifiesto, limite = _mapear(Path(ruta))
+    faltantes = [c for c in COMPONENTES if c not in manifiesto["componentes"]]
+    if faltantes:
+        raise BundleInvalido(f"Faltan componentes en el bundle: {faltantes}")
+    for nombre in manifiesto["componentes"]:
+        _segmentos(vista, manifiesto, limite, nombre, True, Path(ruta).name)
+    return manifiesto
+
+
+def convertir_pickles(
+    model_dir: str | Path,
+    destino: str | Path | None = None,
+    version_modelo: str | None = None,
+) -> Path:
+    """Convierte los .pkl sueltos de model_dir en un bundle (por defecto model_dir/modelo.bundle).
+
+    Si no se indica version_modelo se toma de model_info.json cuando existe.
+    """
+    model_path = Path(model_dir)
+    artefactos = {nombre: joblib.load(model_path / f"{nombre}.pkl") for nombre in COMPONENTES}
+    if version_modelo is None:
+        version_modelo = "desconocida"
+        info_path = model_path / "model_info.json"
+        if info_path.exists():
+            with open(info_path, "r", encoding="utf-8") as f:
+                version_modelo = json.load(f).get("version", version_modelo)
+
+    destino = Path(destino) if destino else model_path / NOMBRE_BUNDLE
+    escribir_bundle(destino, artefactos, version_modelo, extra={"origen": "pickles"})
+    return destino
+
+
+def _mapear(ruta: Path) -> tuple[memoryview, dict, int]:
+    """Mapea el archivo en memoria (solo lectura): vista, manifiesto y offset donde termina la zona de datos."""
+    with open(ruta, "rb") as f:
+        offset, longitud = _validar_cabecera(f.read(_CABECERA.size), os.fstat(f.fileno()).st_size)
+        mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # Los arreglos deserializados son vistas del mapa y lo mantienen vivo
+    vista = memoryview(mapa)
+    try:
+        manifiesto = json.loads(bytes(vista[offset: offset + longitud]).decode("utf-8"))
+    except ValueError as exc:
+        raise BundleInvalido(f"Manifiesto ilegible en {ruta.name}: {exc}") from exc
+    if manifiesto.get("formato") != FORMATO:
+        raise BundleInvalido(f"Formato de bundle no soportado: {manifiesto.get('formato')}")
+    return vista, manifiesto, offset
+
+
+def _segmentos(
+    vista: memoryview, manifiesto: dict, limite: int, nombre: str, verificar: bool, archivo: str
+) -> list[memoryview]:
+    info = manifiesto["componentes"].get(nombre)
+    if info is None:
+        raise BundleInvalido(f"El bundle {archivo} no contiene el componente '{nombre}'")
+    segmentos = []
+    for seg in info["segmentos"]:
+        if seg["offset"] < _CABECERA.size or seg["offset"] + seg["longitud"] > limite:
+            raise BundleInvalido(f"Segmento fuera de rango en el componente '{nombre}' de {archivo}")
+        segmentos.append(vista[seg["offset"]: seg["offset"] + seg["longitud"]])
+    if verificar:
+        h = hashlib.sha256()
+        for segmento in segmentos:
+            h.update(segmento)
+        if h.hexdigest() != info["sha256"]:
+            raise BundleInvalido(f"Checksum inválido en el componente '{nombre}' de {archivo}")
+    return segmentos
+
+
+def _escribir_segmento(f, datos) -> dict:
+    relleno = (-f.tell()) % _ALINEACION
+    if relleno:
+        f.write(b"\x00" * relleno)
+    offset = f.tell()
+    f.write(datos)
+    return {"offset": offset, "longitud": memoryview(datos).nbytes}
+
+
+def _validar_cabecera(cabecera: bytes, tamano_archivo: int) -> tuple[int, int]:
+    if len(cabecera) < _CABECERA.size:
+        raise BundleInvalido("Archivo demasiado corto para ser un bundle")
+    magia, formato, _, offset, longitud = _CABECERA.unpack(cabecera)
+    if magia != _MAGIA:
+        raise BundleInvalido("El archivo no es un bundle de modelo")
+    if formato != FORMATO:
+        raise BundleInvalido(f"Formato de bundle no soportado: {formato}")
+    if offset + longitud > tamano_archivo or offset < _CABECERA.size:
+        raise BundleInvalido("Bundle truncado: el manifiesto está fuera del archivo")
+    return offset, longitud
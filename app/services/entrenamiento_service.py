@@ -1,13 +1,13 @@
 """Servicio de entrenamiento/reentrenamiento del modelo ML."""
 import json
 import logging
+import os
 import shutil
 import time
 from datetime import datetime
 from io import BytesIO
 from pathlib import Path
 
-import joblib
 import numpy as np
 import pandas as pd
 from openpyxl import Workbook
@@ -32,6 +32,7 @@ from xgboost import XGBClassifier
 from imblearn.over_sampling import SMOTE
 from imblearn.pipeline import Pipeline as ImbPipeline
 
+from app.services.bundle_modelo import NOMBRE_BUNDLE, convertir_pickles, escribir_bundle, verificar_bundle
 from app.services.prediccion_service import PrediccionService
 
 logger = logging.getLogger(__name__)
@@ -286,24 +287,30 @@ def entrenar_modelo(
         mejor_modelo = mejor_pipeline.named_steps["modelo"]
         logger.info("[entrenamiento %d] Paso 7 — Mejor modelo: %s (F1=%.4f)", entrenamiento_id, mejor_nombre, mejor["metricas"]["f1_score"])
 
-        # --- 8. Guardar artefactos candidatos ---
+        version = f"v_retrain_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        # --- 8. Guardar artefactos candidatos (un solo bundle con checksums) ---
         candidatos_dir = Path(model_dir) / "candidatos" / str(entrenamiento_id)
         candidatos_dir.mkdir(parents=True, exist_ok=True)
 
-        joblib.dump(mejor_modelo, candidatos_dir / "mejor_modelo.pkl")
-        joblib.dump(scaler, candidatos_dir / "scaler.pkl")
-        joblib.dump(label_encoders, candidatos_dir / "label_encoders.pkl")
-        joblib.dump(iter_imputer, candidatos_dir / "iter_imputer.pkl")
-        joblib.dump(feature_columns, candidatos_dir / "feature_columns.pkl")
-
-        for pkl in candidatos_dir.glob("*.pkl"):
-            logger.info("[entrenamiento %d] Paso 8 — Guardado %s (%.1f MB)", entrenamiento_id, pkl.name, pkl.stat().st_size / 1024 / 1024)
+        ruta_bundle = candidatos_dir / NOMBRE_BUNDLE
+        escribir_bundle(
+            ruta_bundle,
+            {
+                "mejor_modelo": mejor_modelo,
+                "scaler": scaler,
+                "label_encoders": label_encoders,
+                "iter_imputer": iter_imputer,
+                "feature_columns": feature_columns,
+            },
+            version,
+            extra={"entrenamiento_id": entrenamiento_id, "tipo_modelo": mejor_nombre},
+        )
+        logger.info("[entrenamiento %d] Paso 8 — Guardado %s (%.1f MB)", entrenamiento_id, ruta_bundle.name, ruta_bundle.stat().st_size / 1024 / 1024)
 
         # Leer métricas del modelo actual
         metricas_actual = _leer_metricas_modelo_actual(model_dir)
 
-        version = f"v_retrain_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
         # --- 9. Actualizar BD con resultados ---
         with Session(engine) as session:
             ent = session.get(EntrenamientoModelo, entrenamiento_id)
@@ -351,16 +358,6 @@ def aceptar_modelo(entrenamiento_id: int, model_dir: str) -> str:
     if not candidatos_dir.exists():
         raise FileNotFoundError(f"No se encontraron artefactos candidatos en {candidatos_dir}")
 
-    # Backup del modelo actual
-    backup_dir = model_path / "backup"
-    backup_dir.mkdir(exist_ok=True)
-    for pkl in model_path.glob("*.pkl"):
-        shutil.copy2(pkl, backup_dir / pkl.name)
-
-    # Copiar candidatos a producción
-    for pkl in candidatos_dir.glob("*.pkl"):
-        shutil.copy2(pkl, model_path / pkl.name)
-
     # Leer versión del entrenamiento
     from sqlalchemy import create_engine
     from sqlalchemy.orm import Session
@@ -377,6 +374,35 @@ def aceptar_modelo(entrenamiento_id: int, model_dir: str) -> str:
     finally:
         engine.dispose()
 
+    # Candidatos entrenados antes del formato bundle: se convierten sus .pkl
+    bundle_candidato = candidatos_dir / NOMBRE_BUNDLE
+    if not bundle_candidato.exists():
+        convertir_pickles(candidatos_dir, version_modelo=version)
+    verificar_bundle(bundle_candidato)
+    # Prueba de humo sobre el candidato antes de tocar producción
+    candidato = PrediccionService(str(candidatos_dir))
+    try:
+        candidato.prueba_humo()
+    finally:
+        candidato.cerrar()
+
+    # Backup del modelo actual (bundle y/o .pkl del formato anterior)
+    backup_dir = model_path / "backup"
+    backup_dir.mkdir(exist_ok=True)
+    for archivo in [*model_path.glob("*.pkl"), model_path / NOMBRE_BUNDLE]:
+        if archivo.exists():
+            shutil.copy2(archivo, backup_dir / archivo.name)
+
+    # Copiar el candidato a producción. Se copia a un temporal y se reemplaza con
+    # os.replace: el servicio en ejecución tiene mapeado el bundle anterior y debe
+    # seguir leyendo el archivo original hasta recargarse.
+    temporal = model_path / f".{NOMBRE_BUNDLE}.nuevo"
+    shutil.copy2(bundle_candidato, temporal)
+    os.replace(temporal, model_path / NOMBRE_BUNDLE)
+    # Los .pkl sueltos quedan en el backup; en producción solo queda el bundle
+    for pkl in model_path.glob("*.pkl"):
+        pkl.unlink()
+
     # Actualizar model_info.json
     model_info = {
         "timestamp": datetime.now().isoformat(),
@@ -413,11 +439,6 @@ def rechazar_modelo(entrenamiento_id: int, model_dir: str) -> None:
         shutil.rmtree(candidatos_dir, ignore_errors=True)
 
 
-def recargar_servicio(app_state, model_dir: str) -> None:
-    """Recarga el PrediccionService con los nuevos artefactos."""
-    app_state.prediccion_service = PrediccionService(model_dir)
-
-
 def generar_plantilla_excel() -> BytesIO:
     """Genera un Excel plantilla con las columnas requeridas para entrenamiento."""
     wb = Workbook()
@@ -0,0 +1,279 @@
+"""Evaluación compilada de ensambles de árboles (Random Forest / XGBoost) con NumPy.
+
+Al cargar el modelo, todos los árboles se aplanan en arreglos contiguos de
+nodos (feature, umbral, hijo izquierdo, hijo derecho, valor) con índices
+globales, y un lote se evalúa recorriendo todos los árboles a la vez: cada
+paso avanza un nivel para todas las combinaciones fila × árbol. Evita el
+despacho Python por árbol de sklearn y las estructuras por estimador.
+
+Las probabilidades reproducen predict_proba: mismas comparaciones (float32
+contra el umbral, `<=` en sklearn y `<` en XGBoost) y la misma suma secuencial
+árbol por árbol (en float64 para Random Forest, en float32 para XGBoost).
+"""
+import ctypes
+import ctypes.util
+import json
+import logging
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+logger = logging.getLogger(__name__)
+
+# Tipo de ensamble: determina el sentido de la comparación y cómo se combinan las hojas
+_RF = "random_forest"
+_XGB = "xgboost"
+
+
+def _funcion_libm(nombre: str):
+    """Función float32 de la libm del sistema (expf, logf), la misma que usa XGBoost.
+
+    Las versiones float32 de NumPy no siempre redondean igual; si la libm no
+    está disponible se calcula en float64 y se redondea a float32 (≤1 ulp).
+    """
+    ruta = ctypes.util.find_library("m")
+    if ruta is None:
+        return None
+    try:
+        funcion = getattr(ctypes.CDLL(ruta), nombre)
+    except (OSError, AttributeError):
+        return None
+    funcion.restype = ctypes.c_float
+    funcion.argtypes = [ctypes.c_float]
+    return np.frompyfunc(funcion, 1, 1)
+
+
+_expf = _funcion_libm("expf")
+_logf = _funcion_libm("logf")
+
+
+def _en_float32(funcion_libm, funcion_numpy, x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    if funcion_libm is not None:
+        return np.asarray(funcion_libm(x), dtype=np.float32)
+    return funcion_numpy(x.astype(np.float64)).astype(np.float32)
+
+
+class EvaluadorArboles:
+    """Ensamble de árboles compilado en arreglos planos de nodos.
+
+    Las hojas se compilan como nodos que apuntan a sí mismos (umbral +inf),
+    así el recorrido avanza `profundidad` pasos sin máscaras por fila.
+    """
+
+    # El recorrido hace n_filas × n_arboles × profundidad pasos en NumPy: gana en
+    # lotes chicos pero el recorrido nativo de sklearn/XGBoost es más rápido en
+    # lotes grandes. sklearn paga un despacho fijo por árbol, así que para Random
+    # Forest el punto de cruce no depende de n_arboles; XGBoost tiene un costo
+    # fijo por llamada y el cruce sí escala con el total de pasos.
+    MAX_PASOS_RF = 2048            # n_filas × profundidad
+    MAX_PASOS_XGB = 8192           # n_filas × n_arboles × profundidad
+
+    def __init__(
+        self,
+        tipo: str,
+        feature: np.ndarray,
+        umbral: np.ndarray,
+        izquierdo: np.ndarray,
+        derecho: np.ndarray,
+        valor: np.ndarray,
+        raices: np.ndarray,
+        profundidad: int,
+        classes: np.ndarray,
+        por_defecto_izq: np.ndarray | None = None,
+        margen_base: float = 0.0,
+    ) -> None:
+        self.tipo = tipo
+        self.feature = feature
+        self.umbral = umbral
+        self.izquierdo = izquierdo
+        self.derecho = derecho
+        # RF: (nodos, n_clases) fracciones por clase de cada hoja; XGB: (nodos,) valor de hoja
+        self.valor = valor
+        self.raices = raices
+        self.profundidad = profundidad
+        self.classes_ = classes
+        self.por_defecto_izq = por_defecto_izq
+        self.margen_base = margen_base
+        # hijos[2 * nodo + a_izquierda]: un solo gather por nivel en lugar de dos + where
+        self._hijos = np.column_stack([derecho, izquierdo]).ravel()
+
+    @classmethod
+    def compilar(cls, modelo) -> "EvaluadorArboles | None":
+        """Compila el modelo si es un ensamble soportado; None en otro caso (p. ej. LogReg)."""
+        try:
+            if isinstance(modelo, RandomForestClassifier):
+                return cls._desde_random_forest(modelo)
+            if isinstance(modelo, XGBClassifier):
+                return cls._desde_xgboost(modelo)
+        except ValueError as exc:
+            logger.warning("No se compiló el modelo %s: %s", type(modelo).__name__, exc)
+        return None
+
+    @property
+    def n_arboles(self) -> int:
+        return len(self.raices)
+
+    def conviene(self, n_filas: int) -> bool:
+        """True si para este tamaño de lote el evaluador compilado es más rápido que el estimador."""
+        pasos = n_filas * max(self.profundidad, 1)
+        if self.tipo == _RF:
+            return pasos <= self.MAX_PASOS_RF
+        return pasos * self.n_arboles <= self.MAX_PASOS_XGB
+
+    @property
+    def nbytes(self) -> int:
+        arreglos = [self.feature, self.umbral, self.izquierdo, self.derecho, self.valor, self.raices]
+        if self.por_defecto_izq is not None:
+            arreglos.append(self.por_defecto_izq)
+        return sum(a.nbytes for a in arreglos)
+
+    # --- Compilación ---
+
+    @classmethod
+    def _desde_random_forest(cls, modelo: RandomForestClassifier) -> "EvaluadorArboles":
+        if modelo.n_outputs_ != 1:
+            raise ValueError("solo se soporta una salida")
+        partes = []
+        for estimador in modelo.estimators_:
+            arbol = estimador.tree_
+            # Desde sklearn 1.4 tree_.value ya guarda fracciones por clase y
+            # DecisionTreeClassifier.predict_proba lo devuelve tal cual
+            valor = np.array(arbol.value[:, 0, : modelo.n_classes_], dtype=np.float64)
+            partes.append((
+                arbol.feature, arbol.threshold, arbol.children_left, arbol.children_right,
+                valor, int(arbol.max_depth),
+            ))
+        return cls._ensamblar(_RF, partes, modelo.classes_)
+
+    @classmethod
+    def _desde_xgboost(cls, modelo: XGBClassifier) -> "EvaluadorArboles":
+        booster = modelo.get_booster()
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        if learner["objective"]["name"] != "binary:logistic":
+            raise ValueError(f"objetivo {learner['objective']['name']} no soportado")
+        if learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError("solo se soporta el booster gbtree")
+        arboles_json = learner["gradient_booster"]["model"]["trees"]
+
+        # predict_proba usa solo hasta best_iteration cuando hubo early stopping
+        mejor_iteracion = booster.attr("best_iteration")
+        if mejor_iteracion is not None:
+            indptr = learner["gradient_booster"]["model"]["iteration_indptr"]
+            arboles_json = arboles_json[: indptr[int(mejor_iteracion) + 1]]
+
+        partes = []
+        for arbol in arboles_json:
+            if any(arbol["split_type"]):
+                raise ValueError("splits categóricos no soportados")
+            izquierdo = np.asarray(arbol["left_children"], dtype=np.int64)
+            derecho = np.asarray(arbol["right_children"], dtype=np.int64)
+            condicion = np.asarray(arbol["split_conditions"], dtype=np.float32)
+            hoja = izquierdo == -1
+            # En las hojas split_conditions guarda el valor de la hoja
+            valor = np.where(hoja, condicion, np.float32(0.0)).astype(np.float32)
+            partes.append((
+                np.where(hoja, -2, np.asarray(arbol["split_indices"], dtype=np.int64)),
+                condicion, izquierdo, derecho, valor,
+                _profundidad(izquierdo, derecho),
+                np.asarray(arbol["default_left"], dtype=bool),
+            ))
+
+        # base_score se guarda en escala de probabilidad; XGBoost lo pasa a margen en float32
+        base_score = np.float32(learner["learner_model_param"]["base_score"].strip("[]"))
+        margen_base = -_en_float32(_logf, np.log, np.float32(1.0) / base_score - np.float32(1.0))
+        return cls._ensamblar(_XGB, partes, modelo.classes_, margen_base=float(margen_base))
+
+    @classmethod
+    def _ensamblar(cls, tipo: str, partes: list, classes, margen_base: float = 0.0) -> "EvaluadorArboles":
+        """Concatena los árboles con índices globales y convierte las hojas en nodos absorbentes."""
+        tamanos = np.array([len(p[0]) for p in partes], dtype=np.int64)
+        desplazamientos = np.concatenate([[0], np.cumsum(tamanos)[:-1]])
+
+        feature = np.concatenate([p[0] for p in partes]).astype(np.int64)
+        hoja = feature < 0
+        izquierdo = np.concatenate([
+            np.where(p[2] >= 0, p[2] + d, -1) for p, d in zip(partes, desplazamientos)
+        ])
+        derecho = np.concatenate([
+            np.where(p[3] >= 0, p[3] + d, -1) for p, d in zip(partes, desplazamientos)
+        ])
+        propio = np.arange(len(feature), dtype=np.int64)
+        izquierdo[hoja] = propio[hoja]
+        derecho[hoja] = propio[hoja]
+        feature[hoja] = 0
+
+        dtype_umbral = np.float64 if tipo == _RF else np.float32
+        umbral = np.concatenate([p[1] for p in partes]).astype(dtype_umbral)
+        umbral[hoja] = np.inf
+
+        n_nodos = len(feature)
+        dtype_indice = np.int32 if n_nodos < np.iinfo(np.int32).max else np.int64
+        por_defecto_izq = None
+        if tipo == _XGB:
+            por_defecto_izq = np.concatenate([p[6] for p in partes])
+
+        return cls(
+            tipo=tipo,
+            feature=feature.astype(np.int32),
+            umbral=umbral,
+            izquierdo=izquierdo.astype(dtype_indice),
+            derecho=derecho.astype(dtype_indice),
+            valor=np.concatenate([p[4] for p in partes]),
+            raices=desplazamientos.astype(dtype_indice),
+            profundidad=max(p[5] for p in partes),
+            classes=np.asarray(classes),
+            por_defecto_izq=por_defecto_izq,
+            margen_base=margen_base,
+        )
+
+    # --- Evaluación ---
+
+    def hojas(self, X: np.ndarray) -> np.ndarray:
+        """Índice global de la hoja alcanzada por cada fila en cada árbol, forma (n, n_arboles)."""
+        # Ambos ensambles evalúan sobre X en float32
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_features = X.shape[1]
+        X = X.ravel()
+        inicio_fila = np.arange(len(X) // max(n_features, 1), dtype=np.intp)[:, None] * n_features
+        nodo = np.broadcast_to(self.raices, (len(inicio_fila), self.n_arboles))
+        for _ in range(self.profundidad):
+            x = X[inicio_fila + self.feature[nodo]]
+            if self.tipo == _RF:
+                a_izquierda = x <= self.umbral[nodo]
+            else:
+                # XGBoost envía los faltantes (NaN) por la rama por defecto del nodo
+                a_izquierda = np.where(np.isnan(x), self.por_defecto_izq[nodo], x < self.umbral[nodo])
+            nodo = self._hijos[2 * nodo + a_izquierda]
+        return nodo
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        hojas = self.hojas(X)
+        if self.tipo == _RF:
+            # cumsum suma árbol por árbol, en el mismo orden que RandomForestClassifier
+            suma = np.cumsum(self.valor[hojas], axis=1)[:, -1]
+            return suma / self.n_arboles
+
+        base = np.full((len(hojas), 1), self.margen_base, dtype=np.float32)
+        margen = np.cumsum(np.hstack([base, self.valor[hojas]]), axis=1, dtype=np.float32)[:, -1]
+        p1 = np.float32(1.0) / (_en_float32(_expf, np.exp, -margen) + np.float32(1.0))
+        return np.column_stack([np.float32(1.0) - p1, p1])
+
+    def predecir(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Probabilidades y clases, con la misma regla de decisión que el estimador original."""
+        probas = self.predict_proba(X)
+        if self.tipo == _RF:
+            return probas, self.classes_.take(np.argmax(probas, axis=1))
+        return probas, (probas[:, 1] > 0.5).astype(np.int64)
+
+
+def _profundidad(izquierdo: np.ndarray, derecho: np.ndarray) -> int:
+    """Profundidad de un árbol dado por sus arreglos de hijos (raíz en el nodo 0)."""
+    profundidad, nivel = 0, np.array([0])
+    while True:
+        nivel = nivel[izquierdo[nivel] != -1]
+        if len(nivel) == 0:
+            return profundidad
+        nivel = np.concatenate([izquierdo[nivel], derecho[nivel]])
+        profundidad += 1
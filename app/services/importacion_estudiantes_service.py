@@ -0,0 +1,744 @@
+"""Importación de estudiantes: lectura del archivo, escritura set-based y procesamiento en segundo plano."""
+import asyncio
+import itertools
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator
+
+import pandas as pd
+from sqlalchemy import case, delete, func, insert, literal_column, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+from app.models.area import Area
+from app.models.gestion_academica import GestionAcademica
+from app.models.inscripcion import Inscripcion
+from app.models.lote_importacion_estudiante import ErrorImportacionEstudiante, LoteImportacionEstudiante
+from app.models.lote_prediccion import EstadoLote
+from app.models.malla_curricular import MallaCurricular
+from app.models.paralelo import Paralelo
+from app.models.semester import Semestre
+from app.models.student import Estudiante
+from app.models.subject import Materia
+from app.services.ingesta_archivos import (
+    ArchivoInvalido,
+    LectorTabular,
+    abrir_lector_async,
+    bloques_async,
+)
+
+logger = logging.getLogger(__name__)
+
+# Columnas que el archivo solo actualiza si trae valor (nunca se pisan con NULL)
+CAMPOS_OPCIONALES = (
+    "fecha_nacimiento", "genero", "grado", "estrato_socioeconomico",
+    "ocupacion_laboral", "con_quien_vive", "apoyo_economico",
+    "modalidad_ingreso", "tipo_colegio", "nombre_malla",
+)
+
+# Columnas sociodemográficas que se toman del archivo si vienen
+_CAMPOS_SOCIODEMOGRAFICOS = [
+    "fecha_nacimiento", "genero", "grado", "estrato_socioeconomico",
+    "ocupacion_laboral", "con_quien_vive", "apoyo_economico",
+    "modalidad_ingreso", "tipo_colegio",
+]
+
+COLUMNAS_OBLIGATORIAS = ("Codigo", "Nombre", "Apellido", "Area", "Paralelo")
+
+# Claves de LoteImportacionEstudiante.resumen (las de ImportacionResumen)
+CONTADORES_RESUMEN = (
+    "areas_creadas", "semestres_creados", "paralelos_creados", "materias_creadas",
+    "inscripciones_creadas", "inscripciones_existentes", "mallas_creadas",
+)
+
+class ImportacionInvalida(Exception):
+    """El archivo no se puede importar (vacío o sin las columnas obligatorias)."""
+
+
+def validar_encabezado(lector: LectorTabular) -> None:
+    """Lanza ImportacionInvalida si el archivo no tiene encabezado o le faltan columnas obligatorias."""
+    if not lector.columnas:
+        raise ImportacionInvalida("El archivo Excel está vacío.")
+    faltantes = lector.faltantes(COLUMNAS_OBLIGATORIAS)
+    if faltantes:
+        raise ImportacionInvalida(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+
+
+def _texto(bloque: pd.DataFrame, columna: str) -> pd.Series:
+    """Columna como texto recortado; NaN si falta la columna o la celda está vacía."""
+    if columna not in bloque:
+        return pd.Series(None, index=bloque.index, dtype=object)
+    texto = bloque[columna].dropna().map(str).str.strip()
+    return texto[texto != ""].reindex(bloque.index).astype(object)
+
+
+def _materias(celdas: pd.Series) -> pd.Series:
+    """Una fila por materia de las celdas separadas por comas (índice = fila de origen)."""
+    materias = celdas.dropna().str.split(",").explode().str.strip()
+    return materias[materias.notna() & (materias != "")]
+
+
+def _objetos(serie: pd.Series) -> pd.Series:
+    """Serie de objetos Python (int, str, date) con None en lugar de NaN/NA, lista para el driver."""
+    return serie.astype(object).where(serie.notna(), None)
+
+
+@dataclass
+class Catalogos:
+    """Ids de los catálogos que cita el archivo, por nombre (incluye los creados en la Fase 2)."""
+    areas: dict[str, int]
+    semestres: dict[str, int]
+    materias: dict[str, int]
+    gestiones: dict[str, int]
+    # (nombre del paralelo, area_id) → paralelo_id
+    paralelos: dict[tuple[str, int], int]
+
+
+@dataclass
+class BloqueValidado:
+    """Resultado de validar un bloque del archivo."""
+    # Filas aceptadas: codigo_estudiante, nombre, apellido, paralelo_id,
+    # campos sociodemográficos y nombre_malla (NaN = no informado)
+    estudiantes: pd.DataFrame
+    # Una fila por (fila aceptada, materia existente): codigo_estudiante,
+    # materia_id, gestion_academica, gestion_id, area_id, semestre_id
+    inscripciones: pd.DataFrame
+    # fila, codigo, mensaje; una por fila rechazada (o con materias sin gestión válida)
+    errores: pd.DataFrame
+    materias_no_encontradas: set[str]
+
+
+def validar_bloque(bloque: pd.DataFrame, catalogos: Catalogos, nombre_malla: str | None = None) -> BloqueValidado:
+    """Valida un bloque completo con operaciones por columna, sin tocar la BD.
+
+    Aplica las mismas reglas y en el mismo orden que la importación fila
+    por fila: campos obligatorios, área, paralelo (merge contra el catálogo)
+    y, para las filas con Materias, la gestión académica. Cada fila tiene a
+    lo sumo un error; una fila con materias pero sin gestión válida igual
+    crea/actualiza al estudiante, solo se omiten sus inscripciones.
+    """
+    textos = {
+        columna: _texto(bloque, columna)
+        for columna in (*COLUMNAS_OBLIGATORIAS, "Semestre", "Materias", "GestionAcademica", "nombre_malla")
+    }
+    mensajes = pd.Series(None, index=bloque.index, dtype=object)
+
+    faltan = pd.DataFrame({columna: textos[columna].isna() for columna in COLUMNAS_OBLIGATORIAS})
+    incompletas = faltan.any(axis=1)
+    mensajes[incompletas] = "Faltan campos obligatorios: " + faltan[incompletas].dot(faltan.columns + ", ").str[:-2]
+
+    area_id = textos["Area"].map(catalogos.areas).astype("Int64")
+    sin_area = mensajes.isna() & area_id.isna()
+    mensajes[sin_area] = "Área '" + textos["Area"][sin_area] + "' no encontrada en cache (error interno)"
+
+    paralelos = pd.DataFrame(
+        [(nombre, area, paralelo_id) for (nombre, area), paralelo_id in catalogos.paralelos.items()],
+        columns=["Paralelo", "area_id", "paralelo_id"],
+    ).astype({"area_id": "Int64", "paralelo_id": "Int64"})
+    paralelo_id = (
+        pd.DataFrame({"Paralelo": textos["Paralelo"], "area_id": area_id})
+        .merge(paralelos, on=["Paralelo", "area_id"], how="left", validate="many_to_one")["paralelo_id"]
+        .set_axis(bloque.index)
+    )
+    sin_paralelo = mensajes.isna() & paralelo_id.isna()
+    mensajes[sin_paralelo] = (
+        "Paralelo '" + textos["Paralelo"][sin_paralelo]
+        + "' no encontrado para área '" + textos["Area"][sin_paralelo] + "'"
+    )
+    aceptadas = mensajes.isna()
+
+    estudiantes = pd.DataFrame({
+        "codigo_estudiante": textos["Codigo"],
+        "nombre": textos["Nombre"],
+        "apellido": textos["Apellido"],
+        "paralelo_id": _objetos(paralelo_id),
+        **{campo: _texto(bloque, campo) for campo in _CAMPOS_SOCIODEMOGRAFICOS},
+        "nombre_malla": textos["nombre_malla"].fillna(nombre_malla) if nombre_malla else textos["nombre_malla"],
+    })[aceptadas]
+    # Fecha que no se puede interpretar: se conserva la de la BD
+    fechas = pd.to_datetime(estudiantes["fecha_nacimiento"], errors="coerce", format="mixed")
+    estudiantes["fecha_nacimiento"] = _objetos(fechas.dt.date.where(fechas.notna()))
+
+    con_materias = aceptadas & textos["Materias"].notna()
+    sin_gestion = con_materias & textos["GestionAcademica"].isna()
+    mensajes[sin_gestion] = "Tiene Materias pero falta GestionAcademica"
+    gestion_id = textos["GestionAcademica"].map(catalogos.gestiones).astype("Int64")
+    gestion_inexistente = con_materias & ~sin_gestion & gestion_id.isna()
+    mensajes[gestion_inexistente] = (
+        "Gestión académica '" + textos["GestionAcademica"][gestion_inexistente]
+        + "' no existe. Debe crearse previamente."
+    )
+
+    materias = _materias(textos["Materias"][con_materias & mensajes.isna()])
+    materia_id = materias.map(catalogos.materias).astype("Int64")
+    encontradas = materia_id.notna()
+    filas = materias.index[encontradas]
+    inscripciones = pd.DataFrame({
+        "codigo_estudiante": textos["Codigo"].loc[filas],
+        "materia_id": _objetos(materia_id[encontradas]),
+        "gestion_academica": textos["GestionAcademica"].loc[filas],
+        "gestion_id": _objetos(gestion_id.loc[filas]),
+        "area_id": _objetos(area_id.loc[filas]),
+        "semestre_id": _objetos(textos["Semestre"].loc[filas].map(catalogos.semestres).astype("Int64")),
+    }).reset_index(drop=True)
+
+    rechazadas = mensajes.notna()
+    errores = pd.DataFrame({
+        "fila": pd.Series(bloque.index + 2, index=bloque.index),  # +2: encabezado + 0-indexed
+        "codigo": _objetos(textos["Codigo"]),
+        "mensaje": mensajes,
+    })[rechazadas].reset_index(drop=True)
+    return BloqueValidado(estudiantes, inscripciones, errores, set(materias[~encontradas]))
+
+
+async def upsert_estudiantes(db: AsyncSession, filas: list[dict]) -> dict[str, tuple[int, bool]]:
+    """INSERT ... ON CONFLICT (codigo_estudiante) DO UPDATE de todos los estudiantes del archivo.
+
+    `filas` trae un dict por código (sin repetidos: ON CONFLICT no puede tocar
+    la misma fila dos veces en una sentencia) con codigo_estudiante, nombre,
+    apellido, paralelo_id y los CAMPOS_OPCIONALES (None = conservar el valor
+    de la BD). fecha_actualizacion solo se mueve si algo cambió, para que el
+    refresco de riesgo no re-puntúe a quien se re-importó igual.
+
+    Devuelve codigo → (estudiante_id, creado), con `creado` leído de
+    RETURNING (xmax = 0 en las filas insertadas).
+    """
+    if not filas:
+        return {}
+    tabla = Estudiante.__table__
+    stmt = pg_insert(tabla)
+    nuevos = {
+        "nombre": stmt.excluded.nombre,
+        "apellido": stmt.excluded.apellido,
+        "paralelo_id": stmt.excluded.paralelo_id,
+        **{campo: func.coalesce(stmt.excluded[campo], tabla.c[campo]) for campo in CAMPOS_OPCIONALES},
+    }
+    cambio = tuple_(*(tabla.c[campo] for campo in nuevos)).is_distinct_from(tuple_(*nuevos.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tabla.c.codigo_estudiante],
+        set_={
+            **nuevos,
+            "fecha_actualizacion": case((cambio, func.now()), else_=tabla.c.fecha_actualizacion),
+        },
+    ).returning(tabla.c.codigo_estudiante, tabla.c.id, literal_column("xmax = 0").label("creado"))
+
+    columnas = ("codigo_estudiante", "nombre", "apellido", "paralelo_id", *CAMPOS_OPCIONALES)
+    result = await db.execute(stmt, [{col: fila.get(col) for col in columnas} for fila in filas])
+    return {codigo: (estudiante_id, creado) for codigo, estudiante_id, creado in result}
+
+
+async def insertar_materias(db: AsyncSession, nombres: set[str]) -> tuple[dict[str, int], int]:
+    """Resuelve `nombres` a ids creando las materias que falten; devuelve (nombre → id, creadas).
+
+    INSERT ... ON CONFLICT (nombre) DO NOTHING RETURNING solo devuelve las
+    insertadas; las que ya existían se leen con un único SELECT.
+    """
+    if not nombres:
+        return {}, 0
+    tabla = Materia.__table__
+    stmt = (
+        pg_insert(tabla)
+        .on_conflict_do_nothing(index_elements=[tabla.c.nombre])
+        .returning(tabla.c.nombre, tabla.c.id)
+    )
+    result = await db.execute(stmt, [{"nombre": nombre} for nombre in sorted(nombres)])
+    ids: dict[str, int] = dict(result.all())
+    creadas = len(ids)
+    existentes = nombres - ids.keys()
+    if existentes:
+        res = await db.execute(select(Materia.nombre, Materia.id).where(Materia.nombre.in_(existentes)))
+        ids.update(res.tuples().all())
+    return ids, creadas
+
+
+async def insertar_mallas(
+    db: AsyncSession, claves: set[tuple[int, int, int | None]], nombre_malla: str | None = None
+) -> int:
+    """Inserta las combinaciones (materia_id, area_id, semestre_id) nuevas; devuelve cuántas creó.
+
+    La unicidad incluye columnas que pueden ser NULL (semestre_id,
+    nombre_malla) y PostgreSQL no considera iguales dos NULL, así que sin
+    `nombre_malla` el llamador debe pasar solo claves que no estén ya en la
+    tabla; el ON CONFLICT cubre las que coinciden por completo (p. ej. una
+    carga concurrente, o todas si vienen semestre y nombre_malla).
+    """
+    if not claves:
+        return 0
+    stmt = (
+        pg_insert(MallaCurricular.__table__)
+        .on_conflict_do_nothing(constraint="uq_malla_curricular_materia_area_semestre_nombre")
+        .returning(MallaCurricular.__table__.c.id)
+    )
+    result = await db.execute(
+        stmt,
+        [
+            {"materia_id": materia_id, "area_id": area_id, "semestre_id": semestre_id, "nombre_malla": nombre_malla}
+            for materia_id, area_id, semestre_id in sorted(claves, key=lambda c: (c[0], c[1], c[2] or 0))
+        ],
+    )
+    return len(result.all())
+
+
+async def insertar_inscripciones(db: AsyncSession, filas: set[tuple[int, int, str, int]]) -> int:
+    """Inserta (estudiante_id, materia_id, gestion_academica, gestion_id) con ON CONFLICT DO NOTHING.
+
+    Devuelve cuántas inscripciones nuevas se crearon (filas de RETURNING); las
+    que ya existían las descarta la constraint única.
+    """
+    if not filas:
+        return 0
+    stmt = (
+        pg_insert(Inscripcion.__table__)
+        .on_conflict_do_nothing(constraint="uq_inscripciones_estudiante_materia_gestion")
+        .returning(Inscripcion.__table__.c.id)
+    )
+    result = await db.execute(
+        stmt,
+        [
+            {
+                "estudiante_id": estudiante_id,
+                "materia_id": materia_id,
+                "gestion_academica": gestion_academica,
+                "gestion_id": gestion_id,
+            }
+            for estudiante_id, materia_id, gestion_academica, gestion_id in sorted(filas)
+        ],
+    )
+    return len(result.all())
+
+
+class RegistroErroresImportacion:
+    """Errores por fila de un lote: se vuelcan a errores_importacion_estudiantes en tandas.
+
+    Usa sesiones propias (confirmadas al instante) para que los errores no
+    esperen a la transacción de la importación ni se acumulen en memoria.
+    """
+
+    def __init__(self, lote_id: int, tamano_tanda: int = 500) -> None:
+        self.lote_id = lote_id
+        self.tamano_tanda = tamano_tanda
+        self.total = 0
+        self._pendientes: list[dict] = []
+
+    async def agregar(self, errores: pd.DataFrame) -> None:
+        """Agrega los errores de un bloque (columnas fila, codigo, mensaje)."""
+        self._pendientes.extend(errores.assign(lote_id=self.lote_id).to_dict("records"))
+        self.total += len(errores)
+        if len(self._pendientes) >= self.tamano_tanda:
+            await self.vaciar()
+
+    async def vaciar(self) -> None:
+        if not self._pendientes:
+            return
+        pendientes, self._pendientes = self._pendientes, []
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(ErrorImportacionEstudiante), pendientes)
+            await db.commit()
+
+
+class ReporteErroresImportacion:
+    """Errores por fila en memoria, para el modo dry_run (que no escribe en la BD)."""
+
+    def __init__(self) -> None:
+        self.errores: list[dict] = []
+
+    @property
+    def total(self) -> int:
+        return len(self.errores)
+
+    async def agregar(self, errores: pd.DataFrame) -> None:
+        self.errores.extend(errores.to_dict("records"))
+
+    async def vaciar(self) -> None:
+        pass
+
+
+def _en_tandas(valores: list, tamano: int = 5000) -> Iterator[list]:
+    """Parte `valores` para que los IN no pasen el límite de parámetros de asyncpg."""
+    for inicio in range(0, len(valores), tamano):
+        yield valores[inicio:inicio + tamano]
+
+
+async def importar_archivo_estudiantes(
+    db: AsyncSession,
+    lector: LectorTabular,
+    nombre_malla: str | None,
+    usuario_id: int,
+    errores: RegistroErroresImportacion | ReporteErroresImportacion,
+    avance: Callable[[int], Awaitable[None]] | None = None,
+    simular: bool = False,
+) -> dict:
+    """Importa el archivo en dos pasadas por bloques: catálogos primero y luego las filas.
+
+    La segunda pasada valida cada bloque con validar_bloque, arma en memoria
+    el estado deseado (estudiantes por código, inscripciones y mallas
+    nuevas) y lo escribe con upserts set-based. Los errores de fila van a
+    `errores` y `avance` recibe tras cada bloque las filas ya revisadas. No
+    confirma la transacción; devuelve los totales del lote (total_filas,
+    estudiantes_creados, estudiantes_actualizados y resumen).
+
+    Con `simular` (dry_run) no escribe nada: los catálogos nuevos reciben
+    ids provisorios y los totales se estiman con consultas de solo lectura.
+    """
+    validar_encabezado(lector)
+
+    # Primera pasada: valores de catálogo y total de filas, sin retener las filas.
+    # También las materias y gestiones citadas, para precargar solo esas claves.
+    areas_excel: set[str] = set()
+    semestres_excel: set[str] = set()
+    materias_excel: set[str] = set()
+    gestiones_excel: set[str] = set()
+    # (paralelo, área) → primer semestre informado para ese paralelo
+    paralelos_unicos: dict[tuple[str, str], str | None] = {}
+    async for bloque in bloques_async(lector):
+        textos = pd.DataFrame({
+            columna: _texto(bloque, columna)
+            for columna in ("Paralelo", "Area", "Semestre", "Materias", "GestionAcademica")
+        })
+        areas_excel.update(textos["Area"].dropna())
+        semestres_excel.update(textos["Semestre"].dropna())
+        gestiones_excel.update(textos["GestionAcademica"].dropna())
+        materias_excel.update(_materias(textos["Materias"]))
+        semestre_por_paralelo = (
+            textos.dropna(subset=["Paralelo", "Area"]).groupby(["Paralelo", "Area"], sort=False)["Semestre"].first()
+        )
+        for clave, sem_nombre in semestre_por_paralelo.items():
+            if paralelos_unicos.get(clave) is None:
+                paralelos_unicos[clave] = sem_nombre if pd.notna(sem_nombre) else None
+    total_filas = lector.filas_leidas
+
+    if total_filas == 0:
+        raise ImportacionInvalida("El archivo Excel está vacío.")
+
+    resumen = dict.fromkeys(CONTADORES_RESUMEN, 0)
+    estudiantes_creados = 0
+    estudiantes_actualizados = 0
+
+    # ── Fase 1: Pre-carga de las entidades que cita el archivo ──────
+    # Una consulta por tabla filtrada por las claves del archivo (IN), así el
+    # costo sigue al tamaño de la carga y no al histórico de la institución.
+
+    # Áreas
+    res = await db.execute(select(Area).where(Area.nombre.in_(areas_excel)))
+    areas_cache: dict[str, Area] = {a.nombre: a for a in res.scalars().all()}
+
+    # Semestres
+    res = await db.execute(select(Semestre).where(Semestre.nombre.in_(semestres_excel)))
+    semestres_cache: dict[str, Semestre] = {s.nombre: s for s in res.scalars().all()}
+
+    # Materias
+    res = await db.execute(select(Materia).where(Materia.nombre.in_(materias_excel)))
+    materias_cache: dict[str, Materia] = {m.nombre: m for m in res.scalars().all()}
+
+    # Paralelos: pares (nombre, área) del archivo cuyas áreas ya existen
+    pares_paralelo = [
+        (p_nombre, areas_cache[a_nombre].id)
+        for p_nombre, a_nombre in paralelos_unicos
+        if a_nombre in areas_cache
+    ]
+    paralelos_cache: dict[tuple[str, int], Paralelo] = {}
+    if pares_paralelo:
+        res = await db.execute(
+            select(Paralelo).where(tuple_(Paralelo.nombre, Paralelo.area_id).in_(pares_paralelo))
+        )
+        paralelos_cache = {(p.nombre, p.area_id): p for p in res.scalars().all()}
+
+    # Gestiones académicas
+    res = await db.execute(select(GestionAcademica).where(GestionAcademica.nombre.in_(gestiones_excel)))
+    gestiones_cache: dict[str, GestionAcademica] = {
+        g.nombre: g for g in res.scalars().all()
+    }
+
+    # ── Fase 2: Pre-creación de entidades catálogo ──────────────────
+    # En simulación no se insertan: reciben ids provisorios (negativos)
+    provisorios = itertools.count(-1, -1)
+
+    async def crear(entidad):
+        if simular:
+            entidad.id = next(provisorios)
+        else:
+            db.add(entidad)
+            await db.flush()
+        return entidad
+
+    # 2.1 Áreas únicas
+    for nombre_area in areas_excel:
+        if nombre_area not in areas_cache:
+            areas_cache[nombre_area] = await crear(Area(nombre=nombre_area))
+            resumen["areas_creadas"] += 1
+
+    # 2.2 Semestres únicos
+    for nombre_sem in semestres_excel:
+        if nombre_sem not in semestres_cache:
+            semestres_cache[nombre_sem] = await crear(Semestre(nombre=nombre_sem))
+            resumen["semestres_creados"] += 1
+
+    # 2.3 Paralelos únicos (por nombre + área)
+    for (p_nombre, a_nombre), sem_nombre in paralelos_unicos.items():
+        area_obj = areas_cache.get(a_nombre)
+        if not area_obj:
+            continue
+        # Semestre de la primera fila con este paralelo+area que lo informa
+        semestre_id = semestres_cache[sem_nombre].id if sem_nombre in semestres_cache else None
+
+        key = (p_nombre, area_obj.id)
+        if key not in paralelos_cache:
+            paralelos_cache[key] = await crear(Paralelo(
+                nombre=p_nombre,
+                area_id=area_obj.id,
+                semestre_id=semestre_id,
+                encargado_id=usuario_id,
+            ))
+            resumen["paralelos_creados"] += 1
+
+    catalogos = Catalogos(
+        areas={nombre: a.id for nombre, a in areas_cache.items()},
+        semestres={nombre: s.id for nombre, s in semestres_cache.items()},
+        materias={nombre: m.id for nombre, m in materias_cache.items()},
+        gestiones={nombre: g.id for nombre, g in gestiones_cache.items()},
+        paralelos={clave: p.id for clave, p in paralelos_cache.items()},
+    )
+
+    # ── Fase 3: Validación vectorizada y estado deseado, sin tocar la BD ──
+    # Los estudiantes se acumulan por código (las filas repetidas se combinan
+    # en orden, sin pisar con vacíos) y las inscripciones/mallas como claves;
+    # la Fase 4 los escribe con unas pocas sentencias set-based.
+
+    materias_no_encontradas: set[str] = set()
+    estudiantes_deseados: dict[str, dict] = {}
+    filas_por_codigo: dict[str, int] = {}
+    inscripciones_deseadas: list[tuple[str, int, str, int]] = []
+    mallas_citadas: set[tuple[int, int, int | None]] = set()
+
+    filas_revisadas = 0
+    async for bloque in bloques_async(lector):
+        validado = validar_bloque(bloque, catalogos, nombre_malla)
+        await errores.agregar(validado.errores)
+        materias_no_encontradas |= validado.materias_no_encontradas
+
+        # La última fila manda en nombre/apellido/paralelo; los demás campos
+        # solo se toman si traen valor (last() salta los NaN)
+        estudiantes = validado.estudiantes
+        for codigo, filas in estudiantes["codigo_estudiante"].value_counts(sort=False).items():
+            filas_por_codigo[codigo] = filas_por_codigo.get(codigo, 0) + filas
+        for codigo, valores in estudiantes.groupby("codigo_estudiante", sort=False).last().to_dict("index").items():
+            est = estudiantes_deseados.setdefault(codigo, {"codigo_estudiante": codigo})
+            est.update((campo, valor) for campo, valor in valores.items() if pd.notna(valor))
+
+        inscripciones = validado.inscripciones
+        inscripciones_deseadas.extend(inscripciones[
+            ["codigo_estudiante", "materia_id", "gestion_academica", "gestion_id"]
+        ].itertuples(index=False, name=None))
+        mallas_citadas.update(
+            inscripciones[["materia_id", "area_id", "semestre_id"]].itertuples(index=False, name=None)
+        )
+
+        filas_revisadas += len(bloque)
+        if avance is not None:
+            await avance(filas_revisadas)
+
+    # ── Fase 4: Escritura set-based ─────────────────────────────────
+
+    # Mallas: solo las combinaciones citadas que no existan ya (con cualquier nombre_malla)
+    mallas_nuevas = set(mallas_citadas)
+    if mallas_citadas:
+        res = await db.execute(
+            select(MallaCurricular.materia_id, MallaCurricular.area_id, MallaCurricular.semestre_id)
+            .where(
+                MallaCurricular.materia_id.in_({materia_id for materia_id, _, _ in mallas_citadas}),
+                MallaCurricular.area_id.in_({area_id for _, area_id, _ in mallas_citadas}),
+            )
+        )
+        mallas_nuevas -= set(res.tuples().all())
+
+    if simular:
+        estudiantes_ids = await _estudiantes_existentes(db, list(estudiantes_deseados))
+        resumen["mallas_creadas"] = len(mallas_nuevas)
+        resumen["inscripciones_creadas"] = len(
+            {(codigo, materia_id, gestion_nombre) for codigo, materia_id, gestion_nombre, _ in inscripciones_deseadas}
+            - await _inscripciones_existentes(db, estudiantes_ids)
+        )
+    else:
+        # Estudiantes: un upsert; RETURNING distingue creados de actualizados
+        estudiantes_ids = await upsert_estudiantes(db, list(estudiantes_deseados.values()))
+        resumen["mallas_creadas"] = await insertar_mallas(db, mallas_nuevas)
+        # Inscripciones: las repetidas en el archivo o ya existentes en BD cuentan como existentes
+        resumen["inscripciones_creadas"] = await insertar_inscripciones(db, {
+            (estudiantes_ids[codigo][0], materia_id, gestion_nombre, gestion_id)
+            for codigo, materia_id, gestion_nombre, gestion_id in inscripciones_deseadas
+        })
+    resumen["inscripciones_existentes"] = len(inscripciones_deseadas) - resumen["inscripciones_creadas"]
+
+    for codigo, filas in filas_por_codigo.items():
+        creado = estudiantes_ids.get(codigo, (None, True))[1]
+        estudiantes_creados += int(creado)
+        estudiantes_actualizados += filas - int(creado)
+
+    return {
+        "total_filas": total_filas,
+        "estudiantes_creados": estudiantes_creados,
+        "estudiantes_actualizados": estudiantes_actualizados,
+        "resumen": {**resumen, "materias_no_encontradas": sorted(materias_no_encontradas)},
+    }
+
+
+async def _estudiantes_existentes(db: AsyncSession, codigos: list[str]) -> dict[str, tuple[int, bool]]:
+    """codigo → (estudiante_id, False) de los códigos que ya existen, como upsert_estudiantes."""
+    existentes: dict[str, tuple[int, bool]] = {}
+    for tanda in _en_tandas(codigos):
+        res = await db.execute(
+            select(Estudiante.codigo_estudiante, Estudiante.id).where(Estudiante.codigo_estudiante.in_(tanda))
+        )
+        existentes.update((codigo, (estudiante_id, False)) for codigo, estudiante_id in res)
+    return existentes
+
+
+async def _inscripciones_existentes(
+    db: AsyncSession, estudiantes_ids: dict[str, tuple[int, bool]]
+) -> set[tuple[str, int, str]]:
+    """(codigo, materia_id, gestion_academica) ya inscritos de los estudiantes existentes."""
+    codigos = {estudiante_id: codigo for codigo, (estudiante_id, _) in estudiantes_ids.items()}
+    existentes: set[tuple[str, int, str]] = set()
+    for tanda in _en_tandas(list(codigos)):
+        res = await db.execute(
+            select(Inscripcion.estudiante_id, Inscripcion.materia_id, Inscripcion.gestion_academica)
+            .where(Inscripcion.estudiante_id.in_(tanda))
+        )
+        existentes.update((codigos[estudiante_id], materia_id, gestion) for estudiante_id, materia_id, gestion in res)
+    return existentes
+
+
+class ProcesadorImportacionesEstudiantes:
+    """Procesa en segundo plano los lotes de POST /estudiantes/importar.
+
+    Cada lote corre como una tarea del event loop con su propia sesión: toda
+    la escritura de la importación (catálogos, estudiantes, mallas e
+    inscripciones) y los totales finales del lote se confirman en una sola
+    transacción, así que un fallo o un reinicio no dejan importaciones a
+    medias. Mientras tanto el lote informa filas_procesadas y total_errores,
+    y los errores por fila se guardan en errores_importacion_estudiantes.
+    """
+
+    def __init__(self) -> None:
+        self._tareas: dict[int, asyncio.Task] = {}
+
+    def iniciar(self, lote_id: int, ruta: Path, formato: str, nombre_malla: str | None, usuario_id: int) -> None:
+        """Lanza la importación del lote (ya creado en estado pendiente y confirmado).
+
+        `ruta` es el archivo subido, ya copiado a un temporal; se borra al terminar.
+        """
+        tarea = asyncio.get_running_loop().create_task(
+            self._procesar(lote_id, ruta, formato, nombre_malla, usuario_id)
+        )
+        self._tareas[lote_id] = tarea
+        tarea.add_done_callback(lambda _: self._tareas.pop(lote_id, None))
+
+    def en_curso(self, lote_id: int) -> bool:
+        return lote_id in self._tareas
+
+    async def esperar(self, lote_id: int) -> None:
+        """Espera a que termine la tarea del lote (si sigue en curso), sin propagar su resultado."""
+        tarea = self._tareas.get(lote_id)
+        if tarea is not None:
+            await asyncio.gather(tarea, return_exceptions=True)
+
+    async def cerrar(self) -> None:
+        """Detiene las importaciones en curso (al apagar la aplicación); sus lotes quedan en error."""
+        tareas = list(self._tareas.values())
+        for tarea in tareas:
+            tarea.cancel()
+        if tareas:
+            await asyncio.gather(*tareas, return_exceptions=True)
+
+    @staticmethod
+    async def recuperar_interrumpidos() -> int:
+        """Marca como error los lotes que quedaron pendientes/procesando tras un reinicio.
+
+        Su transacción nunca se confirmó, así que no dejaron cambios: basta
+        con volver a subir el archivo.
+        """
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(LoteImportacionEstudiante)
+                .where(LoteImportacionEstudiante.estado.in_([EstadoLote.PENDIENTE, EstadoLote.PROCESANDO]))
+                .values(
+                    estado=EstadoLote.ERROR,
+                    fecha_fin=datetime.now(timezone.utc),
+                    mensaje_error="Importación interrumpida por un reinicio del servidor; vuelva a subir el archivo.",
+                )
+            )
+            await db.commit()
+        return result.rowcount
+
+    async def _procesar(
+        self, lote_id: int, ruta: Path, formato: str, nombre_malla: str | None, usuario_id: int
+    ) -> None:
+        errores = RegistroErroresImportacion(lote_id)
+
+        async def avance(filas: int) -> None:
+            await errores.vaciar()
+            await self._actualizar_lote(lote_id, filas_procesadas=filas, total_errores=errores.total)
+
+        try:
+            await self._actualizar_lote(lote_id, estado=EstadoLote.PROCESANDO)
+            lector = await abrir_lector_async(ruta, formato=formato)
+            with lector:
+                async with AsyncSessionLocal() as db:
+                    totales = await importar_archivo_estudiantes(db, lector, nombre_malla, usuario_id, errores, avance)
+                    await errores.vaciar()
+                    await db.execute(
+                        update(LoteImportacionEstudiante)
+                        .where(LoteImportacionEstudiante.id == lote_id)
+                        .values(
+                            **totales,
+                            estado=EstadoLote.COMPLETADO,
+                            filas_procesadas=totales["total_filas"],
+                            total_errores=errores.total,
+                            fecha_fin=datetime.now(timezone.utc),
+                        )
+                    )
+                    await db.commit()
+            logger.info(
+                "Importación %d completada: %d filas, %d creados, %d actualizados, %d errores",
+                lote_id, totales["total_filas"], totales["estudiantes_creados"],
+                totales["estudiantes_actualizados"], errores.total,
+            )
+        except asyncio.CancelledError:
+            logger.warning("Importación %d interrumpida por el apagado del servidor", lote_id)
+            await self._marcar_error(
+                lote_id, "Importación interrumpida por el apagado del servidor; vuelva a subir el archivo."
+            )
+            raise
+        except (ImportacionInvalida, ArchivoInvalido) as exc:
+            await self._marcar_error(lote_id, str(exc))
+        except Exception as exc:
+            logger.exception("Fallo al importar el lote %d", lote_id)
+            await self._marcar_error(lote_id, f"Error al importar el archivo: {type(exc).__name__}: {exc}")
+        finally:
+            ruta.unlink(missing_ok=True)
+
+    @classmethod
+    async def _marcar_error(cls, lote_id: int, mensaje: str) -> None:
+        # Nada de la importación quedó confirmado: los errores de fila ya
+        # guardados tampoco aplican
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(ErrorImportacionEstudiante).where(ErrorImportacionEstudiante.lote_id == lote_id))
+            await db.commit()
+        await cls._actualizar_lote(
+            lote_id,
+            estado=EstadoLote.ERROR,
+            total_errores=0,
+            mensaje_error=mensaje,
+            fecha_fin=datetime.now(timezone.utc),
+        )
+
+    @staticmethod
+    async def _actualizar_lote(lote_id: int, **valores) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(LoteImportacionEstudiante).where(LoteImportacionEstudiante.id == lote_id).values(**valores)
+            )
+            await db.commit()
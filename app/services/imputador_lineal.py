@@ -0,0 +1,139 @@
+"""Transform de IterativeImputer en forma cerrada para estimadores lineales.
+
+Con BayesianRidge (el estimador del entrenamiento), IterativeImputer.transform
+es una secuencia fija de modelos lineales: relleno inicial con las
+estadísticas del SimpleImputer y, ronda por ronda, cada columna con faltantes
+se reemplaza por `vecinos @ coef + intercept` recortado a [min, max]. Aquí esa
+secuencia se reduce al cargar el modelo a arreglos apilados (columna,
+vecinos, coeficientes, intercepto) y se aplica solo sobre las filas que
+tienen algún faltante; las filas completas salen tal cual, igual que en sklearn.
+
+Los productos usan las mismas submatrices y el mismo orden que sklearn, así
+que el resultado es idéntico bit a bit al de IterativeImputer.transform.
+"""
+import logging
+
+import numpy as np
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401 — necesario para importar IterativeImputer
+from sklearn.impute import IterativeImputer
+from sklearn.linear_model import BayesianRidge, LinearRegression, Ridge
+
+logger = logging.getLogger(__name__)
+
+# Estimadores cuyo predict es exactamente X @ coef_ + intercept_
+_ESTIMADORES_LINEALES = (BayesianRidge, LinearRegression, Ridge)
+
+
+class ImputadorLineal:
+    """IterativeImputer ajustado reducido a sus coeficientes; expone el mismo transform."""
+
+    def __init__(
+        self,
+        estadisticas: np.ndarray,
+        columna: np.ndarray,
+        vecinos: np.ndarray,
+        coeficientes: np.ndarray,
+        intercepto: np.ndarray,
+        minimo: np.ndarray,
+        maximo: np.ndarray,
+    ) -> None:
+        # Relleno inicial por columna (SimpleImputer.statistics_)
+        self.estadisticas = estadisticas
+        # Paso i de la secuencia: columna[i] ← X[:, vecinos[i]] @ coeficientes[i] + intercepto[i]
+        self.columna = columna
+        self.vecinos = vecinos
+        self.coeficientes = coeficientes
+        self.intercepto = intercepto
+        # Límites de recorte por columna (min_value / max_value del imputer)
+        self.minimo = minimo
+        self.maximo = maximo
+
+    @property
+    def n_features(self) -> int:
+        return len(self.estadisticas)
+
+    @property
+    def n_pasos(self) -> int:
+        return len(self.columna)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in vars(self).values())
+
+    @classmethod
+    def destilar(cls, imputer) -> "ImputadorLineal | None":
+        """Reduce el imputer a coeficientes; None si usa algo que la forma cerrada no reproduce."""
+        motivo = cls._motivo_no_soportado(imputer)
+        if motivo:
+            logger.info("IterativeImputer no se destila (%s); se usa su transform de sklearn", motivo)
+            return None
+
+        secuencia = imputer.imputation_sequence_
+        n_features = len(imputer.initial_imputer_.statistics_)
+        k = len(secuencia[0].neighbor_feat_idx) if secuencia else 0
+        return cls(
+            estadisticas=np.asarray(imputer.initial_imputer_.statistics_, dtype=np.float64).copy(),
+            columna=np.array([t.feat_idx for t in secuencia], dtype=np.intp),
+            vecinos=np.array([t.neighbor_feat_idx for t in secuencia], dtype=np.intp).reshape(-1, k),
+            coeficientes=np.array(
+                [np.asarray(t.estimator.coef_, dtype=np.float64) for t in secuencia]
+            ).reshape(-1, k),
+            intercepto=np.array([float(t.estimator.intercept_) for t in secuencia], dtype=np.float64),
+            minimo=np.broadcast_to(np.asarray(imputer._min_value, dtype=np.float64), n_features).copy(),
+            maximo=np.broadcast_to(np.asarray(imputer._max_value, dtype=np.float64), n_features).copy(),
+        )
+
+    @staticmethod
+    def _motivo_no_soportado(imputer) -> str | None:
+        if not isinstance(imputer, IterativeImputer):
+            return f"{type(imputer).__name__} no es IterativeImputer"
+        if imputer.sample_posterior:
+            return "sample_posterior=True"
+        if imputer.add_indicator:
+            return "add_indicator=True"
+        if not (isinstance(imputer.missing_values, float) and np.isnan(imputer.missing_values)):
+            return "missing_values distinto de NaN"
+        if np.any(imputer._is_empty_feature):
+            return "columnas vacías en el entrenamiento"
+        secuencia = imputer.imputation_sequence_
+        if any(not isinstance(t.estimator, _ESTIMADORES_LINEALES) for t in secuencia):
+            return "estimador no lineal"
+        if any(np.ndim(t.estimator.coef_) != 1 for t in secuencia):
+            return "estimador con varias salidas"
+        if len({len(t.neighbor_feat_idx) for t in secuencia}) > 1:
+            return "cantidad de vecinos variable"
+        return None
+
+    def transform(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Se esperaban {self.n_features} columnas, se recibió la forma {X.shape}")
+        # Misma validación que sklearn (ensure_all_finite="allow-nan")
+        if np.isinf(X).any():
+            raise ValueError("Input X contains infinity or a value too large for dtype('float64').")
+
+        faltantes = np.isnan(X)
+        Xt = np.where(faltantes, self.estadisticas, X)
+        if self.n_pasos == 0 or faltantes.all():
+            return Xt
+
+        incompletas = np.flatnonzero(faltantes.any(axis=1))
+        if len(incompletas) == 0:
+            return Xt
+
+        # Solo las filas con algún faltante cambian; las demás ya están completas.
+        # En orden Fortran y seleccionando columnas antes que filas, como sklearn:
+        # así la submatriz de cada producto tiene la misma disposición en memoria
+        # y BLAS devuelve exactamente los mismos valores.
+        sub = np.asfortranarray(Xt[incompletas])
+        faltantes_sub = faltantes[incompletas]
+        filas_por_columna = [np.flatnonzero(faltantes_sub[:, j]) for j in range(self.n_features)]
+        for col, vecinos, coef, intercepto in zip(self.columna, self.vecinos, self.coeficientes, self.intercepto):
+            filas = filas_por_columna[col]
+            if len(filas) == 0:
+                continue
+            valores = sub[:, vecinos][filas] @ coef + intercepto
+            sub[filas, col] = np.clip(valores, self.minimo[col], self.maximo[col])
+
+        Xt[incompletas] = sub
+        return Xt
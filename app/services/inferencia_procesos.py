@@ -0,0 +1,130 @@
+"""Inferencia ML en procesos separados para escalar el clasificador entre núcleos.
+
+El predict de Random Forest retiene el GIL en buena parte de su trabajo, así
+que los hilos del EjecutorInferencia no aprovechan más de un núcleo. En modo
+"procesos" cada worker carga el clasificador una sola vez (del bundle mapeado en
+memoria, o de mejor_modelo.pkl con mmap_mode="r", igual que PrediccionService) y
+el proceso principal solo le envía la matriz final de features; el
+preprocesamiento sigue ocurriendo en el proceso principal.
+
+Los workers de "spawn" arrancan bajo demanda, así que no leen model_dir
+directamente: aceptar un modelo reemplaza modelo.bundle con os.replace y un
+worker tardío cargaría el clasificador nuevo junto a las features del servicio
+viejo. Cada pool fija un enlace duro (o una copia) del artefacto con el que se
+construyó y los workers comprueban su huella contra la del proceso principal.
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from app.services.bundle_modelo import (
+    NOMBRE_BUNDLE, BundleInvalido, BundleModelo, leer_bundle, leer_manifiesto,
+)
+from app.services.prediccion_service import probas_y_clases
+
+logger = logging.getLogger(__name__)
+
+# Modelo cargado en cada proceso worker (lo inicializa _inicializar_worker)
+_modelo_worker = None
+
+
+def _inicializar_worker(ruta: str, huella: str | None) -> None:
+    global _modelo_worker
+    ruta = Path(ruta)
+    if ruta.name == NOMBRE_BUNDLE:
+        # El proceso principal ya verificó los checksums al cargar el bundle
+        bundle = leer_bundle(ruta, componentes=("mejor_modelo",), verificar=False)
+        if huella is not None and bundle.huella != huella:
+            raise BundleInvalido(
+                f"El worker cargó la versión {bundle.huella} y el servicio espera {huella}"
+            )
+        _modelo_worker = bundle.artefactos["mejor_modelo"]
+    else:
+        _modelo_worker = joblib.load(ruta, mmap_mode="r")
+
+
+def _fijar_artefacto(model_dir: Path, destino: Path) -> Path:
+    """Enlace duro (o copia, si no se puede enlazar) del artefacto que cargan los workers.
+
+    El enlace conserva el inodo aunque después se reemplace el archivo de model_dir.
+    """
+    origen = model_dir / NOMBRE_BUNDLE
+    if not origen.exists():
+        origen = model_dir / "mejor_modelo.pkl"
+    ruta = destino / origen.name
+    try:
+        os.link(origen, ruta)
+    except OSError:
+        shutil.copy2(origen, ruta)
+    return ruta
+
+
+def _predecir_en_worker(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return probas_y_clases(_modelo_worker, X)
+
+
+class PoolInferenciaProcesos:
+    """Pool de procesos que ejecuta el clasificador sobre matrices de features ya preparadas."""
+
+    # Por debajo de este tamaño no compensa repartir un lote entre procesos
+    MIN_FILAS_POR_PROCESO = 256
+
+    def __init__(self, model_dir: str, procesos: int, modelo=None, huella: str | None = None) -> None:
+        """huella: la del servicio que usa el pool (PrediccionService.version_modelo)."""
+        self.procesos = max(1, procesos)
+        # Los árboles de sklearn y XGBoost convierten X a float32 internamente:
+        # enviar float32 es exacto y reduce a la mitad el tamaño del buffer.
+        self.dtype_envio = (
+            np.float32 if isinstance(modelo, (RandomForestClassifier, XGBClassifier)) else np.float64
+        )
+        # El directorio va dentro de model_dir para que el enlace duro sea posible
+        # (mismo sistema de archivos) y no haga falta copiar el bundle
+        self._dir_fijado = Path(tempfile.mkdtemp(prefix=".pool_", dir=model_dir))
+        try:
+            ruta = _fijar_artefacto(Path(model_dir), self._dir_fijado)
+            if ruta.name == NOMBRE_BUNDLE and huella is not None:
+                fijada = BundleModelo(ruta=ruta, manifiesto=leer_manifiesto(ruta), artefactos={}).huella
+                if fijada != huella:
+                    # El bundle se reemplazó entre la carga del servicio y la creación del pool
+                    raise BundleInvalido(
+                        f"{NOMBRE_BUNDLE} cambió durante la carga (versión {fijada}, se esperaba {huella})"
+                    )
+        except Exception:
+            shutil.rmtree(self._dir_fijado, ignore_errors=True)
+            raise
+        # "spawn" evita heredar por fork los hilos del servidor (uvicorn, pool de inferencia)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.procesos,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_inicializar_worker,
+            initargs=(str(ruta), huella),
+        )
+        logger.info("Pool de inferencia iniciado con %d procesos para '%s'", self.procesos, model_dir)
+
+    def predecir(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Probabilidades y clases para X; los lotes grandes se reparten entre los procesos."""
+        X = np.ascontiguousarray(X, dtype=self.dtype_envio)
+        n_partes = min(self.procesos, len(X) // self.MIN_FILAS_POR_PROCESO)
+        if n_partes <= 1:
+            return self._pool.submit(_predecir_en_worker, X).result()
+
+        partes = list(self._pool.map(_predecir_en_worker, np.array_split(X, n_partes)))
+        return (
+            np.concatenate([probas for probas, _ in partes]),
+            np.concatenate([clases for _, clases in partes]),
+        )
+
+    def cerrar(self) -> None:
+        # Los trabajos ya enviados terminan; los nuevos envíos fallan y el servicio predice localmente
+        self._pool.shutdown(wait=False)
+        # Se cierra al liberar el último arriendo: los workers vivos ya mapearon el artefacto
+        shutil.rmtree(self._dir_fijado, ignore_errors=True)
@@ -0,0 +1,336 @@
+"""Orquestación de la inferencia ML: slot del modelo activo, ejecutor dedicado y micro-batching."""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Iterator
+
+from app.core.config import settings
+from app.services.prediccion_service import CachePredicciones, PrediccionService
+
+logger = logging.getLogger(__name__)
+
+
+def crear_servicio_prediccion(model_dir: str) -> PrediccionService:
+    """Carga PrediccionService con su cache de resultados y, si ml_inferencia_modo='procesos',
+    le asocia un pool de procesos."""
+    cache = None
+    if settings.ml_cache_max_entradas > 0:
+        cache = CachePredicciones(settings.ml_cache_max_entradas, settings.ml_cache_ttl_s)
+    servicio = PrediccionService(model_dir, cache=cache)
+    if settings.ml_inferencia_modo == "procesos":
+        from app.services.inferencia_procesos import PoolInferenciaProcesos
+
+        servicio.pool_procesos = PoolInferenciaProcesos(
+            model_dir, settings.ml_inferencia_procesos,
+            modelo=servicio.modelo, huella=servicio.version_modelo,
+        )
+    return servicio
+
+
+class SlotModelo:
+    """Referencia al PrediccionService activo con recarga sin corte de servicio.
+
+    Las solicitudes toman el servicio con `arrendar()` y lo retienen hasta
+    terminar. Una recarga construye y valida el servicio nuevo fuera del event
+    loop mientras el anterior sigue atendiendo, y luego lo publica cambiando la
+    referencia. El servicio reemplazado se cierra cuando se libera su último
+    arriendo; las solicitudes que ya lo tenían terminan sobre el modelo viejo.
+    """
+
+    def __init__(self) -> None:
+        self._activo: PrediccionService | None = None
+        self._lock = threading.Lock()
+        # id(servicio) → arriendos en curso
+        self._arriendos: dict[int, int] = {}
+        # Servicios reemplazados que todavía tienen arriendos
+        self._retirados: dict[int, PrediccionService] = {}
+        self._recargas = 0
+        self._recargas_fallidas = 0
+        self._ultima_recarga: str | None = None
+        self._ultimo_error: str | None = None
+        self._lock_recarga: asyncio.Lock | None = None
+
+    @property
+    def activo(self) -> PrediccionService | None:
+        return self._activo
+
+    @contextmanager
+    def arrendar(self) -> Iterator[PrediccionService | None]:
+        """Entrega el servicio activo (None si no hay modelo) y lo retiene hasta salir del bloque."""
+        with self._lock:
+            servicio = self._activo
+            if servicio is not None:
+                self._arriendos[id(servicio)] = self._arriendos.get(id(servicio), 0) + 1
+        try:
+            yield servicio
+        finally:
+            if servicio is not None:
+                self._liberar(servicio)
+
+    def publicar(self, servicio: PrediccionService) -> None:
+        """Reemplaza el servicio activo; el anterior se cierra al liberarse su último arriendo."""
+        with self._lock:
+            anterior, self._activo = self._activo, servicio
+            if anterior is not None and anterior is not servicio and self._arriendos.get(id(anterior)):
+                self._retirados[id(anterior)] = anterior
+                anterior = None
+        if anterior is not None and anterior is not servicio:
+            anterior.cerrar()
+        logger.info("Modelo %s publicado", servicio.version_modelo)
+
+    def cargar(self, model_dir: str) -> PrediccionService:
+        """Construye el servicio, lo valida con una prueba de humo y lo publica.
+
+        Es bloqueante (lectura del bundle, compilación, arranque del pool); si
+        la validación falla el servicio activo no cambia y se relanza el error.
+        """
+        try:
+            nuevo = crear_servicio_prediccion(model_dir)
+            try:
+                nuevo.prueba_humo()
+            except Exception:
+                nuevo.cerrar()
+                raise
+        except Exception as exc:
+            self._recargas_fallidas += 1
+            self._ultimo_error = f"{type(exc).__name__}: {exc}"
+            raise
+        self.publicar(nuevo)
+        self._recargas += 1
+        self._ultima_recarga = datetime.now().isoformat()
+        self._ultimo_error = None
+        return nuevo
+
+    async def recargar(self, model_dir: str) -> PrediccionService:
+        """Carga y publica el modelo de model_dir en un hilo aparte; las recargas se serializan."""
+        if self._lock_recarga is None:
+            self._lock_recarga = asyncio.Lock()
+        async with self._lock_recarga:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.cargar, model_dir)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            activo = self._activo
+            return {
+                "version_modelo": activo.version_modelo if activo is not None else None,
+                "arriendos_activos": self._arriendos.get(id(activo), 0) if activo is not None else 0,
+                "retirados_pendientes": len(self._retirados),
+                "recargas": self._recargas,
+                "recargas_fallidas": self._recargas_fallidas,
+                "ultima_recarga": self._ultima_recarga,
+                "ultimo_error": self._ultimo_error,
+            }
+
+    def cerrar(self) -> None:
+        """Cierra el servicio activo y los retirados (al apagar la aplicación)."""
+        with self._lock:
+            servicios = list(self._retirados.values())
+            if self._activo is not None:
+                servicios.append(self._activo)
+            self._activo = None
+            self._retirados.clear()
+            self._arriendos.clear()
+        for servicio in servicios:
+            servicio.cerrar()
+
+    def _liberar(self, servicio: PrediccionService) -> None:
+        with self._lock:
+            restantes = self._arriendos.get(id(servicio), 0) - 1
+            if restantes > 0:
+                self._arriendos[id(servicio)] = restantes
+                return
+            self._arriendos.pop(id(servicio), None)
+            retirado = self._retirados.pop(id(servicio), None)
+        if retirado is not None:
+            logger.info("Último arriendo del modelo %s liberado; se cierra", retirado.version_modelo)
+            retirado.cerrar()
+
+
+class ColaInferenciaLlena(Exception):
+    """Se alcanzó el máximo de trabajos de inferencia en curso + en espera."""
+
+    def __init__(self, reintentar_en_s: int) -> None:
+        super().__init__("Cola de inferencia llena")
+        self.reintentar_en_s = reintentar_en_s
+
+
+class EjecutorInferencia:
+    """Ejecuta el código CPU-bound de sklearn/pandas fuera del event loop.
+
+    Usa un pool de hilos propio (separado del executor por defecto de asyncio)
+    con `workers` hilos y admite como máximo `max_cola` trabajos esperando;
+    por encima de ese límite rechaza con ColaInferenciaLlena para que la API
+    responda 503 en lugar de acumular latencia.
+    """
+
+    def __init__(self, workers: int = 2, max_cola: int = 8, reintentar_en_s: int = 2) -> None:
+        self.workers = max(1, workers)
+        self.max_cola = max(0, max_cola)
+        self.reintentar_en_s = reintentar_en_s
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inferencia")
+        # Solo se modifican desde el event loop, no requieren lock
+        self._en_curso = 0
+        self._completados = 0
+        self._rechazados = 0
+
+    def verificar_capacidad(self) -> None:
+        """Lanza ColaInferenciaLlena si no hay lugar para un trabajo más."""
+        if self._en_curso >= self.workers + self.max_cola:
+            self._rechazados += 1
+            raise ColaInferenciaLlena(self.reintentar_en_s)
+
+    async def ejecutar(self, fn: Callable[..., Any], *args, limitar: bool = True) -> Any:
+        """Ejecuta fn(*args) en el pool de inferencia.
+
+        Con limitar=False el trabajo se admite aunque la cola esté llena; lo usan
+        los procesos que ya pasaron verificar_capacidad y envían sus pasos en serie.
+        """
+        if limitar:
+            self.verificar_capacidad()
+        self._en_curso += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, fn, *args)
+        finally:
+            self._en_curso -= 1
+            self._completados += 1
+
+    def metricas(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_cola": self.max_cola,
+            "en_curso": self._en_curso,
+            "completados": self._completados,
+            "rechazados": self._rechazados,
+        }
+
+    def cerrar(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class AgrupadorPredicciones:
+    """Agrupa predicciones individuales concurrentes en un solo predecir_lote.
+
+    Cada solicitud espera como máximo `espera_ms` milisegundos (o hasta que se
+    junten `max_tamano` solicitudes) y luego todo el grupo se puntúa con una
+    única llamada, pagando una sola vez el costo fijo de predict_proba.
+    """
+
+    def __init__(
+        self,
+        ejecutor: EjecutorInferencia,
+        max_tamano: int = 32,
+        espera_ms: float = 5.0,
+    ) -> None:
+        self.ejecutor = ejecutor
+        self.max_tamano = max(1, max_tamano)
+        self.espera_s = max(0.0, espera_ms) / 1000
+        # (servicio, features, futuro, instante de encolado)
+        self._pendientes: list[tuple[PrediccionService, dict, asyncio.Future, float]] = []
+        self._temporizador: asyncio.TimerHandle | None = None
+        self._tareas: set[asyncio.Task] = set()
+
+        # Métricas acumuladas
+        self._lotes = 0
+        self._solicitudes = 0
+        self._tamano_max = 0
+        self._espera_total_s = 0.0
+        self._espera_max_s = 0.0
+        self._errores = 0
+
+    async def predecir(self, ml: PrediccionService, features: dict) -> tuple[float, str, str]:
+        """Encola una predicción y espera su resultado."""
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._pendientes.append((ml, features, futuro, time.perf_counter()))
+
+        if len(self._pendientes) >= self.max_tamano:
+            self._despachar()
+        elif self._temporizador is None:
+            self._temporizador = loop.call_later(self.espera_s, self._despachar)
+
+        return await futuro
+
+    def metricas(self) -> dict:
+        """Resumen de tamaño de lote y tiempo de espera en cola."""
+        return {
+            "max_tamano": self.max_tamano,
+            "espera_ms": round(self.espera_s * 1000, 3),
+            "lotes_ejecutados": self._lotes,
+            "solicitudes": self._solicitudes,
+            "tamano_promedio": round(self._solicitudes / self._lotes, 2) if self._lotes else 0,
+            "tamano_max": self._tamano_max,
+            "espera_promedio_ms": (
+                round(self._espera_total_s / self._solicitudes * 1000, 3) if self._solicitudes else 0
+            ),
+            "espera_max_ms": round(self._espera_max_s * 1000, 3),
+            "en_cola": len(self._pendientes),
+            "errores": self._errores,
+        }
+
+    def _despachar(self) -> None:
+        """Saca las solicitudes pendientes de la cola y lanza su ejecución."""
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        if not self._pendientes:
+            return
+
+        lote, self._pendientes = self._pendientes, []
+        ahora = time.perf_counter()
+        for *_, encolado in lote:
+            espera = ahora - encolado
+            self._espera_total_s += espera
+            self._espera_max_s = max(self._espera_max_s, espera)
+        self._lotes += 1
+        self._solicitudes += len(lote)
+        self._tamano_max = max(self._tamano_max, len(lote))
+
+        tarea = asyncio.get_running_loop().create_task(self._ejecutar(lote))
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+
+    async def _ejecutar(self, lote: list) -> None:
+        """Puntúa un grupo; si el modelo se recargó entre medio, agrupa por servicio."""
+        por_servicio: dict[int, list] = {}
+        for item in lote:
+            por_servicio.setdefault(id(item[0]), []).append(item)
+
+        for items in por_servicio.values():
+            ml = items[0][0]
+            filas = [features for _, features, _, _ in items]
+            try:
+                resultados = await self._predecir_lote(ml, filas)
+            except Exception as exc:
+                if len(items) == 1 or isinstance(exc, ColaInferenciaLlena):
+                    self._errores += len(items)
+                    for _, _, futuro, _ in items:
+                        if not futuro.done():
+                            futuro.set_exception(exc)
+                    continue
+                # Una fila inválida no debe hacer fallar al resto del grupo
+                logger.warning("Fallo en micro-lote de %d predicciones; se reintenta una por una", len(items))
+                for _, features, futuro, _ in items:
+                    try:
+                        resultado = (await self._predecir_lote(ml, [features]))[0]
+                    except Exception as exc:
+                        self._errores += 1
+                        if not futuro.done():
+                            futuro.set_exception(exc)
+                    else:
+                        if not futuro.done():
+                            futuro.set_result(resultado)
+                continue
+
+            for (_, _, futuro, _), resultado in zip(items, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+    async def _predecir_lote(self, ml: PrediccionService, filas: list[dict]) -> list[tuple[float, str, str]]:
+        return await self.ejecutor.ejecutar(ml.predecir_lote, filas)
+
@@ -0,0 +1,487 @@
+"""Ingesta de archivos tabulares subidos (.xlsx, .csv, .parquet) con memoria acotada.
+
+El upload se copia por partes a un archivo temporal y se recorre en bloques
+de tamaño fijo como DataFrames tipados, con el índice que tendría la fila en
+un read_excel/read_csv completo: número de fila del archivo = índice + 2. El
+pico de memoria depende del tamaño de bloque y no del tamaño del archivo.
+
+- Excel: openpyxl en modo read_only, fila por fila, con el mismo parser que
+  usa pd.read_excel (mismos nombres de columna, NaN y tipos por celda).
+- CSV: pd.read_csv por bloques como texto, con separador y codificación
+  detectados; los tipos se asignan por celda (ver _tipar_columna).
+- Parquet: pyarrow (opcional) por row groups, leyendo solo las columnas
+  pedidas.
+
+El formato se detecta por los bytes iniciales y, si no alcanzan, por la
+extensión del nombre.
+"""
+import asyncio
+import csv
+import hashlib
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Iterator
+
+import pandas as pd
+from fastapi import UploadFile
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet es opcional
+    pq = None
+
+TAMANO_BLOQUE = 1000
+_TAMANO_LECTURA = 1024 * 1024
+
+FORMATOS = ("xlsx", "csv", "parquet")
+_EXTENSIONES = {".xlsx": "xlsx", ".csv": "csv", ".txt": "csv", ".parquet": "parquet", ".pq": "parquet"}
+_FIRMAS = ((b"PK\x03\x04", "xlsx"), (b"PAR1", "parquet"))
+
+
+class ArchivoInvalido(Exception):
+    """El archivo no tiene un formato soportado o no se puede leer."""
+
+
+async def guardar_en_temporal(archivo: UploadFile, huella: "hashlib._Hash | None" = None) -> Path:
+    """Copia el upload a un archivo temporal en partes de 1 MB y devuelve su ruta.
+
+    Si se pasa `huella` (p. ej. hashlib.sha256()), se actualiza con cada parte,
+    así el contenido se hashea en la misma pasada en que se copia.
+    """
+    fd, ruta = tempfile.mkstemp(prefix="upload-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while parte := await archivo.read(_TAMANO_LECTURA):
+                f.write(parte)
+                if huella is not None:
+                    huella.update(parte)
+    except BaseException:
+        Path(ruta).unlink(missing_ok=True)
+        raise
+    return Path(ruta)
+
+
+async def volcar_a_temporal(partes: AsyncIterator[bytes]) -> Path:
+    """Escribe `partes` en orden a un archivo temporal (p. ej. un upload guardado en la base).
+
+    Solo retiene una parte a la vez; las escrituras corren fuera del event loop.
+    """
+    loop = asyncio.get_running_loop()
+    fd, ruta = tempfile.mkstemp(prefix="upload-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for parte in partes:
+                await loop.run_in_executor(None, f.write, parte)
+    except BaseException:
+        Path(ruta).unlink(missing_ok=True)
+        raise
+    return Path(ruta)
+
+
+@asynccontextmanager
+async def archivo_temporal(archivo: UploadFile, huella: "hashlib._Hash | None" = None) -> AsyncIterator[Path]:
+    """Contexto con el upload copiado a disco; el temporal se borra al salir."""
+    ruta = await guardar_en_temporal(archivo, huella)
+    try:
+        yield ruta
+    finally:
+        ruta.unlink(missing_ok=True)
+
+
+def huella_carga(sha256_archivo: str, *contexto) -> str:
+    """Huella de una carga: SHA-256 del contenido más lo que cambia su resultado.
+
+    Dos cargas con la misma huella producen lo mismo (mismo archivo, mismo
+    modelo, misma gestión, ...), así que la segunda puede devolver la primera.
+    """
+    partes = [sha256_archivo, *("" if valor is None else str(valor) for valor in contexto)]
+    return hashlib.sha256("|".join(partes).encode()).hexdigest()
+
+
+async def buscar_carga_previa(db: AsyncSession, modelo, huella: str, *filtros):
+    """Última fila de `modelo` (un lote con columna huella) con esa huella, o None.
+
+    Antes toma un pg_advisory_xact_lock sobre la huella: dos subidas
+    simultáneas del mismo archivo se serializan hasta el commit de la
+    primera, así la segunda ya encuentra el lote creado.
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(huella))))
+    result = await db.execute(
+        select(modelo).where(modelo.huella == huella, *filtros).order_by(modelo.id.desc()).limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+def detectar_formato(ruta: str | Path, nombre: str | None = None) -> str:
+    """Formato del archivo: primero por firma (bytes iniciales), luego por extensión."""
+    with open(ruta, "rb") as f:
+        cabecera = f.read(4096)
+    for firma, formato in _FIRMAS:
+        if cabecera.startswith(firma):
+            return formato
+    extension = Path(nombre or "").suffix.lower()
+    if extension in _EXTENSIONES:
+        # Sin firma reconocible: un .xlsx/.parquet dañado falla luego al abrirlo
+        return _EXTENSIONES[extension]
+    if not extension and cabecera and b"\x00" not in cabecera:
+        return "csv"
+    raise ArchivoInvalido(
+        f"Formato no soportado ({extension or 'sin extensión'}). Use .xlsx, .csv o .parquet."
+    )
+
+
+def _convertir_celda(valor):
+    """Misma conversión que el lector openpyxl de pandas: vacío → "" y floats enteros → int."""
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def _tipar_columna(serie: pd.Series) -> pd.Series:
+    """Tipos por celda para una columna de un bloque (CSV o Excel).
+
+    read_csv y TextParser infieren el dtype de cada bloque por separado: un
+    Codigo vacío vuelve float ese bloque y "1003" pasa a "1003.0" solo en él.
+    Aquí cada celda se tipa por su cuenta: el texto numérico se convierte
+    (enteros → int, el resto → float, como _convertir_celda en Excel) y el
+    resto de los valores se conserva. Los números con cero a la izquierda
+    ("01003") quedan como texto para no perder el cero. Luego la columna toma
+    el dtype que le daría pandas salvo cuando eso convertiría enteros en
+    float; así el mismo valor da el mismo resultado en cualquier bloque.
+    """
+    columna = serie.astype(object)
+    es_texto = columna.map(lambda v: isinstance(v, str)).astype(bool)
+    convertibles = es_texto
+    if es_texto.any():
+        numeros = pd.to_numeric(columna.where(es_texto), errors="coerce")
+        cero_inicial = columna.where(es_texto, "").str.match(r"\s*[+-]?0\d")
+        convertibles = es_texto & numeros.notna() & ~cero_inicial
+    if convertibles.any():
+        enteros = convertibles & (numeros % 1 == 0)
+        valores = columna.to_numpy(dtype=object, copy=True)
+        valores[convertibles] = numeros[convertibles].to_numpy(dtype=object)
+        valores[enteros] = numeros[enteros].astype("int64").to_numpy(dtype=object)
+        columna = pd.Series(valores, index=serie.index, name=serie.name, dtype=object)
+    inferida = columna.infer_objects()
+    if inferida.dtype.kind == "f" and columna.map(_es_entero).any():
+        return columna
+    return inferida
+
+
+def _es_entero(valor) -> bool:
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+class LectorTabular:
+    """Interfaz común de los lectores por bloques.
+
+    `columnas` es el encabezado completo del archivo (para validar columnas
+    obligatorias). Si se pasa `usar_columnas`, los bloques traen solo esas
+    columnas (las que existan). `bloques()` puede llamarse más de una vez:
+    cada llamada vuelve a leer el archivo desde el disco, lo que permite una
+    pasada previa (p. ej. para juntar catálogos) sin retener las filas.
+    """
+
+    formato: str
+    columnas: list
+    filas_estimadas: int | None
+    filas_leidas: int = 0
+
+    def faltantes(self, requeridas) -> list[str]:
+        """Columnas requeridas que no están en el encabezado, ordenadas."""
+        return sorted(set(requeridas) - set(self.columnas))
+
+    def bloques(self, tamano: int = TAMANO_BLOQUE) -> Iterator[pd.DataFrame]:
+        raise NotImplementedError
+
+    def leer_todo(self) -> pd.DataFrame:
+        """DataFrame completo (para consumidores que necesitan todas las filas a la vez)."""
+        partes = list(self.bloques())
+        if not partes:
+            return pd.DataFrame(columns=self.columnas)
+        return pd.concat(partes) if len(partes) > 1 else partes[0]
+
+    def cerrar(self) -> None:
+        pass
+
+    def __enter__(self) -> "LectorTabular":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.cerrar()
+
+
+class LectorExcel(LectorTabular):
+    """Recorre la primera hoja de un .xlsx en modo read_only.
+
+    La primera fila es el encabezado. Las filas vacías intermedias se
+    conservan (como en read_excel) y las vacías al final se descartan.
+    """
+
+    formato = "xlsx"
+
+    def __init__(self, ruta: str | Path, recortar_encabezados: bool = False) -> None:
+        # Se abre como archivo para que openpyxl no exija la extensión .xlsx en el temporal
+        self._archivo = open(ruta, "rb")
+        try:
+            self._libro = load_workbook(self._archivo, read_only=True, data_only=True)
+            self._hoja = hoja = self._libro.worksheets[0]
+            primera = next(hoja.iter_rows(max_row=1, values_only=True), ())
+            encabezado = [_convertir_celda(v) for v in primera]
+        except Exception as exc:
+            self._archivo.close()
+            raise ArchivoInvalido(f"Error al leer el archivo: {exc}") from exc
+
+        while encabezado and encabezado[-1] == "":
+            encabezado.pop()
+        if recortar_encabezados:
+            encabezado = [v.strip() if isinstance(v, str) else v for v in encabezado]
+        self._encabezado = encabezado
+        # Nombres finales (duplicados y vacíos resueltos como en read_excel)
+        self.columnas = list(self._parsear([]).columns) if encabezado else []
+        max_row = hoja.max_row
+        self.filas_estimadas = max(0, max_row - 1) if max_row else None
+        self.filas_leidas = 0
+
+    def bloques(self, tamano: int = TAMANO_BLOQUE) -> Iterator[pd.DataFrame]:
+        """Genera DataFrames de hasta `tamano` filas con el índice de read_excel."""
+        ancho = len(self._encabezado)
+        if not ancho:
+            return
+        bloque: list[list] = []
+        vacias: list[list] = []
+        inicio = 0
+        try:
+            for valores in self._hoja.iter_rows(min_row=2, values_only=True):
+                fila = [_convertir_celda(v) for v in valores[:ancho]]
+                fila.extend([""] * (ancho - len(fila)))
+                if all(v == "" for v in fila):
+                    # Solo se emiten si después aparece una fila con datos
+                    vacias.append(fila)
+                    continue
+                for pendiente in (*vacias, fila):
+                    bloque.append(pendiente)
+                    if len(bloque) >= tamano:
+                        yield self._bloque(bloque, inicio)
+                        inicio += len(bloque)
+                        bloque = []
+                vacias = []
+        except ArchivoInvalido:
+            raise
+        except Exception as exc:
+            raise ArchivoInvalido(f"Error al leer el archivo: {exc}") from exc
+        if bloque:
+            yield self._bloque(bloque, inicio)
+
+    def leer_todo(self) -> pd.DataFrame:
+        if not self._encabezado:
+            return pd.DataFrame()
+        partes = list(self.bloques())
+        if not partes:
+            return self._parsear([])
+        return pd.concat(partes) if len(partes) > 1 else partes[0]
+
+    def cerrar(self) -> None:
+        self._libro.close()
+        self._archivo.close()
+
+    def _bloque(self, filas: list[list], inicio: int) -> pd.DataFrame:
+        df = self._parsear(filas)
+        df.index = pd.RangeIndex(inicio, inicio + len(df))
+        self.filas_leidas = inicio + len(df)
+        return df
+
+    def _parsear(self, filas: list[list]) -> pd.DataFrame:
+        # dtype=object: TextParser no infiere tipos por bloque; cada celda ya viene
+        # tipada por openpyxl/_convertir_celda y _tipar_columna fija el dtype
+        df = TextParser([self._encabezado, *filas], header=0, dtype=object).read()
+        return df.apply(_tipar_columna) if len(df) else df
+
+
+class LectorCSV(LectorTabular):
+    """Lee un CSV por bloques con pd.read_csv.
+
+    El separador (coma, punto y coma, tabulador o barra) se detecta sobre una
+    muestra; la codificación es UTF-8 (con o sin BOM) y si no decodifica se
+    usa Latin-1, que es lo que exporta Excel en Windows.
+    """
+
+    formato = "csv"
+
+    def __init__(
+        self,
+        ruta: str | Path,
+        recortar_encabezados: bool = False,
+        usar_columnas: Iterable[str] | None = None,
+    ) -> None:
+        self._ruta = ruta
+        with open(ruta, "rb") as f:
+            muestra = f.read(64 * 1024)
+        try:
+            texto = muestra.decode("utf-8-sig")
+            self._codificacion = "utf-8-sig"
+        except UnicodeDecodeError as exc:
+            # Un corte a mitad de un carácter multibyte al final de la muestra no cuenta
+            if exc.start >= len(muestra) - 3:
+                texto = muestra[: exc.start].decode("utf-8-sig")
+                self._codificacion = "utf-8-sig"
+            else:
+                texto = muestra.decode("latin-1")
+                self._codificacion = "latin-1"
+        try:
+            self._separador = csv.Sniffer().sniff(texto.split("\n", 1)[0], delimiters=",;\t|").delimiter
+        except csv.Error:
+            self._separador = ","
+        try:
+            crudas = list(pd.read_csv(ruta, nrows=0, **self._opciones()).columns)
+        except pd.errors.EmptyDataError:
+            crudas = []
+        except Exception as exc:
+            raise ArchivoInvalido(f"Error al leer el archivo: {exc}") from exc
+
+        if recortar_encabezados:
+            self._renombrar = {c: c.strip() for c in crudas if isinstance(c, str) and c != c.strip()}
+        else:
+            self._renombrar = {}
+        self.columnas = [self._renombrar.get(c, c) for c in crudas]
+        pedidas = set(usar_columnas) if usar_columnas is not None else None
+        self._crudas = None if pedidas is None else [c for c in crudas if self._renombrar.get(c, c) in pedidas]
+        self.filas_estimadas = self._contar_lineas(ruta) - 1 if crudas else 0
+        self.filas_leidas = 0
+
+    def bloques(self, tamano: int = TAMANO_BLOQUE) -> Iterator[pd.DataFrame]:
+        if not self.columnas:
+            return
+        try:
+            with pd.read_csv(
+                self._ruta, chunksize=tamano, usecols=self._crudas, **self._opciones()
+            ) as lector:
+                for bloque in lector:
+                    bloque = bloque.apply(_tipar_columna)
+                    if self._renombrar:
+                        bloque = bloque.rename(columns=self._renombrar)
+                    self.filas_leidas = bloque.index[-1] + 1
+                    yield bloque
+        except Exception as exc:
+            raise ArchivoInvalido(f"Error al leer el archivo: {exc}") from exc
+
+    def _opciones(self) -> dict:
+        # dtype=str: sin inferencia por bloque; las celdas vacías siguen siendo NaN
+        return {"sep": self._separador, "encoding": self._codificacion, "dtype": str}
+
+    @staticmethod
+    def _contar_lineas(ruta: str | Path) -> int:
+        lineas = 0
+        ultimo = b"\n"
+        with open(ruta, "rb") as f:
+            while parte := f.read(_TAMANO_LECTURA):
+                lineas += parte.count(b"\n")
+                ultimo = parte[-1:]
+        return lineas + (ultimo != b"\n")
+
+
+class LectorParquet(LectorTabular):
+    """Lee un Parquet por lotes con pyarrow, decodificando solo las columnas pedidas."""
+
+    formato = "parquet"
+
+    def __init__(
+        self,
+        ruta: str | Path,
+        recortar_encabezados: bool = False,
+        usar_columnas: Iterable[str] | None = None,
+    ) -> None:
+        if pq is None:
+            raise ArchivoInvalido("El servidor no tiene pyarrow instalado; suba el archivo como .xlsx o .csv.")
+        try:
+            self._archivo = pq.ParquetFile(ruta)
+        except Exception as exc:
+            raise ArchivoInvalido(f"Error al leer el archivo: {exc}") from exc
+        crudas = list(self._archivo.schema_arrow.names)
+        if recortar_encabezados:
+            self._renombrar = {c: c.strip() for c in crudas if c != c.strip()}
+        else:
+            self._renombrar = {}
+        self.columnas = [self._renombrar.get(c, c) for c in crudas]
+        pedidas = set(usar_columnas) if usar_columnas is not None else None
+        self._crudas = None if pedidas is None else [c for c in crudas if self._renombrar.get(c, c) in pedidas]
+        self.filas_estimadas = self._archivo.metadata.num_rows
+        self.filas_leidas = 0
+
+    def bloques(self, tamano: int = TAMANO_BLOQUE) -> Iterator[pd.DataFrame]:
+        inicio = 0
+        try:
+            for lote in self._archivo.iter_batches(batch_size=tamano, columns=self._crudas):
+                bloque = lote.to_pandas()
+                if self._renombrar:
+                    bloque = bloque.rename(columns=self._renombrar)
+                bloque.index = pd.RangeIndex(inicio, inicio + len(bloque))
+                inicio += len(bloque)
+                self.filas_leidas = inicio
+                yield bloque
+        except Exception as exc:
+            raise ArchivoInvalido(f"Error al leer el archivo: {exc}") from exc
+
+    def cerrar(self) -> None:
+        self._archivo.close()
+
+
+def abrir_lector(
+    ruta: str | Path,
+    formato: str | None = None,
+    nombre: str | None = None,
+    recortar_encabezados: bool = False,
+    usar_columnas: Iterable[str] | None = None,
+) -> LectorTabular:
+    """Abre el lector que corresponde al formato (detectado si no se indica).
+
+    `usar_columnas` poda las columnas leídas en CSV y Parquet; en Excel se
+    ignora porque openpyxl decodifica la fila completa de todos modos.
+    """
+    formato = formato or detectar_formato(ruta, nombre)
+    if formato == "xlsx":
+        return LectorExcel(ruta, recortar_encabezados)
+    if formato == "csv":
+        return LectorCSV(ruta, recortar_encabezados, usar_columnas)
+    if formato == "parquet":
+        return LectorParquet(ruta, recortar_encabezados, usar_columnas)
+    raise ArchivoInvalido(f"Formato no soportado: {formato}")
+
+
+async def abrir_lector_async(ruta: str | Path, **opciones) -> LectorTabular:
+    """abrir_lector fuera del event loop (abrir un .xlsx ya parsea el libro)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(abrir_lector, ruta, **opciones))
+
+
+def leer_dataframe(ruta: str | Path, formato: str | None = None, **opciones) -> pd.DataFrame:
+    """DataFrame completo del archivo sin tener a la vez el upload, el libro y el DataFrame en memoria."""
+    with abrir_lector(ruta, formato, **opciones) as lector:
+        return lector.leer_todo()
+
+
+async def bloques_async(lector: LectorTabular, tamano: int = TAMANO_BLOQUE) -> AsyncIterator[pd.DataFrame]:
+    """Versión asíncrona de bloques(): el parseo de cada bloque corre fuera del event loop."""
+    loop = asyncio.get_running_loop()
+    iterador = lector.bloques(tamano)
+    while True:
+        bloque = await loop.run_in_executor(None, next, iterador, None)
+        if bloque is None:
+            return
+        yield bloque
+
+
+async def filas_async(lector: LectorTabular, tamano: int = TAMANO_BLOQUE) -> AsyncIterator[tuple[int, pd.Series]]:
+    """Como DataFrame.iterrows() sobre todo el archivo, leyendo de a un bloque."""
+    async for bloque in bloques_async(lector, tamano):
+        for fila in bloque.iterrows():
+            yield fila
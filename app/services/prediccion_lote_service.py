@@ -0,0 +1,837 @@
+"""Predicción masiva por lotes: features desde el archivo, persistencia y procesamiento en segundo plano."""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Coroutine
+
+import pandas as pd
+from sqlalchemy import Float, Select, and_, case, delete, exists, extract, func, insert, or_, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.database import AsyncSessionLocal
+from app.models.area import Area
+from app.models.inscripcion import Inscripcion
+from app.models.lote_prediccion import ArchivoLotePrediccion, EstadoLote, LotePrediccion
+from app.models.paralelo import Paralelo
+from app.models.prediccion import Prediccion
+from app.models.semester import Semestre
+from app.models.student import Estudiante
+from app.services import alerta_service
+from app.services.inferencia_service import EjecutorInferencia, SlotModelo
+from app.services.ingesta_archivos import abrir_lector_async, bloques_async, volcar_a_temporal
+from app.services.prediccion_service import PrediccionService
+
+logger = logging.getLogger(__name__)
+
+# Normalización de valores del Excel antes de guardar en BD.
+# Los CHECK constraints de estudiantes requieren valores sin acento,
+# alineados con las clases del label_encoders.pkl del modelo ML.
+NORMALIZAR_EXCEL: dict[str, dict[str, str]] = {
+    "tipo_colegio": {
+        "Público": "Publico",
+    },
+    "modalidad_ingreso": {
+        "Prueba de Suficiencia Académica": "Prueba de Suficiencia Academica",
+        "Admisión Especial": "Admision Especial",
+    },
+}
+
+
+# Columnas del archivo que usa la predicción masiva (en CSV/Parquet se leen solo estas)
+COLUMNAS_MASIVA = frozenset({
+    "Codigo", "Mat", "Rep", "2T", "Prom", "edad",
+    "Grado", "Genero", "estrato_socioeconomico", "ocupacion_laboral",
+    "con_quien_vive", "apoyo_economico", "modalidad_ingreso", "tipo_colegio",
+})
+
+
+# Columna del archivo → atributo de Estudiante. El archivo tiene prioridad
+# sobre la BD y, si trae valor, además actualiza al estudiante.
+CAMPOS_SOCIODEMOGRAFICOS: dict[str, str] = {
+    "Grado": "grado",
+    "Genero": "genero",
+    "estrato_socioeconomico": "estrato_socioeconomico",
+    "ocupacion_laboral": "ocupacion_laboral",
+    "con_quien_vive": "con_quien_vive",
+    "apoyo_economico": "apoyo_economico",
+    "modalidad_ingreso": "modalidad_ingreso",
+    "tipo_colegio": "tipo_colegio",
+}
+_NUMERICAS_ARCHIVO = ("Mat", "Rep", "2T", "Prom")
+
+
+def codigos_del_bloque(bloque: pd.DataFrame) -> pd.Series:
+    """Código de estudiante de cada fila como texto recortado."""
+    return bloque["Codigo"].map(str).str.strip()
+
+
+def _texto_archivo(bloque: pd.DataFrame, columna: str) -> pd.Series:
+    """Columna de texto del archivo recortada y normalizada; NaN si falta o está vacía."""
+    if columna not in bloque:
+        return pd.Series(None, index=bloque.index, dtype=object)
+    texto = bloque[columna].dropna().map(str).str.strip()
+    texto = texto[texto != ""]
+    if columna in NORMALIZAR_EXCEL:
+        texto = texto.replace(NORMALIZAR_EXCEL[columna])
+    return texto.reindex(bloque.index).astype(object)
+
+
+async def cargar_atributos_estudiantes(db: AsyncSession, codigos) -> pd.DataFrame:
+    """Atributos de BD de los estudiantes con esos códigos, uno por fila, indexados por código.
+
+    Las columnas sociodemográficas llevan el nombre de la columna del archivo
+    para poder combinarlas directamente con el bloque.
+    """
+    result = await db.execute(
+        select(
+            Estudiante.codigo_estudiante.label("codigo"),
+            Estudiante.id.label("estudiante_id"),
+            Estudiante.fecha_nacimiento,
+            Semestre.nombre.label("semestre_nombre"),
+            Area.nombre.label("Carrera"),
+            *(getattr(Estudiante, attr).label(col) for col, attr in CAMPOS_SOCIODEMOGRAFICOS.items()),
+        )
+        .outerjoin(Paralelo, Estudiante.paralelo_id == Paralelo.id)
+        .outerjoin(Semestre, Paralelo.semestre_id == Semestre.id)
+        .outerjoin(Area, Paralelo.area_id == Area.id)
+        .where(Estudiante.codigo_estudiante.in_(list(codigos)))
+    )
+    return pd.DataFrame(result.all(), columns=list(result.keys())).set_index("codigo")
+
+
+def armar_features_bloque(bloque: pd.DataFrame, estudiantes: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Une el bloque con los atributos de BD por Codigo y arma las features por columnas.
+
+    Devuelve (datos, features), ambos con el índice del bloque:
+    - datos: codigo, estudiante_id (NaN si el código no existe en BD) y las
+      columnas del archivo ya recortadas/normalizadas más la fecha de
+      nacimiento derivada de la edad (solo para estudiantes sin fecha), que
+      es lo que hay que guardar en BD.
+    - features: matriz lista para predecir_lote, con la precedencia archivo
+      sobre BD resuelta con combine_first.
+    """
+    hoy = date.today()
+    datos = pd.DataFrame({"codigo": codigos_del_bloque(bloque)}).join(estudiantes, on="codigo")
+
+    features = pd.DataFrame(index=bloque.index)
+    for col in _NUMERICAS_ARCHIVO:
+        features[col] = bloque[col] if col in bloque else None
+
+    # fecha_nacimiento = 1 de enero del año de nacimiento, si el estudiante no la tenía
+    fecha_bd = pd.to_datetime(datos["fecha_nacimiento"])
+    if "edad" in bloque:
+        edad_archivo = pd.to_numeric(bloque["edad"], errors="coerce")
+    else:
+        edad_archivo = pd.Series(float("nan"), index=bloque.index)
+    validas = fecha_bd.isna() & datos["estudiante_id"].notna() & edad_archivo.between(0, hoy.year - 1)
+    anios = hoy.year - edad_archivo[validas].astype(int)
+    datos["nueva_fecha_nacimiento"] = anios.map(lambda anio: date(anio, 1, 1)).reindex(bloque.index)
+
+    # Con códigos repetidos, cada fila ve lo que dejaron en el estudiante las
+    # filas anteriores (igual que al actualizar el ORM fila por fila): la
+    # fecha derivada queda fija desde la primera fila que la informa y los
+    # valores sociodemográficos se arrastran con ffill dentro del código.
+    por_codigo = datos.groupby("codigo", sort=False)
+    fijada = datos["nueva_fecha_nacimiento"].notna().groupby(datos["codigo"]).cumsum() > 0
+    primera = pd.to_datetime(por_codigo["nueva_fecha_nacimiento"].transform("first"))
+    fecha = fecha_bd.combine_first(primera.where(fijada))
+
+    # Edad: del archivo o derivada de la fecha de nacimiento
+    features["edad"] = edad_archivo.combine_first(hoy.year - fecha.dt.year)
+
+    # Semestre y Carrera del paralelo
+    features["Semestre"] = datos["semestre_nombre"].str.split().str[0]
+    features["Carrera"] = datos["Carrera"]
+
+    # Sociodemográficas: archivo sobre BD
+    for col in CAMPOS_SOCIODEMOGRAFICOS:
+        valor_bd = datos[col]
+        datos[col] = _texto_archivo(bloque, col)
+        vigente = datos[col].groupby(datos["codigo"]).ffill()
+        features[col] = vigente.combine_first(valor_bd)
+
+    return datos, features
+
+
+def _cambios_estudiantes(datos: pd.DataFrame, estudiantes: pd.DataFrame) -> list[dict]:
+    """Parámetros del UPDATE por clave primaria: solo los campos que cambian.
+
+    Si un código se repite en el bloque gana el último valor informado, como
+    cuando se asignaban fila por fila; la fecha de nacimiento sale de la
+    primera fila que trae edad.
+    """
+    encontrados = datos[datos["estudiante_id"].notna()]
+    if encontrados.empty:
+        return []
+    por_estudiante = encontrados.groupby("codigo")
+    nuevos = por_estudiante[list(CAMPOS_SOCIODEMOGRAFICOS)].last()
+    actuales = estudiantes.loc[nuevos.index, list(CAMPOS_SOCIODEMOGRAFICOS)]
+    nuevos = nuevos.where(nuevos.notna() & (nuevos != actuales))
+    nuevos.columns = list(CAMPOS_SOCIODEMOGRAFICOS.values())
+    nuevos["fecha_nacimiento"] = por_estudiante["nueva_fecha_nacimiento"].first()
+    nuevos["id"] = estudiantes.loc[nuevos.index, "estudiante_id"].astype(int)
+
+    cambios = []
+    for fila in nuevos.astype(object).to_dict("records"):
+        valores = {k: v for k, v in fila.items() if not pd.isna(v)}
+        if len(valores) > 1:
+            cambios.append(valores)
+    return cambios
+
+
+@dataclass(frozen=True)
+class FiltrosRescoring:
+    """Subconjunto de estudiantes a re-puntuar (None = sin filtrar por ese campo).
+
+    `cambios_desde` deja solo a quienes cambiaron desde ese momento: datos del
+    estudiante modificados o entradas derivadas distintas de las de su última
+    predicción (ver _entradas_derivadas_cambiadas). `solo_con_historial` deja
+    a quienes ya tienen alguna predicción.
+    """
+
+    paralelo_id: int | None = None
+    gestion_id: int | None = None
+    area_id: int | None = None
+    cambios_desde: datetime | None = None
+    solo_con_historial: bool = False
+
+    def clausulas(self) -> list:
+        clausulas = []
+        if self.paralelo_id is not None:
+            clausulas.append(Estudiante.paralelo_id == self.paralelo_id)
+        if self.area_id is not None:
+            clausulas.append(Paralelo.area_id == self.area_id)
+        if self.gestion_id is not None:
+            # Estudiantes con alguna inscripción en la gestión
+            clausulas.append(exists().where(
+                Inscripcion.estudiante_id == Estudiante.id, Inscripcion.gestion_id == self.gestion_id
+            ))
+        if self.solo_con_historial:
+            clausulas.append(exists().where(Prediccion.estudiante_id == Estudiante.id))
+        if self.cambios_desde is not None:
+            clausulas.append(or_(
+                Estudiante.fecha_actualizacion > self.cambios_desde,
+                _entradas_derivadas_cambiadas(),
+            ))
+        return clausulas
+
+
+def _entradas_derivadas_cambiadas():
+    """Semestre, Carrera o edad actuales distintos de los de la última predicción.
+
+    Son entradas del modelo que cambian sin tocar estudiantes.fecha_actualizacion:
+    Semestre y Carrera salen del paralelo (su semestre o área puede cambiar) y la
+    edad es la diferencia de años con fecha_nacimiento, que cambia con el año.
+    Se comparan con las mismas reglas de features_desde_bd; Semestre y Carrera
+    solo cuentan si hoy tienen valor, porque si no se conserva el anterior.
+    Las predicciones anteriores pueden traer la edad como texto de la celda del
+    Excel ("20 años"): solo se convierte si es un número JSON (el CASE evita el
+    cast sobre el resto) y si no cuenta como NULL, es decir, como cambiada si hoy
+    hay edad. Requiere Paralelo en el FROM, como consulta_rescoring y
+    contar_rescoring.
+    """
+    previa = aliased(Prediccion)
+    ultima_id = (
+        select(Prediccion.id)
+        .where(Prediccion.estudiante_id == Estudiante.id)
+        .order_by(Prediccion.fecha_prediccion.desc(), Prediccion.id.desc())
+        .limit(1)
+        .correlate(Estudiante)
+        .scalar_subquery()
+    )
+    semestre = (
+        select(func.split_part(Semestre.nombre, " ", 1))
+        .where(Semestre.id == Paralelo.semestre_id)
+        .correlate(Paralelo)
+        .scalar_subquery()
+    )
+    carrera = select(Area.nombre).where(Area.id == Paralelo.area_id).correlate(Paralelo).scalar_subquery()
+    edad = extract("year", func.current_date()) - extract("year", Estudiante.fecha_nacimiento)
+    anteriores = previa.features_utilizadas
+    edad_anterior = case(
+        (func.jsonb_typeof(anteriores["edad"]) == "number", anteriores["edad"].astext.cast(Float)),
+        else_=None,
+    )
+    return exists().where(
+        previa.id == ultima_id,
+        or_(
+            and_(semestre.is_not(None), anteriores["Semestre"].astext.is_distinct_from(semestre)),
+            and_(carrera.is_not(None), anteriores["Carrera"].astext.is_distinct_from(carrera)),
+            edad_anterior.is_distinct_from(edad.cast(Float)),
+        ),
+    )
+
+
+def consulta_rescoring(filtros: FiltrosRescoring) -> Select:
+    """Estudiantes de `filtros` con sus atributos de BD y las features de su última predicción.
+
+    Mat/Rep/2T/Prom no se guardan en estudiantes: se toman de la última
+    predicción (LATERAL ... LIMIT 1 sobre idx_predicciones_estudiante_fecha);
+    para quien nunca fue puntuado quedan en None y las completa el imputer.
+    """
+    ultima = (
+        select(Prediccion.features_utilizadas)
+        .where(Prediccion.estudiante_id == Estudiante.id)
+        .order_by(Prediccion.fecha_prediccion.desc(), Prediccion.id.desc())
+        .limit(1)
+        .lateral("ultima_prediccion")
+    )
+    return (
+        select(
+            Estudiante.id.label("estudiante_id"),
+            Estudiante.fecha_nacimiento,
+            Semestre.nombre.label("semestre_nombre"),
+            Area.nombre.label("Carrera"),
+            *(getattr(Estudiante, attr).label(col) for col, attr in CAMPOS_SOCIODEMOGRAFICOS.items()),
+            ultima.c.features_utilizadas,
+        )
+        .outerjoin(Paralelo, Estudiante.paralelo_id == Paralelo.id)
+        .outerjoin(Semestre, Paralelo.semestre_id == Semestre.id)
+        .outerjoin(Area, Paralelo.area_id == Area.id)
+        .outerjoin(ultima, true())
+        .where(*filtros.clausulas())
+        .order_by(Estudiante.id)
+    )
+
+
+async def contar_rescoring(db: AsyncSession, filtros: FiltrosRescoring) -> int:
+    """Cantidad de estudiantes que abarca una re-puntuación."""
+    result = await db.execute(
+        select(func.count(Estudiante.id))
+        .outerjoin(Paralelo, Estudiante.paralelo_id == Paralelo.id)
+        .where(*filtros.clausulas())
+    )
+    return result.scalar_one()
+
+
+def features_desde_bd(fila, hoy: date) -> dict:
+    """Features de una fila de consulta_rescoring, con las mismas reglas que la predicción individual."""
+    previas = fila.features_utilizadas or {}
+    features: dict = {col: previas.get(col) for col in _NUMERICAS_ARCHIVO}
+    if fila.semestre_nombre:
+        features["Semestre"] = fila.semestre_nombre.split()[0]
+    if fila.Carrera:
+        features["Carrera"] = fila.Carrera
+    features["edad"] = hoy.year - fila.fecha_nacimiento.year if fila.fecha_nacimiento else None
+    for col in CAMPOS_SOCIODEMOGRAFICOS:
+        features[col] = fila._mapping[col]
+    return features
+
+
+def _registros_features(features: pd.DataFrame) -> list[dict]:
+    """Filas de features como dicts con tipos nativos y None en los faltantes (serializables a JSON)."""
+    return features.astype(object).where(features.notna(), None).to_dict("records")
+
+
+async def guardar_predicciones_lote(
+    registros: list[tuple[int, dict, tuple[float, str, str]]],
+    db: AsyncSession,
+    lote_id: int | None = None,
+    gestion_id: int | None = None,
+    tipo: str = "masiva",
+) -> list[int]:
+    """Inserta las predicciones de un bloque y genera sus alertas.
+
+    `registros` son (estudiante_id, features, (probabilidad, nivel_riesgo,
+    clasificacion)) en el orden del archivo. Las predicciones se insertan con
+    un INSERT multi-fila ... RETURNING id (ids en el mismo orden) y las
+    alertas con alerta_service.generar_alertas_predicciones_lote: el costo en
+    idas y vueltas a la base no depende de la cantidad de filas.
+    """
+    if not registros:
+        return []
+
+    hoy = date.today()
+    filas = [
+        {
+            "probabilidad_abandono": probabilidad,
+            "nivel_riesgo": nivel_riesgo,
+            "fecha_prediccion": hoy,
+            "estudiante_id": estudiante_id,
+            "lote_id": lote_id,
+            "gestion_id": gestion_id,
+            "tipo": tipo,
+            "features_utilizadas": features,
+            "version_modelo": PrediccionService.VERSION,
+        }
+        for estudiante_id, features, (probabilidad, nivel_riesgo, _) in registros
+    ]
+    result = await db.execute(
+        insert(Prediccion).returning(Prediccion.id, sort_by_parameter_order=True), filas
+    )
+    ids = list(result.scalars())
+
+    await alerta_service.generar_alertas_predicciones_lote(
+        [
+            (estudiante_id, prediccion_id, nivel_riesgo, probabilidad)
+            for (estudiante_id, _, (probabilidad, nivel_riesgo, _)), prediccion_id in zip(registros, ids)
+        ],
+        db,
+    )
+    return ids
+
+
+# Tamaño de cada parte del archivo guardado para reanudar (una fila de lotes_prediccion_archivos)
+TAMANO_PARTE_ARCHIVO = 1024 * 1024
+
+
+async def guardar_archivo_lote(db: AsyncSession, lote_id: int, ruta: Path, formato: str) -> int:
+    """Copia el archivo del lote a lotes_prediccion_archivos en partes de TAMANO_PARTE_ARCHIVO.
+
+    Cada parte se lee fuera del event loop y va en su propio INSERT Core (sin
+    pasar por el identity map), así en memoria vive una sola parte a la vez.
+    Devuelve la cantidad de partes.
+    """
+    loop = asyncio.get_running_loop()
+    partes = 0
+    with open(ruta, "rb") as f:
+        while contenido := await loop.run_in_executor(None, f.read, TAMANO_PARTE_ARCHIVO):
+            await db.execute(
+                insert(ArchivoLotePrediccion).values(
+                    lote_id=lote_id, parte=partes, formato=formato, contenido=contenido
+                )
+            )
+            partes += 1
+    return partes
+
+
+async def _partes_archivo_lote(db: AsyncSession, lote_id: int) -> AsyncIterator[bytes]:
+    """Contenido de las partes guardadas del lote, en orden, leídas de a una con un cursor."""
+    result = await db.stream(
+        select(ArchivoLotePrediccion.contenido)
+        .where(ArchivoLotePrediccion.lote_id == lote_id)
+        .order_by(ArchivoLotePrediccion.parte)
+        .execution_options(yield_per=1)
+    )
+    async for contenido in result.scalars():
+        yield contenido
+
+
+async def restaurar_archivo_lote(lote_id: int) -> tuple[Path, str] | None:
+    """Vuelca a un temporal el archivo guardado del lote; (ruta, formato) o None si no hay copia."""
+    async with AsyncSessionLocal() as db:
+        formato = (await db.execute(
+            select(ArchivoLotePrediccion.formato)
+            .where(ArchivoLotePrediccion.lote_id == lote_id)
+            .order_by(ArchivoLotePrediccion.parte)
+            .limit(1)
+        )).scalar_one_or_none()
+        if formato is None:
+            return None
+        ruta = await volcar_a_temporal(_partes_archivo_lote(db, lote_id))
+    return ruta, formato
+
+
+# Errores que se guardan como muestra en mensaje_error (total_errores lleva la cuenta completa)
+MAX_ERRORES_MENSAJE = 20
+
+
+@dataclass
+class ProgresoLote:
+    """Contadores de un lote en proceso; se vuelcan a lotes_prediccion al cerrar cada bloque.
+
+    `cursor_fila` es el índice de la siguiente fila del archivo por procesar:
+    se confirma junto con las predicciones del bloque, así un lote reanudado
+    salta exactamente lo que ya quedó guardado.
+    """
+
+    procesados: int = 0
+    total_errores: int = 0
+    errores: list[str] = field(default_factory=list)
+    contadores: dict[str, int] = field(
+        default_factory=lambda: {"Bajo": 0, "Medio": 0, "Alto": 0, "Critico": 0}
+    )
+    cursor_fila: int = 0
+
+    @classmethod
+    def desde_lote(cls, lote: LotePrediccion) -> "ProgresoLote":
+        """Reconstruye el progreso confirmado de un lote interrumpido."""
+        return cls(
+            procesados=lote.total_procesados,
+            total_errores=lote.total_errores,
+            errores=lote.mensaje_error.split("; ")[:MAX_ERRORES_MENSAJE] if lote.mensaje_error else [],
+            contadores={
+                "Bajo": lote.total_bajo_riesgo,
+                "Medio": lote.total_medio_riesgo,
+                "Alto": lote.total_alto_riesgo,
+                "Critico": lote.total_critico,
+            },
+            cursor_fila=lote.cursor_fila,
+        )
+
+    def columnas(self) -> dict:
+        return {
+            "total_procesados": self.procesados,
+            "total_errores": self.total_errores,
+            "total_bajo_riesgo": self.contadores["Bajo"],
+            "total_medio_riesgo": self.contadores["Medio"],
+            "total_alto_riesgo": self.contadores["Alto"],
+            "total_critico": self.contadores["Critico"],
+            "mensaje_error": "; ".join(self.errores) if self.errores else None,
+            "cursor_fila": self.cursor_fila,
+        }
+
+
+class ProcesadorLotesPrediccion:
+    """Procesa en segundo plano los lotes de /predicciones/masiva.
+
+    Cada lote corre como una tarea del event loop que toma el modelo activo
+    del slot durante todo el lote y avanza por bloques de `tamano_bloque`
+    filas: carga los estudiantes del bloque, puntúa en el ejecutor de
+    inferencia, persiste predicciones y alertas y actualiza los contadores del
+    lote en una sola transacción. Así el progreso visible siempre coincide con
+    lo ya guardado y una cancelación o un fallo conservan los bloques
+    completos.
+
+    Mientras el lote no termina, el archivo subido queda también en
+    lotes_prediccion_archivos junto con el cursor de la última fila
+    confirmada: si el servidor se apaga o reinicia, el lote queda en
+    `procesando` y reanudar_interrumpidos() lo retoma desde ese cursor sin
+    duplicar predicciones.
+    """
+
+    def __init__(self, slot: SlotModelo, ejecutor: EjecutorInferencia, tamano_bloque: int = 2000) -> None:
+        self.slot = slot
+        self.ejecutor = ejecutor
+        self.tamano_bloque = max(1, tamano_bloque)
+        self._tareas: dict[int, asyncio.Task] = {}
+        # Motivo de cancelación por lote, para el mensaje_error
+        self._motivos: dict[int, str] = {}
+        # Lotes cortados por el apagado: quedan en procesando para reanudarse
+        self._suspendidos: set[int] = set()
+        # (monotonic al arrancar, filas ya revisadas al arrancar) por lote en curso
+        self._inicios: dict[int, tuple[float, int]] = {}
+
+    def iniciar(
+        self,
+        lote_id: int,
+        ruta: Path,
+        formato: str,
+        gestion_id: int | None = None,
+        progreso: ProgresoLote | None = None,
+    ) -> None:
+        """Lanza el procesamiento del lote (ya creado en estado pendiente y confirmado).
+
+        `ruta` es el archivo subido (.xlsx, .csv o .parquet según `formato`),
+        ya copiado a un temporal; el procesador lo lee por bloques y lo borra
+        al terminar. `progreso` es el de un lote reanudado (ver desde_lote).
+        """
+        tarea = asyncio.get_running_loop().create_task(
+            self._procesar(lote_id, ruta, formato, gestion_id, progreso or ProgresoLote())
+        )
+        self._tareas[lote_id] = tarea
+        tarea.add_done_callback(lambda _: self._tareas.pop(lote_id, None))
+
+    def iniciar_rescoring(self, lote_id: int, filtros: FiltrosRescoring) -> None:
+        """Lanza la re-puntuación de los estudiantes de `filtros` con el modelo activo.
+
+        El lote ya está creado y confirmado; las predicciones quedan asociadas
+        a él y a filtros.gestion_id.
+        """
+        tarea = asyncio.get_running_loop().create_task(self._rescoring(lote_id, filtros))
+        self._tareas[lote_id] = tarea
+        tarea.add_done_callback(lambda _: self._tareas.pop(lote_id, None))
+
+    def en_curso(self, lote_id: int) -> bool:
+        return lote_id in self._tareas
+
+    def filas_por_segundo(self, lote_id: int, revisadas: int) -> float | None:
+        """Filas revisadas (procesadas + errores) por segundo desde que esta instancia tomó el lote.
+
+        None si el lote no está en curso aquí.
+        """
+        inicio = self._inicios.get(lote_id)
+        if inicio is None:
+            return None
+        t0, revisadas_al_inicio = inicio
+        segundos = time.monotonic() - t0
+        return round((revisadas - revisadas_al_inicio) / segundos, 1) if segundos > 0 else None
+
+    def cancelar(self, lote_id: int, motivo: str = "Cancelado por el usuario") -> bool:
+        """Solicita la cancelación; False si el lote no se está procesando en esta instancia."""
+        tarea = self._tareas.get(lote_id)
+        if tarea is None or tarea.done():
+            return False
+        self._motivos[lote_id] = motivo
+        tarea.cancel()
+        return True
+
+    async def esperar(self, lote_id: int) -> None:
+        """Espera a que termine la tarea del lote (si sigue en curso), sin propagar su resultado."""
+        tarea = self._tareas.get(lote_id)
+        if tarea is not None:
+            await asyncio.gather(tarea, return_exceptions=True)
+
+    async def cerrar(self) -> None:
+        """Detiene los lotes en curso (al apagar la aplicación) dejándolos listos para reanudarse.
+
+        El bloque en vuelo se descarta (su transacción no se confirmó); el
+        lote queda en procesando con el cursor del último bloque guardado.
+        """
+        tareas = list(self._tareas.values())
+        for lote_id, tarea in list(self._tareas.items()):
+            if not tarea.done():
+                self._suspendidos.add(lote_id)
+                tarea.cancel()
+        if tareas:
+            await asyncio.gather(*tareas, return_exceptions=True)
+
+    async def reanudar_interrumpidos(self) -> int:
+        """Retoma los lotes que quedaron pendientes/procesando tras un reinicio.
+
+        Se llama con el modelo ya cargado. Cada lote sigue desde su cursor_fila
+        con los contadores confirmados; los que no tienen el archivo guardado
+        se marcan como error. Devuelve la cantidad de lotes reanudados.
+        """
+        if self.slot.activo is None:
+            logger.warning("Modelo ML no disponible: los lotes interrumpidos se reanudarán en el próximo inicio")
+            return 0
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(LotePrediccion)
+                .where(LotePrediccion.estado.in_([EstadoLote.PENDIENTE, EstadoLote.PROCESANDO]))
+                .order_by(LotePrediccion.id)
+            )
+            lotes = [lote for lote in result.scalars().all() if lote.id not in self._tareas]
+
+        reanudados = 0
+        for lote in lotes:
+            progreso = ProgresoLote.desde_lote(lote)
+            archivo = await restaurar_archivo_lote(lote.id)
+            if archivo is None:
+                await self._actualizar_lote(
+                    lote.id, progreso, EstadoLote.ERROR,
+                    "Procesamiento interrumpido por un reinicio del servidor; vuelva a subir el archivo "
+                    "(o a lanzar la re-puntuación).",
+                )
+                continue
+            ruta, formato = archivo
+            logger.info("Reanudando lote %d desde la fila %d", lote.id, progreso.cursor_fila)
+            self.iniciar(lote.id, ruta, formato, lote.gestion_id, progreso)
+            reanudados += 1
+        return reanudados
+
+    async def _procesar(
+        self, lote_id: int, ruta: Path, formato: str, gestion_id: int | None, progreso: ProgresoLote
+    ) -> None:
+        try:
+            with self.slot.arrendar() as ml:
+                await self._ejecutar_lote(
+                    lote_id, progreso, ml, self._recorrer_archivo(ml, lote_id, ruta, formato, gestion_id, progreso)
+                )
+        finally:
+            ruta.unlink(missing_ok=True)
+
+    async def _rescoring(self, lote_id: int, filtros: FiltrosRescoring) -> None:
+        progreso = ProgresoLote()
+        with self.slot.arrendar() as ml:
+            await self._ejecutar_lote(
+                lote_id, progreso, ml, self._recorrer_estudiantes(ml, lote_id, filtros, progreso), reanudable=False
+            )
+
+    async def _ejecutar_lote(
+        self,
+        lote_id: int,
+        progreso: ProgresoLote,
+        ml: PrediccionService | None,
+        recorrido: Coroutine[Any, Any, int],
+        reanudable: bool = True,
+    ) -> None:
+        """Corre `recorrido` (que procesa los bloques y devuelve el total de filas) y registra el estado final.
+
+        Una cancelación o un fallo dejan el lote en error con los bloques ya
+        guardados; el apagado del servidor deja los lotes `reanudable` en
+        procesando para retomarlos al iniciar.
+        """
+        if ml is None:
+            recorrido.close()
+            await self._actualizar_lote(lote_id, progreso, EstadoLote.ERROR, "Modelo ML no disponible")
+            return
+        self._inicios[lote_id] = (time.monotonic(), progreso.procesados + progreso.total_errores)
+        try:
+            await self._actualizar_lote(lote_id, progreso, EstadoLote.PROCESANDO)
+            total = await recorrido
+            # total_estudiantes se creó con una estimación (encabezado de la hoja o COUNT previo)
+            await self._actualizar_lote(lote_id, progreso, EstadoLote.COMPLETADO, total_estudiantes=total)
+            logger.info(
+                "Lote %d completado: %d procesados, %d errores (%.0f filas/s)",
+                lote_id, progreso.procesados, progreso.total_errores,
+                self.filas_por_segundo(lote_id, progreso.procesados + progreso.total_errores) or 0,
+            )
+        except asyncio.CancelledError:
+            if reanudable and lote_id in self._suspendidos:
+                self._suspendidos.discard(lote_id)
+                logger.warning(
+                    "Lote %d suspendido por el apagado en la fila %d; se reanudará al iniciar",
+                    lote_id, progreso.cursor_fila,
+                )
+                raise
+            self._suspendidos.discard(lote_id)
+            motivo = self._motivos.pop(lote_id, "Interrumpido por el apagado del servidor")
+            logger.warning("Lote %d cancelado tras %d procesados: %s", lote_id, progreso.procesados, motivo)
+            await self._actualizar_lote(
+                lote_id, progreso, EstadoLote.ERROR,
+                f"{motivo} ({progreso.procesados} predicciones guardadas)",
+            )
+            raise
+        except Exception as exc:
+            logger.exception("Fallo al procesar el lote %d", lote_id)
+            await self._actualizar_lote(
+                lote_id, progreso, EstadoLote.ERROR,
+                f"Error al procesar el lote: {type(exc).__name__}: {exc} "
+                f"({progreso.procesados} predicciones guardadas)",
+            )
+        finally:
+            self._inicios.pop(lote_id, None)
+
+    async def _recorrer_archivo(
+        self,
+        ml: PrediccionService,
+        lote_id: int,
+        ruta: Path,
+        formato: str,
+        gestion_id: int | None,
+        progreso: ProgresoLote,
+    ) -> int:
+        lector = await abrir_lector_async(ruta, formato=formato, usar_columnas=COLUMNAS_MASIVA)
+        with lector:
+            async for bloque in bloques_async(lector, self.tamano_bloque):
+                # Al reanudar, saltar las filas que ya se confirmaron
+                if len(bloque) and bloque.index[0] < progreso.cursor_fila:
+                    bloque = bloque[bloque.index >= progreso.cursor_fila]
+                    if bloque.empty:
+                        continue
+                await self._procesar_bloque(ml, lote_id, gestion_id, bloque, progreso)
+            return lector.filas_leidas
+
+    async def _recorrer_estudiantes(
+        self, ml: PrediccionService, lote_id: int, filtros: FiltrosRescoring, progreso: ProgresoLote
+    ) -> int:
+        """Re-puntúa a los estudiantes de `filtros` leyéndolos con un cursor del servidor.
+
+        La lectura va en su propia sesión (una transacción abierta durante todo
+        el recorrido) y cada bloque se guarda y confirma en otra, así en memoria
+        solo vive un bloque de `tamano_bloque` estudiantes a la vez.
+        """
+        hoy = date.today()
+        async with AsyncSessionLocal() as lectura:
+            result = await lectura.stream(
+                consulta_rescoring(filtros).execution_options(yield_per=self.tamano_bloque)
+            )
+            async for filas in result.partitions():
+                pendientes = [
+                    (fila.estudiante_id, fila.estudiante_id, features_desde_bd(fila, hoy)) for fila in filas
+                ]
+                async with AsyncSessionLocal() as db:
+                    await self._puntuar_y_guardar(
+                        ml, db, lote_id, filtros.gestion_id, pendientes, [], progreso,
+                        cursor_fila=progreso.cursor_fila + len(filas),
+                    )
+        return progreso.cursor_fila
+
+    async def _procesar_bloque(
+        self,
+        ml: PrediccionService,
+        lote_id: int,
+        gestion_id: int | None,
+        bloque: pd.DataFrame,
+        progreso: ProgresoLote,
+    ) -> None:
+        async with AsyncSessionLocal() as db:
+            estudiantes = await cargar_atributos_estudiantes(db, codigos_del_bloque(bloque).unique())
+            datos, features = armar_features_bloque(bloque, estudiantes)
+
+            encontrados = datos["estudiante_id"].notna()
+            errores = [f"Estudiante no encontrado: {codigo}" for codigo in datos.loc[~encontrados, "codigo"]]
+            # Actualizar datos sociodemográficos de los estudiantes desde el archivo
+            cambios = _cambios_estudiantes(datos, estudiantes)
+            if cambios:
+                await db.execute(update(Estudiante), cambios)
+
+            pendientes = list(zip(
+                datos.loc[encontrados, "codigo"],
+                datos.loc[encontrados, "estudiante_id"].astype(int),
+                _registros_features(features[encontrados]),
+            ))
+            await self._puntuar_y_guardar(
+                ml, db, lote_id, gestion_id, pendientes, errores, progreso,
+                cursor_fila=int(bloque.index[-1]) + 1,
+            )
+
+    async def _puntuar_y_guardar(
+        self,
+        ml: PrediccionService,
+        db: AsyncSession,
+        lote_id: int,
+        gestion_id: int | None,
+        pendientes: list[tuple[Any, int, dict]],
+        errores: list[str],
+        progreso: ProgresoLote,
+        cursor_fila: int,
+    ) -> None:
+        """Puntúa un bloque, guarda predicciones y alertas y confirma los contadores del lote.
+
+        `pendientes` son (codigo, estudiante_id, features). Todo va en la
+        transacción de `db`; `progreso` se actualiza solo después del commit.
+        """
+        try:
+            resultados = await self.ejecutor.ejecutar(
+                ml.predecir_lote_por_fila, [features for _, _, features in pendientes], limitar=False
+            )
+        except Exception as exc:
+            resultados = [exc] * len(pendientes)
+
+        registros: list[tuple[int, dict, tuple[float, str, str]]] = []
+        for (codigo, estudiante_id, features), resultado in zip(pendientes, resultados):
+            if isinstance(resultado, Exception):
+                logger.error("Fallo en predicción ML para código %s", codigo, exc_info=resultado)
+                errores.append(f"Error al predecir {codigo}: {type(resultado).__name__}: {resultado}")
+                continue
+            registros.append((estudiante_id, features, resultado))
+
+        await guardar_predicciones_lote(registros, db, lote_id=lote_id, gestion_id=gestion_id)
+
+        # Los contadores se confirman junto con las predicciones del bloque
+        siguiente = ProgresoLote(
+            procesados=progreso.procesados + len(registros),
+            total_errores=progreso.total_errores + len(errores),
+            errores=(progreso.errores + errores)[:MAX_ERRORES_MENSAJE],
+            contadores=dict(progreso.contadores),
+            cursor_fila=cursor_fila,
+        )
+        for _, _, (_, nivel_riesgo, _) in registros:
+            siguiente.contadores[nivel_riesgo] = siguiente.contadores.get(nivel_riesgo, 0) + 1
+        await db.execute(
+            update(LotePrediccion).where(LotePrediccion.id == lote_id).values(**siguiente.columnas())
+        )
+        await db.commit()
+        progreso.procesados = siguiente.procesados
+        progreso.total_errores = siguiente.total_errores
+        progreso.errores = siguiente.errores
+        progreso.contadores = siguiente.contadores
+        progreso.cursor_fila = siguiente.cursor_fila
+
+    @staticmethod
+    async def _actualizar_lote(
+        lote_id: int,
+        progreso: ProgresoLote,
+        estado: str,
+        mensaje: str | None = None,
+        total_estudiantes: int | None = None,
+    ) -> None:
+        valores = {**progreso.columnas(), "estado": estado}
+        if total_estudiantes is not None:
+            valores["total_estudiantes"] = total_estudiantes
+        if mensaje:
+            valores["mensaje_error"] = "; ".join([mensaje, *progreso.errores])
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(LotePrediccion).where(LotePrediccion.id == lote_id).values(**valores))
+            if estado in (EstadoLote.COMPLETADO, EstadoLote.ERROR):
+                # Lote terminado: ya no hace falta la copia del archivo para reanudarlo
+                await db.execute(delete(ArchivoLotePrediccion).where(ArchivoLotePrediccion.lote_id == lote_id))
+            await db.commit()
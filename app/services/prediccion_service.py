@@ -1,11 +1,260 @@
 """Servicio de predicción ML para abandono estudiantil."""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
 
 import joblib
 import numpy as np
 import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
 from sklearn.experimental import enable_iterative_imputer  # noqa: F401 — necesario para deserializar IterativeImputer
 
+from app.services.bundle_modelo import COMPONENTES, NOMBRE_BUNDLE, leer_bundle
+from app.services.evaluador_arboles import EvaluadorArboles
+from app.services.imputador_lineal import ImputadorLineal
+
+logger = logging.getLogger(__name__)
+
+
+def probas_y_clases(modelo, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Ejecuta el clasificador: matriz predict_proba y clase predicha por fila."""
+    probas = modelo.predict_proba(X)
+    if isinstance(modelo, RandomForestClassifier):
+        # RandomForestClassifier.predict es exactamente argmax(predict_proba):
+        # se evita recorrer el bosque una segunda vez.
+        return probas, modelo.classes_.take(np.argmax(probas, axis=1))
+    return probas, modelo.predict(X)  # 0 o 1 directamente del modelo
+
+
+def _solo_lectura(arreglo: np.ndarray) -> np.ndarray:
+    """Marca un arreglo como inmutable para que el plan no pueda alterarse tras compilarse."""
+    arreglo.setflags(write=False)
+    return arreglo
+
+
+def _columna_numerica(valores: list) -> np.ndarray:
+    """Convierte una columna a float64 con la semántica de pd.to_numeric(errors='coerce').
+
+    Si no hay texto (caso habitual: números y None desde la API o el Excel) basta
+    con np.array, que ya convierte None en NaN; el texto se delega en pandas.
+    """
+    if any(isinstance(v, str) for v in valores):
+        return pd.to_numeric(np.array(valores, dtype=object), errors="coerce").astype(float)
+    return np.array(valores, dtype=float)
+
+
+@dataclass(frozen=True)
+class PlanFeatures:
+    """Disposición de columnas del modelo compilada una sola vez a partir de los artefactos.
+
+    Contiene todo lo que predecir_lote necesitaba recalcular en cada llamada
+    (códigos de categorías, destino OHE, índices y vectores del scaler), de modo
+    que la inferencia se reduce a una secuencia fija de operaciones sobre arreglos.
+    """
+
+    columnas_numericas: tuple[str, ...]
+    columnas_categoricas: tuple[str, ...]
+    columnas_modelo: tuple[str, ...]
+    # Categoría → código del label encoder, con las variantes acentuadas ya resueltas
+    codigos_categoria: Mapping[str, Mapping]
+    # Código máximo válido por categórica (en el orden de columnas_categoricas)
+    max_codigo: np.ndarray
+    # Código → índice de la columna dummy en columnas_modelo (-1 si no tiene columna)
+    destino_ohe: tuple[np.ndarray, ...]
+    idx_numericas: np.ndarray
+    idx_edad: int
+    scaler_media: np.ndarray
+    scaler_escala: np.ndarray
+
+    @classmethod
+    def compilar(
+        cls,
+        columnas_numericas: list[str],
+        columnas_categoricas: list[str],
+        label_encoders: dict,
+        scaler,
+        feature_columns: list[str],
+        reemplazos_texto: dict[str, dict[str, str]],
+    ) -> "PlanFeatures":
+        """Construye el plan a partir de los artefactos del entrenamiento."""
+        codigos_categoria = {}
+        for col in columnas_categoricas:
+            codigos = {clase: float(i) for i, clase in enumerate(label_encoders[col].classes_)}
+            # Las variantes acentuadas se resuelven al código de su forma normalizada
+            # (equivale a reemplazar el texto y luego aplicar transform).
+            for original, normalizado in reemplazos_texto.get(col, {}).items():
+                if normalizado in codigos:
+                    codigos[original] = codigos[normalizado]
+                else:
+                    codigos.pop(original, None)
+            codigos_categoria[col] = MappingProxyType(codigos)
+
+        posiciones = {nombre: i for i, nombre in enumerate(feature_columns)}
+        destino_ohe = []
+        for col in columnas_categoricas:
+            n_clases = len(label_encoders[col].classes_)
+            # Equivale a get_dummies sin la columna _0 (drop_first del entrenamiento)
+            # seguido de reindex(columns=feature_columns, fill_value=0)
+            destino_ohe.append(_solo_lectura(np.array(
+                [posiciones.get(f"{col}_{codigo}", -1) if codigo else -1 for codigo in range(n_clases)],
+                dtype=np.intp,
+            )))
+
+        n_num = len(columnas_numericas)
+        media = np.asarray(scaler.mean_, dtype=float) if scaler.with_mean else np.zeros(n_num)
+        escala = np.asarray(scaler.scale_, dtype=float) if scaler.with_std else np.ones(n_num)
+
+        return cls(
+            columnas_numericas=tuple(columnas_numericas),
+            columnas_categoricas=tuple(columnas_categoricas),
+            columnas_modelo=tuple(feature_columns),
+            codigos_categoria=MappingProxyType(codigos_categoria),
+            max_codigo=_solo_lectura(np.array(
+                [len(label_encoders[col].classes_) - 1 for col in columnas_categoricas]
+            )),
+            destino_ohe=tuple(destino_ohe),
+            idx_numericas=_solo_lectura(np.array([posiciones[col] for col in columnas_numericas])),
+            idx_edad=columnas_numericas.index("edad"),
+            scaler_media=_solo_lectura(media.copy()),
+            scaler_escala=_solo_lectura(escala.copy()),
+        )
+
+    def matriz_imputer(self, filas: list[dict]) -> np.ndarray:
+        """Matriz de entrada del IterativeImputer: NUMERIC_COLS + CATEGORICAL_COLS codificadas."""
+        n_num = len(self.columnas_numericas)
+        matriz = np.empty((len(filas), n_num + len(self.columnas_categoricas)))
+        for j, col in enumerate(self.columnas_numericas):
+            matriz[:, j] = _columna_numerica([fila.get(col) for fila in filas])
+        # Label encode vía diccionario: NaN si es nulo o desconocido
+        for j, col in enumerate(self.columnas_categoricas, start=n_num):
+            codigos = self.codigos_categoria[col]
+            matriz[:, j] = [codigos.get(fila.get(col), np.nan) for fila in filas]
+        return matriz
+
+    def matriz_modelo(self, imputada: np.ndarray) -> np.ndarray:
+        """Convierte la salida del imputer en la matriz final escalada (orden de columnas_modelo)."""
+        n = imputada.shape[0]
+        n_num = len(self.columnas_numericas)
+
+        # Redondear categóricas al entero válido más cercano y la edad a entero
+        cat_enc = np.clip(np.round(imputada[:, n_num:]), 0, self.max_codigo).astype(np.intp)
+        numericas = imputada[:, :n_num].copy()
+        numericas[:, self.idx_edad] = np.round(numericas[:, self.idx_edad])
+
+        # Escalar solo numéricas (mismas operaciones que StandardScaler.transform)
+        numericas -= self.scaler_media
+        numericas /= self.scaler_escala
+
+        X = np.zeros((n, len(self.columnas_modelo)))
+        X[:, self.idx_numericas] = numericas
+        filas_idx = np.arange(n)
+        for j, destino_col in enumerate(self.destino_ohe):
+            destino = destino_col[cat_enc[:, j]]
+            activas = destino >= 0
+            X[filas_idx[activas], destino[activas]] = 1.0
+        return X
+
+
+def _tipo_y_valor(valor) -> str:
+    """Serialización de respaldo para la huella: distingue np.int64(5) de "5"."""
+    return f"{type(valor).__name__}:{valor}"
+
+
+class CachePredicciones:
+    """Cache LRU con TTL de resultados de predicción, seguro entre hilos.
+
+    La clave es un SHA-256 de la versión del modelo más el dict de features
+    serializado de forma canónica, así que cada entrada ocupa unos pocos cientos
+    de bytes y el total queda acotado por `max_entradas`.
+    """
+
+    def __init__(self, max_entradas: int = 10_000, ttl_s: float = 3600) -> None:
+        self.max_entradas = max_entradas
+        self.ttl_s = ttl_s
+        self._entradas: OrderedDict[bytes, tuple[float, tuple[float, str, str]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    @staticmethod
+    def clave(version_modelo: str, features: dict) -> bytes:
+        canonico = json.dumps(
+            features, sort_keys=True, separators=(",", ":"), default=_tipo_y_valor
+        )
+        return hashlib.sha256(f"{version_modelo}|{canonico}".encode()).digest()
+
+    def obtener(self, clave: bytes) -> tuple[float, str, str] | None:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                if entrada is not None:
+                    del self._entradas[clave]
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, clave: bytes, resultado: tuple[float, str, str]) -> None:
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + self.ttl_s, resultado)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+    def metricas(self) -> dict:
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+            "ttl_s": self.ttl_s,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0,
+        }
+
+
+def _huella_artefactos(model_path: Path, archivos: list[str]) -> str:
+    """Identifica los artefactos cargados (versión de model_info.json + tamaño y mtime de cada archivo)."""
+    h = hashlib.sha256()
+    info = model_path / "model_info.json"
+    if info.exists():
+        with open(info, "r", encoding="utf-8") as f:
+            h.update(str(json.load(f).get("version", "")).encode())
+    for nombre in archivos:
+        st = (model_path / nombre).stat()
+        h.update(f"{nombre}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+def _cargar_artefactos(model_path: Path) -> tuple[dict, str]:
+    """Artefactos del modelo y su huella: desde modelo.bundle si existe, si no desde los .pkl sueltos."""
+    ruta_bundle = model_path / NOMBRE_BUNDLE
+    if ruta_bundle.exists():
+        bundle = leer_bundle(ruta_bundle)
+        logger.info("Modelo cargado desde %s (versión %s)", NOMBRE_BUNDLE, bundle.version)
+        return bundle.artefactos, bundle.huella
+
+    # Formato anterior: mmap_mode='r' mapea los artefactos a disco en lugar de cargarlos
+    # completos en RAM, lo que reduce el uso de memoria en producción (Render 512MB).
+    archivos = [f"{nombre}.pkl" for nombre in COMPONENTES]
+    artefactos = {
+        nombre: joblib.load(model_path / archivo, mmap_mode="r")
+        for nombre, archivo in zip(COMPONENTES, archivos)
+    }
+    return artefactos, _huella_artefactos(model_path, archivos)
+
 
 class PrediccionService:
     """Carga los artefactos del modelo v3 (Random Forest + IterativeImputer + OHE) y ejecuta predicciones."""
@@ -18,82 +267,116 @@ class PrediccionService:
     ]
     VERSION = "v3_iterative_imputer_ohe_rf"
 
-    def __init__(self, model_dir: str) -> None:
+    # Normaliza texto para coincidir con las clases del label encoder
+    _REEMPLAZOS_TEXTO: dict[str, dict[str, str]] = {
+        "Carrera": {
+            "Tecnológicas": "Tecnologicas",
+            "No Tecnológicas": "No Tecnologicas",
+        },
+        "tipo_colegio": {"Público": "Publico"},
+        "modalidad_ingreso": {
+            "Prueba de Suficiencia Académica": "Prueba de Suficiencia Academica",
+            "Admisión Especial": "Admision Especial",
+        },
+    }
+
+    def __init__(
+        self,
+        model_dir: str,
+        pool_procesos=None,
+        cache: CachePredicciones | None = None,
+    ) -> None:
         model_path = Path(model_dir)
-        # mmap_mode='r' mapea los artefactos a disco en lugar de cargarlos completos en RAM,
-        # lo que reduce significativamente el uso de memoria en producción (Render 512MB).
-        self.modelo          = joblib.load(model_path / "mejor_modelo.pkl", mmap_mode="r")
-        self.scaler          = joblib.load(model_path / "scaler.pkl", mmap_mode="r")
-        self.label_encoders  = joblib.load(model_path / "label_encoders.pkl", mmap_mode="r")
-        self.iter_imputer    = joblib.load(model_path / "iter_imputer.pkl", mmap_mode="r")
-        self.feature_columns = joblib.load(model_path / "feature_columns.pkl", mmap_mode="r")
+        self.model_dir = str(model_dir)
+        # Pool opcional de procesos (PoolInferenciaProcesos) que ejecuta el clasificador
+        self.pool_procesos = pool_procesos
+        # Cache opcional de resultados; es propia de esta instancia, así que al recargar
+        # el modelo el servicio nuevo arranca con una cache vacía
+        self.cache = cache
+        artefactos, self.version_modelo = _cargar_artefactos(model_path)
+        self.modelo          = artefactos["mejor_modelo"]
+        self.scaler          = artefactos["scaler"]
+        self.label_encoders  = artefactos["label_encoders"]
+        self.iter_imputer    = artefactos["iter_imputer"]
+        # IterativeImputer con BayesianRidge → forma cerrada con el mismo resultado
+        # (el bundle ya lo guarda destilado)
+        if not isinstance(self.iter_imputer, ImputadorLineal):
+            self.iter_imputer = ImputadorLineal.destilar(self.iter_imputer) or self.iter_imputer
+        self.feature_columns = artefactos["feature_columns"]
+        # Random Forest / XGBoost compilados a arreglos de nodos para lotes chicos (None para LogReg);
+        # el bundle ya lo trae compilado
+        self.evaluador = artefactos.get("evaluador_arboles")
+        if self.evaluador is None:
+            self.evaluador = EvaluadorArboles.compilar(self.modelo)
+
+        # Plan de features compilado una sola vez; predecir_lote solo ejecuta operaciones sobre arreglos
+        self.plan = PlanFeatures.compilar(
+            self.NUMERIC_COLS,
+            self.CATEGORICAL_COLS,
+            self.label_encoders,
+            self.scaler,
+            list(self.feature_columns),
+            self._REEMPLAZOS_TEXTO,
+        )
 
     def predecir(self, features: dict) -> tuple[float, str, str]:
         """Predice probabilidad, nivel de riesgo y clasificación para un estudiante."""
         return self.predecir_lote([features])[0]
 
     def predecir_lote(self, filas: list[dict]) -> list[tuple[float, str, str]]:
-        """Predice probabilidad, nivel de riesgo y clasificación para múltiples estudiantes."""
-        df = pd.DataFrame(filas)
-        df = self._limpiar_texto(df)
-
-        # Paso 1: Label encode categóricas → columnas _enc (enteros o NaN)
-        for col in self.CATEGORICAL_COLS:
-            enc_col = f"{col}_enc"
-            if col in df.columns:
-                df[enc_col] = df[col].apply(lambda v, c=col: self._safe_encode(c, v))
-            else:
-                df[enc_col] = np.nan
-
-        # Paso 2: Construir DataFrame de entrada del IterativeImputer
-        # Orden exacto: NUMERIC_COLS + CATEGORICAL_COLS_enc (igual que en entrenamiento)
-        imputer_cols = self.NUMERIC_COLS + [f"{c}_enc" for c in self.CATEGORICAL_COLS]
-        imputer_input = pd.DataFrame(index=range(len(df)))
-        for col in self.NUMERIC_COLS:
-            imputer_input[col] = (
-                pd.to_numeric(df[col], errors="coerce") if col in df.columns else np.nan
-            )
-        for col in self.CATEGORICAL_COLS:
-            enc_col = f"{col}_enc"
-            imputer_input[enc_col] = (
-                pd.to_numeric(df[enc_col], errors="coerce") if enc_col in df.columns else np.nan
-            )
+        """Predice probabilidad, nivel de riesgo y clasificación para múltiples estudiantes.
+
+        Si hay cache, solo se puntúan las filas cuyo resultado no está cacheado.
+        """
+        if self.cache is None:
+            return self._predecir_lote_modelo(filas)
+
+        claves = [self.cache.clave(self.version_modelo, fila) for fila in filas]
+        resultados = [self.cache.obtener(clave) for clave in claves]
+        faltantes = [i for i, r in enumerate(resultados) if r is None]
+        if faltantes:
+            nuevos = self._predecir_lote_modelo([filas[i] for i in faltantes])
+            for i, resultado in zip(faltantes, nuevos):
+                resultados[i] = resultado
+                self.cache.guardar(claves[i], resultado)
+        return resultados
+
+    def predecir_lote_por_fila(self, filas: list[dict]) -> list[tuple[float, str, str] | Exception]:
+        """Como predecir_lote, pero un error en una fila no invalida al resto.
+
+        Se puntúa todo el bloque de una vez; solo si falla se reintenta fila
+        por fila para aislar las inválidas, cuyo lugar en el resultado ocupa
+        la excepción correspondiente.
+        """
+        try:
+            return list(self.predecir_lote(filas))
+        except Exception:
+            if len(filas) <= 1:
+                raise
+        resultados: list[tuple[float, str, str] | Exception] = []
+        for fila in filas:
+            try:
+                resultados.append(self.predecir_lote([fila])[0])
+            except Exception as exc:
+                resultados.append(exc)
+        return resultados
+
+    def _predecir_lote_modelo(self, filas: list[dict]) -> list[tuple[float, str, str]]:
+        """Ejecuta el pipeline completo sobre las filas.
+
+        Replica exactamente el pipeline de entrenamiento
+        (label encoding → IterativeImputer → OHE drop_first → StandardScaler)
+        siguiendo el PlanFeatures compilado al cargar el modelo.
+        """
+        if not filas:
+            return []
 
         # Imputar valores faltantes con IterativeImputer (MICE)
-        imputed = self.iter_imputer.transform(imputer_input[imputer_cols].values)
-        imputed_df = pd.DataFrame(imputed, columns=imputer_cols)
-
-        # Post-proceso: redondear categóricas al entero válido más cercano
-        for col in self.CATEGORICAL_COLS:
-            enc_col = f"{col}_enc"
-            max_val = len(self.label_encoders[col].classes_) - 1
-            imputed_df[enc_col] = imputed_df[enc_col].round().clip(0, max_val).astype(int)
-        imputed_df["edad"] = imputed_df["edad"].round().astype(int)
-
-        # Paso 3: Construir pre_ohe — numéricas + categóricas como enteros (sin sufijo _enc)
-        # pd.get_dummies las convierte a OHE igual que en el entrenamiento
-        pre_ohe = imputed_df[self.NUMERIC_COLS].copy()
-        for col in self.CATEGORICAL_COLS:
-            pre_ohe[col] = imputed_df[f"{col}_enc"].values
-
-        # OHE sin drop_first para no depender de qué categorías estén presentes en el batch
-        df_ohe = pd.get_dummies(pre_ohe, columns=self.CATEGORICAL_COLS, drop_first=False)
-        # Eliminar columnas _0 de cada categórica (equivalente exacto al drop_first=True del
-        # entrenamiento, donde siempre estaban presentes todas las categorías incluyendo la 0)
-        for col in self.CATEGORICAL_COLS:
-            if f"{col}_0" in df_ohe.columns:
-                df_ohe = df_ohe.drop(columns=[f"{col}_0"])
-
-        # Alinear columnas con las del entrenamiento; rellena con 0 las que no aparezcan
-        df_ohe = df_ohe.reindex(columns=self.feature_columns, fill_value=0)
-
-        # Paso 4: Escalar solo numéricas
-        df_ohe[self.NUMERIC_COLS] = self.scaler.transform(df_ohe[self.NUMERIC_COLS])
-
-        # Paso 5: Predecir
-        X = df_ohe.values
-        probas = self.modelo.predict_proba(X)[:, 1]
-        clases = self.modelo.predict(X)  # 0 o 1 directamente del modelo
+        imputada = self.iter_imputer.transform(self.plan.matriz_imputer(filas))
+        X = self.plan.matriz_modelo(imputada)
+
+        probas_matriz, clases = self._ejecutar_modelo(X)
+        probas = probas_matriz[:, 1]
 
         return [
             (
@@ -104,6 +387,59 @@ class PrediccionService:
             for p, c in zip(probas, clases)
         ]
 
+    def prueba_humo(self, n_filas: int = 256) -> None:
+        """Puntúa un lote sintético (sin pasar por la cache) y valida el resultado.
+
+        Recorre todas las clases de cada label encoder y mezcla faltantes, de
+        modo que se ejercitan el imputer, el one-hot, el evaluador compilado y
+        el estimador (o el pool de procesos) antes de publicar el servicio.
+        Lanza ValueError si alguna predicción no es válida.
+        """
+        filas = []
+        for i in range(n_filas):
+            fila: dict = {}
+            for j, col in enumerate(self.NUMERIC_COLS):
+                if (i + j) % 7 != 0:
+                    fila[col] = (i * (j + 3)) % 30 + (0.5 if col == "Prom" else 0)
+            for j, col in enumerate(self.CATEGORICAL_COLS):
+                clases = list(getattr(self.label_encoders.get(col), "classes_", []))
+                if clases and (i + j) % 11 != 0:
+                    fila[col] = clases[(i + j) % len(clases)]
+            filas.append(fila)
+
+        for lote in (filas[:1], filas):
+            resultados = self._predecir_lote_modelo(lote)
+            if len(resultados) != len(lote):
+                raise ValueError(f"Prueba de humo: {len(resultados)} resultados para {len(lote)} filas")
+            for probabilidad, nivel, clasificacion in resultados:
+                if not 0.0 <= probabilidad <= 1.0:
+                    raise ValueError(f"Prueba de humo: probabilidad fuera de rango ({probabilidad})")
+                if nivel != self.calcular_nivel_riesgo(probabilidad):
+                    raise ValueError(f"Prueba de humo: nivel '{nivel}' no corresponde a {probabilidad}")
+                if clasificacion not in ("Abandona", "No Abandona"):
+                    raise ValueError(f"Prueba de humo: clasificación inesperada '{clasificacion}'")
+
+    def cerrar(self) -> None:
+        """Libera los recursos asociados (pool de procesos y cache, si los hay)."""
+        pool, self.pool_procesos = self.pool_procesos, None
+        if pool is not None:
+            pool.cerrar()
+        if self.cache is not None:
+            self.cache.invalidar()
+
+    def _ejecutar_modelo(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Corre el clasificador: evaluador compilado en lotes chicos, si no el pool de procesos
+        si está activo, y si no el estimador en este hilo."""
+        if self.evaluador is not None and self.evaluador.conviene(len(X)):
+            return self.evaluador.predecir(X)
+        if self.pool_procesos is not None:
+            try:
+                return self.pool_procesos.predecir(X)
+            except RuntimeError as exc:
+                # Pool cerrado (recarga del modelo) o roto: el modelo también está cargado aquí
+                logger.warning("Pool de inferencia no disponible (%s); se predice en el proceso principal", exc)
+        return probas_y_clases(self.modelo, X)
+
     @staticmethod
     def calcular_nivel_riesgo(probabilidad: float) -> str:
         """Calcula nivel de riesgo: <0.3 Bajo, 0.3-0.5 Medio, 0.5-0.7 Alto, >=0.7 Critico."""
@@ -115,32 +451,3 @@ class PrediccionService:
             return "Medio"
         else:
             return "Bajo"
-
-    def _safe_encode(self, col: str, value) -> float:
-        """Codifica un valor categórico; retorna NaN si es nulo o desconocido."""
-        if value is None or (isinstance(value, float) and np.isnan(value)):
-            return np.nan
-        try:
-            encoder = self.label_encoders[col]
-            return float(encoder.transform([value])[0])
-        except (ValueError, KeyError):
-            return np.nan
-
-    @staticmethod
-    def _limpiar_texto(df: pd.DataFrame) -> pd.DataFrame:
-        """Normaliza texto para coincidir con el label encoder."""
-        reemplazos = {
-            "Carrera": {
-                "Tecnológicas": "Tecnologicas",
-                "No Tecnológicas": "No Tecnologicas",
-            },
-            "tipo_colegio": {"Público": "Publico"},
-            "modalidad_ingreso": {
-                "Prueba de Suficiencia Académica": "Prueba de Suficiencia Academica",
-                "Admisión Especial": "Admision Especial",
-            },
-        }
-        for col, mapeo in reemplazos.items():
-            if col in df.columns:
-                df[col] = df[col].replace(mapeo)
-        return df
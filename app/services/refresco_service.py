@@ -0,0 +1,287 @@
+"""Refresco programado del riesgo: re-puntúa en segundo plano a los estudiantes con cambios."""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone, tzinfo
+
+from sqlalchemy import select, update
+
+from app.core.database import AsyncSessionLocal
+from app.models.ejecucion_refresco import EjecucionRefresco, EstadoEjecucion
+from app.models.lote_prediccion import EstadoLote, LotePrediccion
+from app.services.prediccion_lote_service import (
+    FiltrosRescoring,
+    ProcesadorLotesPrediccion,
+    contar_rescoring,
+)
+from app.services.prediccion_service import PrediccionService
+
+logger = logging.getLogger(__name__)
+
+# Nombre que muestran los lotes sin usuario (los del refresco programado)
+USUARIO_REFRESCO = "Refresco programado"
+
+
+class ExpresionCron:
+    """Expresión cron de 5 campos: minuto hora día-del-mes mes día-de-la-semana.
+
+    Cada campo admite `*`, números, rangos `a-b`, pasos `*/n` o `a-b/n` y
+    listas separadas por coma. El día de la semana va de 0 a 7 (0 y 7 =
+    domingo). Como en cron, si se restringen día del mes y día de la semana
+    basta con que coincida uno de los dos.
+    """
+
+    _RANGOS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expresion: str) -> None:
+        campos = expresion.split()
+        if len(campos) != 5:
+            raise ValueError(f"La expresión cron debe tener 5 campos: {expresion!r}")
+        self.expresion = expresion
+        valores = [self._parsear(campo, *rango) for campo, rango in zip(campos, self._RANGOS)]
+        self.minutos, self.horas, self.dias, self.meses, dias_semana = valores
+        # 7 = domingo = 0; se pasa a la convención de date.weekday() (lunes = 0)
+        self.dias_semana = {(d - 1) % 7 for d in dias_semana}
+        self._dia_libre = campos[2] == "*"
+        self._semana_libre = campos[4] == "*"
+
+    @staticmethod
+    def _parsear(campo: str, minimo: int, maximo: int) -> set[int]:
+        valores: set[int] = set()
+        for parte in campo.split(","):
+            rango, _, paso = parte.partition("/")
+            if rango == "*":
+                inicio, fin = minimo, maximo
+            elif "-" in rango:
+                inicio, fin = (int(v) for v in rango.split("-", 1))
+            else:
+                inicio = fin = int(rango)
+            salto = int(paso) if paso else 1
+            if not (minimo <= inicio <= fin <= maximo) or salto < 1:
+                raise ValueError(f"Campo cron fuera de rango ({minimo}-{maximo}): {campo!r}")
+            valores.update(range(inicio, fin + 1, salto))
+        return valores
+
+    def _coincide_dia(self, momento: datetime) -> bool:
+        por_dia = momento.day in self.dias
+        por_semana = momento.weekday() in self.dias_semana
+        if self._dia_libre or self._semana_libre:
+            return por_dia and por_semana
+        return por_dia or por_semana
+
+    def siguiente(self, desde: datetime) -> datetime:
+        """Primer minuto posterior a `desde` que coincide con la expresión (misma zona horaria)."""
+        momento = desde.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = momento + timedelta(days=366 * 5)
+        while momento < limite:
+            if momento.month not in self.meses:
+                anio, mes = (momento.year + 1, 1) if momento.month == 12 else (momento.year, momento.month + 1)
+                momento = momento.replace(year=anio, month=mes, day=1, hour=0, minute=0)
+            elif not self._coincide_dia(momento):
+                momento = momento.replace(hour=0, minute=0) + timedelta(days=1)
+            elif momento.hour not in self.horas:
+                momento = momento.replace(minute=0) + timedelta(hours=1)
+            elif momento.minute not in self.minutos:
+                momento += timedelta(minutes=1)
+            else:
+                return momento
+        raise ValueError(f"La expresión cron no coincide con ninguna fecha: {self.expresion!r}")
+
+
+class RefrescoRiesgo:
+    """Corre el refresco de riesgo según `cron` (o a pedido) sobre el procesador de lotes.
+
+    Cada corrida re-puntúa, con la misma ruta por bloques y escrituras masivas
+    que POST /predicciones/rescoring, solo a los estudiantes con predicción
+    previa cuyos datos cambiaron desde el inicio de la última corrida
+    completada (datos del estudiante modificados, o Semestre, Carrera o edad
+    distintos de los de su última predicción). Si el
+    modelo activo es otra versión que la de esa corrida, o no hay corrida
+    previa, re-puntúa a todos. Las estadísticas quedan en ejecuciones_refresco.
+    """
+
+    def __init__(
+        self, procesador: ProcesadorLotesPrediccion, cron: ExpresionCron | None, zona: tzinfo = timezone.utc
+    ) -> None:
+        self.procesador = procesador
+        self.cron = cron
+        self.zona = zona
+        self._tarea: asyncio.Task | None = None
+        self._manual: asyncio.Task | None = None
+        # Se marca de forma síncrona al reservar la corrida (antes de crear la
+        # tarea), así dos lanzamientos seguidos no pueden reservar ambos
+        self._ocupado = False
+
+    def iniciar(self) -> None:
+        """Arranca el bucle del programador (no hace nada si no hay expresión cron)."""
+        if self.cron is None:
+            return
+        self._tarea = asyncio.get_running_loop().create_task(self._bucle())
+        logger.info("Refresco de riesgo programado con '%s'", self.cron.expresion)
+
+    async def cerrar(self) -> None:
+        """Detiene el programador y la corrida en curso (su lote queda en error)."""
+        tareas = [t for t in (self._tarea, self._manual) if t is not None]
+        for tarea in tareas:
+            tarea.cancel()
+        if tareas:
+            await asyncio.gather(*tareas, return_exceptions=True)
+
+    @property
+    def en_curso(self) -> bool:
+        return self._ocupado
+
+    def lanzar(self) -> bool:
+        """Lanza una corrida manual en segundo plano; False si ya hay una en curso o pendiente."""
+        if not self._reservar():
+            return False
+        self._manual = asyncio.get_running_loop().create_task(self._ejecutar("manual"))
+        # La reserva se libera al terminar la tarea, aunque se cancele antes de arrancar
+        self._manual.add_done_callback(self._liberar)
+        return True
+
+    def proxima(self) -> datetime | None:
+        return self.cron.siguiente(datetime.now(self.zona)) if self.cron is not None else None
+
+    @staticmethod
+    async def recuperar_interrumpidas() -> int:
+        """Marca como error las corridas que quedaron en curso tras un reinicio."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(EjecucionRefresco)
+                .where(EjecucionRefresco.estado == EstadoEjecucion.EN_CURSO)
+                .values(
+                    estado=EstadoEjecucion.ERROR,
+                    fecha_fin=datetime.now(timezone.utc),
+                    mensaje_error="Interrumpida por un reinicio del servidor",
+                )
+            )
+            await db.commit()
+        return result.rowcount
+
+    async def _bucle(self) -> None:
+        while True:
+            ahora = datetime.now(self.zona)
+            siguiente = self.cron.siguiente(ahora)
+            await asyncio.sleep((siguiente - ahora).total_seconds())
+            try:
+                await self.ejecutar("programado")
+            except Exception:
+                logger.exception("Fallo el refresco programado de riesgo")
+
+    async def ejecutar(self, disparo: str = "manual") -> int | None:
+        """Corre un refresco y espera a que termine; devuelve el id de la ejecución.
+
+        None si ya hay una corrida en curso en esta instancia.
+        """
+        if not self._reservar():
+            logger.warning("Refresco de riesgo (%s) omitido: ya hay uno en curso", disparo)
+            return None
+        try:
+            return await self._ejecutar(disparo)
+        finally:
+            self._liberar()
+
+    def _reservar(self) -> bool:
+        if self._ocupado:
+            return False
+        self._ocupado = True
+        return True
+
+    def _liberar(self, _tarea: asyncio.Task | None = None) -> None:
+        self._ocupado = False
+
+    async def _ejecutar(self, disparo: str) -> int:
+        ml = self.procesador.slot.activo
+        version = ml.version_modelo if ml is not None else None
+        inicio = datetime.now(timezone.utc)
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(EjecucionRefresco)
+                .where(EjecucionRefresco.estado == EstadoEjecucion.COMPLETADO)
+                .order_by(EjecucionRefresco.fecha_inicio.desc())
+                .limit(1)
+            )
+            previa = result.scalar_one_or_none()
+            incremental = previa is not None and previa.version_modelo == version
+            filtros = FiltrosRescoring(
+                cambios_desde=previa.fecha_inicio if incremental else None, solo_con_historial=True
+            )
+            ejecucion = EjecucionRefresco(
+                fecha_inicio=inicio,
+                estado=EstadoEjecucion.EN_CURSO,
+                disparo=disparo,
+                modo="incremental" if incremental else "completo",
+                cambios_desde=filtros.cambios_desde,
+                version_modelo=version,
+            )
+            db.add(ejecucion)
+            if ml is None:
+                ejecucion.estado = EstadoEjecucion.ERROR
+                ejecucion.fecha_fin = inicio
+                ejecucion.mensaje_error = "Modelo ML no disponible"
+                await db.commit()
+                logger.warning("Refresco de riesgo omitido: modelo ML no disponible")
+                return ejecucion.id
+
+            ejecucion.total_candidatos = await contar_rescoring(db, filtros)
+            if ejecucion.total_candidatos:
+                lote = LotePrediccion(
+                    nombre_archivo=(
+                        f"Refresco de riesgo ({ejecucion.modo}"
+                        + (f" desde {filtros.cambios_desde:%Y-%m-%d %H:%M} UTC)" if incremental else ")")
+                    ),
+                    usuario_id=None,
+                    estado=EstadoLote.PENDIENTE,
+                    total_estudiantes=ejecucion.total_candidatos,
+                    version_modelo=PrediccionService.VERSION,
+                )
+                db.add(lote)
+                await db.flush()
+                ejecucion.lote_id = lote.id
+            else:
+                ejecucion.estado = EstadoEjecucion.COMPLETADO
+                ejecucion.fecha_fin = datetime.now(timezone.utc)
+                ejecucion.duracion_s = 0.0
+            await db.commit()
+            ejecucion_id, lote_id = ejecucion.id, ejecucion.lote_id
+
+        if lote_id is None:
+            logger.info("Refresco de riesgo %d: sin estudiantes con cambios", ejecucion_id)
+            return ejecucion_id
+
+        t0 = time.monotonic()
+        try:
+            self.procesador.iniciar_rescoring(lote_id, filtros)
+            await self.procesador.esperar(lote_id)
+        finally:
+            # Si se canceló la espera (apagado), dejar que el lote registre su estado antes de leerlo
+            await self.procesador.esperar(lote_id)
+            await self._registrar_resultado(ejecucion_id, lote_id, time.monotonic() - t0)
+        return ejecucion_id
+
+    @staticmethod
+    async def _registrar_resultado(ejecucion_id: int, lote_id: int, segundos: float) -> None:
+        async with AsyncSessionLocal() as db:
+            lote = await db.get(LotePrediccion, lote_id)
+            revisadas = lote.total_procesados + lote.total_errores
+            completado = lote.estado == EstadoLote.COMPLETADO
+            await db.execute(
+                update(EjecucionRefresco)
+                .where(EjecucionRefresco.id == ejecucion_id)
+                .values(
+                    estado=EstadoEjecucion.COMPLETADO if completado else EstadoEjecucion.ERROR,
+                    fecha_fin=datetime.now(timezone.utc),
+                    total_procesados=lote.total_procesados,
+                    total_errores=lote.total_errores,
+                    duracion_s=round(segundos, 3),
+                    filas_por_segundo=round(revisadas / segundos, 1) if segundos > 0 else None,
+                    mensaje_error=None if completado else lote.mensaje_error or f"Lote en estado {lote.estado}",
+                )
+            )
+            await db.commit()
+        logger.info(
+            "Refresco de riesgo %d: %d re-puntuados, %d errores en %.1f s",
+            ejecucion_id, lote.total_procesados, lote.total_errores, segundos,
+        )
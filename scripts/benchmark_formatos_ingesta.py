@@ -0,0 +1,115 @@
+"""Benchmark de lectura por formato: .xlsx vs .csv vs .parquet.
+
+Genera un archivo con las columnas de la plantilla de predicción masiva y lo
+recorre por bloques con app.services.ingesta_archivos en cada formato (más
+pd.read_excel completo como referencia). Cada medición corre en un proceso
+aparte para que el pico de memoria (RSS máximo) sea comparable.
+
+Uso:
+    python scripts/benchmark_formatos_ingesta.py [filas] [tamano_bloque]
+"""
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from app.services.ingesta_archivos import abrir_lector, pq
+from app.services.prediccion_lote_service import COLUMNAS_MASIVA
+
+
+def _generar(filas: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "Codigo": [f"EST{i:06d}" for i in range(filas)],
+        "Nombre": rng.choice(["Ana", "Luis", "María", "José"], filas),
+        "Apellido": rng.choice(["Pérez", "Rojas", "Flores", "Vargas"], filas),
+        "Mat": rng.integers(3, 8, filas),
+        "Rep": rng.integers(0, 3, filas),
+        "2T": rng.integers(0, 3, filas),
+        "Prom": rng.uniform(0, 100, filas).round(2),
+        "edad": rng.integers(17, 40, filas),
+        "Grado": rng.choice(["Bachiller", "Técnico"], filas),
+        "Genero": rng.choice(["Masculino", "Femenino"], filas),
+        "estrato_socioeconomico": rng.choice(["Bajo", "Medio", "Alto"], filas),
+        "ocupacion_laboral": rng.choice(["Si", "No"], filas),
+        "con_quien_vive": rng.choice(["Padres", "Solo", "Pareja"], filas),
+        "apoyo_economico": rng.choice(["Si", "No"], filas),
+        "modalidad_ingreso": rng.choice(["Examen", "Admision Especial"], filas),
+        "tipo_colegio": rng.choice(["Publico", "Privado"], filas),
+        "Observaciones": ["texto libre que la predicción no usa"] * filas,
+    })
+
+
+def _rss_kb(campo: str) -> int:
+    for linea in Path("/proc/self/status").read_text().splitlines():
+        if linea.startswith(campo + ":"):
+            return int(linea.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _medir(modo: str, ruta: str, tamano_bloque: int) -> dict:
+    """Se ejecuta en el proceso hijo: recorre el archivo y devuelve tiempo y memoria."""
+    try:
+        # Reinicia el pico de RSS (VmHWM) para no contar lo que subieron los imports
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+    rss_inicial = _rss_kb("VmRSS")
+    t0 = time.perf_counter()
+    if modo == "read_excel":
+        filas = len(pd.read_excel(ruta, engine="openpyxl"))
+    else:
+        with abrir_lector(ruta, formato=modo, usar_columnas=COLUMNAS_MASIVA) as lector:
+            filas = sum(len(bloque) for bloque in lector.bloques(tamano_bloque))
+    segundos = time.perf_counter() - t0
+    pico = _rss_kb("VmHWM")
+    return {"filas": filas, "segundos": segundos, "pico_mb": (pico - rss_inicial) / 1024}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--medir":
+        print(json.dumps(_medir(sys.argv[2], sys.argv[3], int(sys.argv[4]))))
+        return
+
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    tamano_bloque = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    df = _generar(filas)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rutas = {"xlsx": Path(tmp) / "datos.xlsx", "csv": Path(tmp) / "datos.csv"}
+        df.to_excel(rutas["xlsx"], index=False)
+        df.to_csv(rutas["csv"], index=False)
+        if pq is not None:
+            rutas["parquet"] = Path(tmp) / "datos.parquet"
+            df.to_parquet(rutas["parquet"], index=False)
+        else:
+            print("pyarrow no está instalado: se omite Parquet")
+
+        casos = [("read_excel", rutas["xlsx"])] + [(formato, ruta) for formato, ruta in rutas.items()]
+        print(f"{filas} filas, bloques de {tamano_bloque}")
+        print(f"{'modo':<12}{'tamaño MB':>10}{'segundos':>10}{'filas/s':>12}{'pico MB':>10}")
+        for modo, ruta in casos:
+            salida = subprocess.run(
+                [sys.executable, __file__, "--medir", modo, str(ruta), str(tamano_bloque)],
+                capture_output=True, text=True, check=True,
+            )
+            r = json.loads(salida.stdout.strip().splitlines()[-1])
+            if r["filas"] != filas:
+                print(f"{modo}: se leyeron {r['filas']} filas, se esperaban {filas}")
+                sys.exit(1)
+            print(
+                f"{modo:<12}{ruta.stat().st_size / 1e6:>10.1f}{r['segundos']:>10.2f}"
+                f"{filas / r['segundos']:>12.0f}{r['pico_mb']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark de throughput del clasificador: hilos vs pool de procesos.
+
+Puntúa varios lotes concurrentes con el modelo del directorio indicado,
+primero con el clasificador en el proceso principal (hilos) y luego con
+PoolInferenciaProcesos usando 1..N procesos, y muestra filas/segundo.
+
+Uso:
+    python scripts/benchmark_inferencia_procesos.py [model_dir] [filas_por_lote] [lotes]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.inferencia_procesos import PoolInferenciaProcesos
+from app.services.prediccion_service import PrediccionService
+from verificar_paridad_prediccion import _filas_aleatorias
+
+
+def _medir(servicio: PrediccionService, lotes: list[list[dict]], hilos: int) -> float:
+    """Filas por segundo puntuando todos los lotes con `hilos` hilos concurrentes."""
+    servicio.predecir_lote(lotes[0][:10])  # calentamiento (workers ya cargados)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(servicio.predecir_lote, lotes))
+    return sum(len(l) for l in lotes) / (time.perf_counter() - t0)
+
+
+def main():
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else settings.ml_model_dir
+    filas_por_lote = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    n_lotes = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    nucleos = os.cpu_count() or 1
+
+    servicio = PrediccionService(model_dir)
+    rng = np.random.default_rng(0)
+    lotes = [_filas_aleatorias(servicio.label_encoders, filas_por_lote, rng) for _ in range(n_lotes)]
+    esperado = servicio.predecir_lote(lotes[0])
+
+    print(f"Núcleos: {nucleos} | lotes: {n_lotes} x {filas_por_lote} filas")
+    base = _medir(servicio, lotes, hilos=nucleos)
+    print(f"hilos ({nucleos})        : {base:10.0f} filas/s")
+
+    for procesos in range(1, nucleos + 1):
+        servicio.pool_procesos = PoolInferenciaProcesos(model_dir, procesos, modelo=servicio.modelo)
+        try:
+            if servicio.predecir_lote(lotes[0]) != esperado:
+                print(f"procesos ({procesos}): resultados distintos a la ejecución local")
+                sys.exit(1)
+            tasa = _medir(servicio, lotes, hilos=nucleos)
+        finally:
+            servicio.cerrar()
+        print(f"procesos ({procesos:2d})    : {tasa:10.0f} filas/s  (x{tasa / base:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Convierte los .pkl sueltos del modelo en modelo.bundle y verifica el resultado.
+
+Carga PrediccionService desde los .pkl, escribe el bundle en el mismo
+directorio, vuelve a cargar el servicio desde el bundle y compara las
+predicciones de ambos sobre filas aleatorias. Los .pkl no se borran.
+
+Uso:
+    python scripts/convertir_pickles_a_bundle.py [model_dir] [n_filas]
+"""
+import sys
+import time
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.bundle_modelo import NOMBRE_BUNDLE, convertir_pickles, verificar_bundle
+from app.services.prediccion_service import PrediccionService
+from verificar_paridad_prediccion import _filas_aleatorias
+
+
+def main():
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else settings.ml_model_dir
+    n_filas = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    model_path = Path(model_dir)
+    # Los artefactos se ajustaron con DataFrames; aquí, como en producción, reciben arreglos
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    if (model_path / NOMBRE_BUNDLE).exists():
+        print(f"Ya existe {model_path / NOMBRE_BUNDLE}; bórrelo para volver a convertir.")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    desde_pickles = PrediccionService(model_dir)
+    t_pickles = time.perf_counter() - t0
+
+    ruta = convertir_pickles(model_path)
+    manifiesto = verificar_bundle(ruta)
+
+    t0 = time.perf_counter()
+    desde_bundle = PrediccionService(model_dir)
+    t_bundle = time.perf_counter() - t0
+
+    print(f"Bundle: {ruta} ({ruta.stat().st_size / 1024 / 1024:.2f} MB), versión {manifiesto['version_modelo']}")
+    for nombre, info in manifiesto["componentes"].items():
+        tamano = sum(seg["longitud"] for seg in info["segmentos"])
+        print(f"  {nombre:<18} {tamano / 1024:10.1f} KB  {len(info['segmentos']):3d} segmentos  sha256={info['sha256'][:16]}…")
+    print(f"Carga desde .pkl: {t_pickles * 1000:.1f} ms | desde bundle: {t_bundle * 1000:.1f} ms")
+
+    filas = _filas_aleatorias(desde_pickles.label_encoders, n_filas, np.random.default_rng(7))
+    esperado = desde_pickles.predecir_lote(filas)
+    obtenido = desde_bundle.predecir_lote(filas)
+    diferencias = sum(1 for e, o in zip(esperado, obtenido) if e != o)
+    if diferencias:
+        print(f"DIFERENCIAS en {diferencias} de {n_filas} predicciones")
+        sys.exit(1)
+    print(f"OK: {n_filas} predicciones idénticas")
+
+
+if __name__ == "__main__":
+    main()
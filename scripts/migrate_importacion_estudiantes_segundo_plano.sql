@@ -0,0 +1,32 @@
+-- Migración: Importación de estudiantes en segundo plano
+-- Fecha: 2026-10-17
+-- POST /estudiantes/importar responde de inmediato con el lote y la
+-- importación corre en segundo plano; el lote registra su estado y avance.
+-- Los lotes anteriores ya terminaron: quedan como completados. Los errores
+-- por fila van a errores_importacion_estudiantes (se descargan en CSV/NDJSON)
+-- en lugar de devolverse todos en la respuesta.
+
+ALTER TABLE lotes_importacion_estudiantes
+    ADD COLUMN IF NOT EXISTS estado TEXT NOT NULL DEFAULT 'completado',
+    ADD COLUMN IF NOT EXISTS filas_procesadas INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS mensaje_error TEXT,
+    ADD COLUMN IF NOT EXISTS resumen JSONB,
+    ADD COLUMN IF NOT EXISTS fecha_fin TIMESTAMPTZ;
+
+UPDATE lotes_importacion_estudiantes
+SET filas_procesadas = total_filas
+WHERE estado = 'completado' AND filas_procesadas = 0;
+
+ALTER TABLE lotes_importacion_estudiantes
+    ALTER COLUMN estado SET DEFAULT 'pendiente';
+
+CREATE TABLE IF NOT EXISTS errores_importacion_estudiantes (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    lote_id BIGINT NOT NULL REFERENCES lotes_importacion_estudiantes(id) ON DELETE CASCADE,
+    fila INTEGER NOT NULL,
+    codigo TEXT,
+    mensaje TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_errores_importacion_estudiantes_lote
+    ON errores_importacion_estudiantes (lote_id, id);
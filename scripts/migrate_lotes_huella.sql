@@ -0,0 +1,14 @@
+-- Migración: Huella de contenido en lotes de predicción e importación de estudiantes
+-- Fecha: 2026-10-17
+-- SHA-256 del archivo subido combinado con lo que cambia el resultado de la
+-- carga (versión del modelo y gestión en predicción masiva; malla asignada en
+-- importación de estudiantes). Una carga idéntica devuelve el lote existente
+-- salvo que se pida ?forzar=true.
+
+ALTER TABLE lotes_prediccion ADD COLUMN IF NOT EXISTS huella TEXT;
+ALTER TABLE lotes_importacion_estudiantes ADD COLUMN IF NOT EXISTS huella TEXT;
+
+CREATE INDEX IF NOT EXISTS ix_lotes_prediccion_huella
+    ON lotes_prediccion USING btree (huella) WHERE huella IS NOT NULL;
+CREATE INDEX IF NOT EXISTS ix_lotes_importacion_estudiantes_huella
+    ON lotes_importacion_estudiantes USING btree (huella) WHERE huella IS NOT NULL;
@@ -0,0 +1,12 @@
+-- Migración: Archivo de los lotes de predicción guardado por partes
+-- Fecha: 2026-10-17
+-- lotes_prediccion_archivos pasa de una fila con todo el archivo a una fila
+-- por parte de 1 MB (clave lote_id, parte): la app escribe y lee el archivo de
+-- a una parte, sin cargarlo completo en memoria. Las filas existentes quedan
+-- como la parte 0 de su lote.
+
+ALTER TABLE lotes_prediccion_archivos
+    ADD COLUMN IF NOT EXISTS parte INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE lotes_prediccion_archivos DROP CONSTRAINT IF EXISTS lotes_prediccion_archivos_pkey;
+ALTER TABLE lotes_prediccion_archivos ADD CONSTRAINT lotes_prediccion_archivos_pkey PRIMARY KEY (lote_id, parte);
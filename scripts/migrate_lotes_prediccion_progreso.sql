@@ -0,0 +1,6 @@
+-- Migración: Progreso de lotes de predicción procesados en segundo plano
+-- Fecha: 2026-10-17
+-- Filas con error (estudiante no encontrado o features inválidas) para
+-- calcular el avance en GET /predicciones/lotes/{id}/progreso.
+
+ALTER TABLE lotes_prediccion ADD COLUMN IF NOT EXISTS total_errores INTEGER NOT NULL DEFAULT 0;
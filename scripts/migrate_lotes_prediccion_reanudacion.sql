@@ -0,0 +1,16 @@
+-- Migración: Reanudación de lotes de predicción masiva tras un reinicio
+-- Fecha: 2026-10-17
+-- cursor_fila es el índice (base 0) de la siguiente fila del archivo por
+-- procesar; se confirma en la misma transacción que las predicciones de cada
+-- bloque. El archivo subido se guarda en lotes_prediccion_archivos mientras el
+-- lote está pendiente/procesando (Render no tiene disco persistente) y se
+-- borra al terminar.
+
+ALTER TABLE lotes_prediccion
+    ADD COLUMN IF NOT EXISTS cursor_fila INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS lotes_prediccion_archivos (
+    lote_id BIGINT PRIMARY KEY REFERENCES lotes_prediccion(id) ON DELETE CASCADE,
+    formato TEXT NOT NULL,
+    contenido BYTEA NOT NULL
+);
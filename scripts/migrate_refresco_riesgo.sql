@@ -0,0 +1,35 @@
+-- Migración: Refresco programado del riesgo
+-- Fecha: 2026-10-17
+-- estudiantes.fecha_actualizacion la mantiene la app (onupdate) y sirve para
+-- re-puntuar solo a quienes cambiaron desde el último refresco; las
+-- modificaciones hechas fuera de la app no la actualizan. Los lotes del
+-- refresco no tienen usuario. ejecuciones_refresco guarda las estadísticas de
+-- cada corrida.
+
+ALTER TABLE estudiantes
+    ADD COLUMN IF NOT EXISTS fecha_actualizacion TIMESTAMPTZ NOT NULL DEFAULT NOW();
+CREATE INDEX IF NOT EXISTS ix_estudiantes_fecha_actualizacion
+    ON estudiantes USING btree (fecha_actualizacion);
+
+ALTER TABLE lotes_prediccion ALTER COLUMN usuario_id DROP NOT NULL;
+
+CREATE TABLE IF NOT EXISTS ejecuciones_refresco (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    fecha_inicio TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    fecha_fin TIMESTAMPTZ,
+    estado TEXT NOT NULL DEFAULT 'en_curso'
+        CHECK (estado IN ('en_curso', 'completado', 'error')),
+    disparo TEXT NOT NULL CHECK (disparo IN ('programado', 'manual')),
+    modo TEXT NOT NULL CHECK (modo IN ('incremental', 'completo')),
+    cambios_desde TIMESTAMPTZ,
+    version_modelo TEXT,
+    lote_id BIGINT REFERENCES lotes_prediccion(id),
+    total_candidatos INTEGER NOT NULL DEFAULT 0,
+    total_procesados INTEGER NOT NULL DEFAULT 0,
+    total_errores INTEGER NOT NULL DEFAULT 0,
+    duracion_s DOUBLE PRECISION,
+    filas_por_segundo DOUBLE PRECISION,
+    mensaje_error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_ejecuciones_refresco_fecha_inicio
+    ON ejecuciones_refresco USING btree (fecha_inicio DESC);
@@ -0,0 +1,85 @@
+"""Compara el EvaluadorArboles compilado contra predict_proba del modelo cargado.
+
+Genera matrices de features con la forma del modelo (numéricas escaladas +
+dummies 0/1), verifica que las probabilidades coincidan dentro de 1e-9 y que
+las clases sean idénticas, y mide tiempos por tamaño de lote.
+
+Uso:
+    python scripts/verificar_evaluador_arboles.py [model_dir] [n_filas]
+"""
+import sys
+import time
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import joblib
+import numpy as np
+
+from app.core.config import settings
+from app.services.evaluador_arboles import EvaluadorArboles
+from app.services.prediccion_service import PrediccionService, probas_y_clases
+
+TOLERANCIA = 1e-9
+
+
+def _matriz_aleatoria(feature_columns: list[str], n: int, rng: np.random.Generator) -> np.ndarray:
+    X = (rng.random((n, len(feature_columns))) < 0.3).astype(np.float64)
+    for j, col in enumerate(feature_columns):
+        if col in PrediccionService.NUMERIC_COLS:
+            X[:, j] = rng.normal(0, 1.5, n)
+    return X
+
+
+def _medir(fn, X: np.ndarray, repeticiones: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        fn(X)
+    return (time.perf_counter() - t0) / repeticiones * 1000
+
+
+def main():
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else settings.ml_model_dir
+    n_filas = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    # El modelo se entrenó con un DataFrame; aquí, como en producción, recibe arreglos
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    model_path = Path(model_dir)
+    modelo = joblib.load(model_path / "mejor_modelo.pkl")
+    feature_columns = list(joblib.load(model_path / "feature_columns.pkl"))
+
+    t0 = time.perf_counter()
+    evaluador = EvaluadorArboles.compilar(modelo)
+    t_compilar = time.perf_counter() - t0
+    if evaluador is None:
+        print(f"{type(modelo).__name__} no es un ensamble de árboles soportado; nada que verificar")
+        return
+    print(
+        f"{type(modelo).__name__}: {evaluador.n_arboles} árboles, profundidad {evaluador.profundidad}, "
+        f"{evaluador.nbytes / 1024 / 1024:.2f} MB compilado en {t_compilar * 1000:.1f} ms"
+    )
+
+    X = _matriz_aleatoria(feature_columns, n_filas, np.random.default_rng(42))
+    esperado, clases_esperadas = probas_y_clases(modelo, X)
+    obtenido, clases_obtenidas = evaluador.predecir(X)
+    diferencia = float(np.abs(esperado - obtenido).max())
+    clases_distintas = int((clases_esperadas != clases_obtenidas).sum())
+    print(f"Filas: {n_filas} | máx. diferencia de probabilidad: {diferencia:.3e} | clases distintas: {clases_distintas}")
+
+    for tamano in (1, 8, 32, 128, 512):
+        lote = X[:tamano]
+        t_modelo = _medir(modelo.predict_proba, lote, 20)
+        t_evaluador = _medir(evaluador.predict_proba, lote, 20)
+        uso = "evaluador" if evaluador.conviene(tamano) else "estimador"
+        print(f"  lote {tamano:>4}: predict_proba {t_modelo:8.3f} ms | evaluador {t_evaluador:8.3f} ms | se usa: {uso}")
+
+    if diferencia > TOLERANCIA or clases_distintas:
+        print("DIFERENCIAS fuera de tolerancia")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
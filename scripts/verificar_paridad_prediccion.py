@@ -0,0 +1,156 @@
+"""Verifica que la ruta vectorizada de PrediccionService reproduzca el pipeline pandas original.
+
+Genera filas aleatorias (incluyendo nulos, categorías desconocidas, variantes
+acentuadas y numéricos como texto), las puntúa con la implementación de
+referencia basada en pandas/sklearn y con PrediccionService.predecir_lote,
+y reporta cualquier diferencia.
+
+Uso:
+    python scripts/verificar_paridad_prediccion.py [model_dir] [n_filas]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.prediccion_service import PrediccionService
+
+
+def _predecir_referencia(artefactos: dict, filas: list[dict]) -> list[tuple[float, str, str]]:
+    """Pipeline original fila a fila (pandas + LabelEncoder.transform por celda)."""
+    num_cols = PrediccionService.NUMERIC_COLS
+    cat_cols = PrediccionService.CATEGORICAL_COLS
+    label_encoders = artefactos["label_encoders"]
+
+    df = pd.DataFrame(filas)
+    for col, mapeo in PrediccionService._REEMPLAZOS_TEXTO.items():
+        if col in df.columns:
+            df[col] = df[col].replace(mapeo)
+
+    def safe_encode(col, value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return np.nan
+        try:
+            return float(label_encoders[col].transform([value])[0])
+        except (ValueError, KeyError):
+            return np.nan
+
+    imputer_cols = num_cols + [f"{c}_enc" for c in cat_cols]
+    imputer_input = pd.DataFrame(index=range(len(df)))
+    for col in num_cols:
+        imputer_input[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else np.nan
+    for col in cat_cols:
+        imputer_input[f"{col}_enc"] = (
+            df[col].apply(lambda v, c=col: safe_encode(c, v)) if col in df.columns else np.nan
+        )
+
+    imputed = artefactos["iter_imputer"].transform(imputer_input[imputer_cols].values)
+    imputed_df = pd.DataFrame(imputed, columns=imputer_cols)
+    for col in cat_cols:
+        max_val = len(label_encoders[col].classes_) - 1
+        imputed_df[f"{col}_enc"] = imputed_df[f"{col}_enc"].round().clip(0, max_val).astype(int)
+    imputed_df["edad"] = imputed_df["edad"].round().astype(int)
+
+    pre_ohe = imputed_df[num_cols].copy()
+    for col in cat_cols:
+        pre_ohe[col] = imputed_df[f"{col}_enc"].values
+    df_ohe = pd.get_dummies(pre_ohe, columns=cat_cols, drop_first=False)
+    for col in cat_cols:
+        if f"{col}_0" in df_ohe.columns:
+            df_ohe = df_ohe.drop(columns=[f"{col}_0"])
+    df_ohe = df_ohe.reindex(columns=artefactos["feature_columns"], fill_value=0)
+    df_ohe[num_cols] = artefactos["scaler"].transform(df_ohe[num_cols])
+
+    X = df_ohe.values
+    modelo = artefactos["mejor_modelo"]
+    probas = modelo.predict_proba(X)[:, 1]
+    clases = modelo.predict(X)
+    return [
+        (
+            round(float(p), 4),
+            PrediccionService.calcular_nivel_riesgo(float(p)),
+            "Abandona" if int(c) == 1 else "No Abandona",
+        )
+        for p, c in zip(probas, clases)
+    ]
+
+
+def _filas_aleatorias(label_encoders: dict, n: int, rng: np.random.Generator) -> list[dict]:
+    """Filas sintéticas con la mezcla de valores que llega desde Excel y desde la API."""
+    acentuadas = {
+        col: list(mapeo) for col, mapeo in PrediccionService._REEMPLAZOS_TEXTO.items()
+    }
+    filas = []
+    for _ in range(n):
+        fila: dict = {}
+        for col in PrediccionService.NUMERIC_COLS:
+            r = rng.random()
+            if r < 0.10:
+                fila[col] = None
+            elif r < 0.15:
+                fila[col] = float("nan")
+            elif r < 0.20:
+                fila[col] = str(int(rng.integers(0, 10)))
+            elif r < 0.22:
+                fila[col] = "sin dato"
+            elif r < 0.25:
+                continue  # columna ausente
+            elif col == "Prom":
+                fila[col] = float(rng.normal(6, 1.5))
+            else:
+                fila[col] = int(rng.integers(0, 30))
+        for col in PrediccionService.CATEGORICAL_COLS:
+            r = rng.random()
+            if r < 0.10:
+                fila[col] = None
+            elif r < 0.15:
+                fila[col] = "Desconocido"
+            elif r < 0.20 and col in acentuadas:
+                fila[col] = str(rng.choice(acentuadas[col]))
+            elif r < 0.23:
+                continue
+            else:
+                fila[col] = str(rng.choice(label_encoders[col].classes_))
+        filas.append(fila)
+    return filas
+
+
+def main():
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else settings.ml_model_dir
+    n_filas = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    model_path = Path(model_dir)
+    artefactos = {
+        nombre: joblib.load(model_path / f"{nombre}.pkl")
+        for nombre in ("mejor_modelo", "scaler", "label_encoders", "iter_imputer", "feature_columns")
+    }
+    servicio = PrediccionService(model_dir)
+    filas = _filas_aleatorias(artefactos["label_encoders"], n_filas, np.random.default_rng(42))
+
+    t0 = time.perf_counter()
+    esperado = _predecir_referencia(artefactos, filas)
+    t1 = time.perf_counter()
+    obtenido = servicio.predecir_lote(filas)
+    t2 = time.perf_counter()
+
+    diferencias = [
+        (i, e, o) for i, (e, o) in enumerate(zip(esperado, obtenido)) if e != o
+    ]
+    print(f"Filas evaluadas: {n_filas}")
+    print(f"Referencia pandas: {t1 - t0:.3f}s | Ruta vectorizada: {t2 - t1:.3f}s")
+    if diferencias:
+        print(f"DIFERENCIAS: {len(diferencias)}")
+        for i, e, o in diferencias[:10]:
+            print(f"  fila {i}: esperado={e} obtenido={o}")
+        sys.exit(1)
+    print("OK: resultados idénticos")
+
+
+if __name__ == "__main__":
+    main()
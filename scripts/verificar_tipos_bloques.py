@@ -0,0 +1,78 @@
+"""Verifica que los lectores por bloques den el mismo texto para un valor en cualquier bloque.
+
+Arma un .xlsx y un .csv con columnas clave numéricas (Codigo, Paralelo,
+GestionAcademica) y una celda vacía en medio de un bloque, los recorre con
+bloques pequeños y compara el texto de cada celda (como lo leen las
+importaciones) con el de una lectura en un solo bloque. Antes de tipar por
+celda, el bloque con la celda vacía daba "1004.0" y los demás "1004".
+
+Uso:
+    python scripts/verificar_tipos_bloques.py
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import openpyxl
+import pandas as pd
+
+from app.services.ingesta_archivos import abrir_lector
+
+COLUMNAS = ("Codigo", "Paralelo", "GestionAcademica")
+CODIGOS = (1000, 1001, 1002, 1003, 1004, None, 2000, 1004)
+TAMANO_BLOQUE = 3
+
+
+def _filas() -> list[list]:
+    return [[codigo, 1 if codigo else None, 2024] for codigo in CODIGOS]
+
+
+def _escribir_xlsx(ruta: Path) -> None:
+    libro = openpyxl.Workbook()
+    hoja = libro.active
+    hoja.append(list(COLUMNAS))
+    for fila in _filas():
+        hoja.append(fila)
+    libro.save(ruta)
+
+
+def _escribir_csv(ruta: Path) -> None:
+    pd.DataFrame(_filas(), columns=list(COLUMNAS)).astype(object).to_csv(ruta, index=False)
+
+
+def _textos(ruta: Path, tamano: int) -> dict[str, list]:
+    """Texto de cada celda de COLUMNAS, recorriendo el archivo en bloques de `tamano`."""
+    textos: dict[str, list] = {columna: [] for columna in COLUMNAS}
+    with abrir_lector(ruta) as lector:
+        for bloque in lector.bloques(tamano):
+            for columna in COLUMNAS:
+                textos[columna].extend(None if pd.isna(v) else str(v) for v in bloque[columna])
+    return textos
+
+
+def main():
+    fallas = 0
+    with tempfile.TemporaryDirectory() as directorio:
+        for nombre, escribir in (("bloques.xlsx", _escribir_xlsx), ("bloques.csv", _escribir_csv)):
+            ruta = Path(directorio) / nombre
+            escribir(ruta)
+            por_bloques = _textos(ruta, TAMANO_BLOQUE)
+            completo = _textos(ruta, len(CODIGOS))
+            esperado = [None if codigo is None else str(codigo) for codigo in CODIGOS]
+            for columna in COLUMNAS:
+                if por_bloques[columna] != completo[columna]:
+                    fallas += 1
+                    print(f"{nombre} {columna}: bloques={por_bloques[columna]} completo={completo[columna]}")
+            if por_bloques["Codigo"] != esperado:
+                fallas += 1
+                print(f"{nombre} Codigo: esperado={esperado} obtenido={por_bloques['Codigo']}")
+    if fallas:
+        print(f"DIFERENCIAS: {fallas}")
+        sys.exit(1)
+    print("OK: mismo texto en todos los bloques")
+
+
+if __name__ == "__main__":
+    main()